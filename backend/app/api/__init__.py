@@ -1 +1 @@
-from . import trades, orders, equity, positions, account
\ No newline at end of file
+from . import trades, orders, equity, positions, account, market, dashboard, analytics
@@ -1,55 +1,32 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
 from typing import Optional, List
-from ..db.mongodb import get_database
+from ..services.state_store import state_store
+from ..services.versions import versions
+from .caching import conditional_json
 
 router = APIRouter()
 
+# 以下接口均直接读取内存状态，不访问数据库；状态 / 资金未变时返回 304 或缓存的响应
+
 @router.get("/list")
-async def get_accounts_list(db = Depends(get_database)):
-    cursor = db.account.find({}, {"account_id": 1})
-    accounts = []
-    async for doc in cursor:
-        if "account_id" in doc:
-            accounts.append(doc["account_id"])
-    return accounts
+async def get_accounts_list():
+    return state_store.account_ids()
 
 @router.get("/status")
-async def get_account_status(account_id: Optional[str] = None, db = Depends(get_database)):
-    query = {}
-    if account_id:
-        query["account_id"] = account_id
-    
-    cursor = db.connection_status.find(query)
-    statuses = []
-    async for doc in cursor:
-        statuses.append({
-            "account_id": doc.get("account_id", ""),
-            "source": doc.get("source", ""),
-            "code": doc.get("code", ""),
-            "msg": doc.get("msg", "")
-        })
-    return statuses
+async def get_account_status(request: Request, account_id: Optional[str] = None):
+    return await conditional_json(request, versions.etag("connection_status", account_id),
+                                  lambda headers: state_store.get_statuses(account_id))
 
 @router.get("")
-async def get_account(account_id: Optional[str] = None, db = Depends(get_database)):
-    query = {}
-    if account_id:
-        query["account_id"] = account_id
-        
-    account = await db.account.find_one(query)
-    
-    # If not found but no ID specified, try to find any account
-    if not account and not account_id:
-        account = await db.account.find_one()
+async def get_account(request: Request, account_id: Optional[str] = None):
+    return await conditional_json(request, versions.etag("account", account_id),
+                                  lambda headers: _account_or_placeholder(account_id))
 
+def _account_or_placeholder(account_id: Optional[str]):
+    # If not found but no ID specified, fall back to any account
+    account = state_store.get_account(account_id)
     if account:
-        return {
-            "account_id": account.get("account_id", ""),
-            "balance": account.get("balance", 0.0),
-            "available": account.get("available", 0.0),
-            "margin": account.get("margin", 0.0),
-            "pnl": account.get("pnl", 0.0)
-        }
+        return account
     return {
         "account_id": "N/A",
         "balance": 0.0,
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from ..db.mongodb import get_database
+from ..services.analytics import analytics, analytics_view, trading_day
+from ..services.ipc import call
+
+router = APIRouter()
+
+@router.get("")
+async def get_analytics(
+    account_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+    day: Optional[str] = Query(None, pattern=r"^\d{8}$"),
+    db = Depends(get_database)
+):
+    # 近期交易日直接读内存中的增量聚合，更早的按 (account_id, trading_day, symbol) 索引查库
+    day = day or trading_day()
+    if analytics.has_day(day):
+        return await call("analytics.get", account_id, symbol, day)
+    query = {"trading_day": day}
+    if account_id:
+        query["account_id"] = account_id
+    if symbol:
+        query["symbol"] = symbol
+    cursor = db.trade_analytics.find(query).sort([("account_id", 1), ("symbol", 1)])
+    return [analytics_view(doc) async for doc in cursor]
@@ -0,0 +1,47 @@
+import inspect
+from collections import OrderedDict
+import msgspec
+from fastapi import Request, Response
+from ..core.config import settings
+
+# 读接口的条件请求：ETag 由 services.versions 的版本号生成，数据未变时不查库、不重新序列化
+
+_cache: OrderedDict = OrderedDict()   # (path, query) -> (etag, body, headers)
+_encoder = msgspec.json.Encoder()
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 浏览器可能加上弱校验前缀 W/
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+async def conditional_json(request: Request, etag: str, build) -> Response:
+    """
+    If-None-Match 命中返回 304，不调用 build；否则按 (路径, 查询串) 复用同一 ETag 下序列化好的响应字节。
+    build(headers) 返回（或 await 后得到）要序列化的数据，可向 headers 添加响应头（与字节一起缓存）。
+    etag 须在 build 之前取得：build 期间数据再变化，缓存的只会是更新的内容，下次请求会因 ETag 不同而重建。
+    """
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+    key = (request.url.path, request.url.query)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == etag:
+        _cache.move_to_end(key)
+        _, body, headers = entry
+    else:
+        headers = {}
+        data = build(headers)
+        if inspect.isawaitable(data):
+            data = await data
+        body = _encoder.encode(data)
+        _cache[key] = (etag, body, headers)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.RESPONSE_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return Response(body, media_type="application/json", headers={**headers, **cache_headers})
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, Query, Request
+from typing import Optional
+from ..db.mongodb import get_database
+from ..services.serializers import TRADE_PROJECTION, ORDER_PROJECTION, recent
+from ..services.order_book import order_book
+from ..services.state_store import state_store
+from ..services.versions import versions
+from .caching import conditional_json
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# 仪表盘各分区及其版本号所属的集合，version 令牌按此顺序拼接
+SECTIONS = (
+    ("trades", "trades"),
+    ("orders", "orders"),
+    ("open_orders", "open_orders"),
+    ("positions", "positions"),
+    ("account", "account"),
+    ("status", "connection_status"),
+)
+
+
+def _token(current: list) -> str:
+    return ".".join([versions.boot, *map(str, current)])
+
+
+def _parse_since(since: Optional[str]):
+    # 令牌来自其他进程（重启前）或格式不对时视为没有，返回全部分区
+    if not since:
+        return None
+    boot, *parts = since.split(".")
+    if boot != versions.boot or len(parts) != len(SECTIONS):
+        return None
+    try:
+        return [int(v) for v in parts]
+    except ValueError:
+        return None
+
+
+@router.get("")
+async def get_dashboard(
+    request: Request,
+    account_id: str,
+    limit: int = Query(10, ge=1, le=1000),
+    since: Optional[str] = None,
+    db = Depends(get_database)
+):
+    """
+    一次返回仪表盘所需的成交、报单、挂单、持仓、资金和连接状态。
+    成交与报单两个查询并发执行、由聚合投影直接产出展示结构，其余分区读内存；
+    带上上次响应的 version 作为 since 时，只返回版本号变化过的分区。
+    """
+    current = [versions.get(collection, account_id) for _, collection in SECTIONS]
+    previous = _parse_since(since)
+    changed = {name for (name, _), now, seen in zip(SECTIONS, current, previous or current)
+               if previous is None or now != seen}
+
+    async def build(headers):
+        queries = {}
+        if "trades" in changed:
+            queries["trades"] = recent(db.trades, {"account_id": account_id}, limit, TRADE_PROJECTION)
+        if "orders" in changed:
+            queries["orders"] = recent(db.orders, {"account_id": account_id}, limit, ORDER_PROJECTION)
+        payload = {"version": _token(current)}
+        payload.update(zip(queries, await asyncio.gather(*queries.values())))
+        if "open_orders" in changed:
+            payload["open_orders"] = order_book.get_open(account_id)
+        if "positions" in changed:
+            payload["positions"] = state_store.get_positions(account_id)
+        if "account" in changed:
+            payload["account"] = state_store.get_account(account_id)
+        if "status" in changed:
+            payload["status"] = state_store.get_statuses(account_id)
+        return payload
+
+    try:
+        return await conditional_json(request, f'"{_token(current)}"', build)
+    except Exception as e:
+        logger.error(f"Error building dashboard for {account_id}: {e}")
+        return {"version": None}
@@ -1,45 +1,119 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, Query
 from typing import List, Optional
+from datetime import datetime, timedelta
 from ..db.mongodb import get_database
+from ..core.config import settings
+from ..services.archive import cold_store, merge_desc
+from ..services.equity_rollup import RESOLUTIONS, lttb
+from ..services.serializers import EQUITY_PROJECTION, recent
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _local(dt: Optional[datetime]):
+    # 权益快照以本地时间入库，带时区的请求参数统一换算为本地时间
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone().replace(tzinfo=None)
+    return dt
+
+def _pick_resolution(span: timedelta, target: int) -> str:
+    # 选择桶数不超过目标点数 20 倍的最细分辨率，再由 LTTB 降到目标点数
+    for resolution, seconds in RESOLUTIONS.items():
+        if span.total_seconds() / seconds <= target * 20:
+            return resolution
+    return "1h"
+
+# 范围查询需要 datetime 做降采样，$project 只取展示字段，时间格式化在 Python 侧完成
+SNAPSHOT_FIELDS = {"_id": 0, "account_id": 1, "timestamp": 1, "balance": 1, "available": 1, "pnl": 1}
+ROLLUP_FIELDS = {
+    "_id": 0,
+    "account_id": {"$ifNull": ["$account_id", ""]},
+    "timestamp": 1,
+    "balance": "$balance.c",
+    "available": "$available.c",
+    "pnl": "$pnl.c",
+    "balance_high": "$balance.h",
+    "balance_low": "$balance.l",
+}
+
+def range_query(account_id: Optional[str], start: datetime, end: datetime, resolution: str) -> dict:
+    query = {"account_id": account_id} if account_id else {}
+    query["timestamp"] = {"$gte": start, "$lte": end}
+    if resolution != "raw":
+        query["resolution"] = resolution
+    return query
+
+def range_pipeline(query: dict, fields: dict, max_rows: int) -> list:
+    # 超过 max_rows 时保留最新的部分：倒序取满上限，调用方再反转为时间正序
+    return [{"$match": query}, {"$sort": {"timestamp": -1}}, {"$limit": max_rows}, {"$project": fields}]
+
+def _format_time(dt: datetime) -> str:
+    # 与 EQUITY_PROJECTION 的 $dateToString 格式一致（毫秒精度）
+    return f"{dt:%Y-%m-%d %H:%M:%S}.{dt.microsecond // 1000:03d}"
 
 @router.get("/history")
-async def get_equity_history(limit: int = 500, account_id: Optional[str] = None, db = Depends(get_database)):
+async def get_equity_history(
+    limit: int = 500,
+    account_id: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Optional[str] = Query(None, pattern="^(raw|1s|1m|1h|auto)$"),
+    points: Optional[int] = Query(None, ge=3),
+    db = Depends(get_database)
+):
     try:
-        # 获取最近的历史快照
         query = {}
         if account_id:
             query["account_id"] = account_id
-            
-        cursor = db.equity_snapshots.find(query).sort("timestamp", -1).limit(limit)
-        snapshots = []
-        async for doc in cursor:
-            snapshots.append({
-                "account_id": doc.get("account_id", ""),
-                "timestamp": str(doc.get("timestamp", "")),
-                "balance": float(doc.get("balance") or 0.0),
-                "available": float(doc.get("available") or 0.0),
-                "pnl": float(doc.get("pnl") or 0.0)
-            })
-        # 返回前反转一下，让时间正序排列供图表显示
-        return snapshots[::-1]
+
+        if start is None and end is None and resolution is None and points is None:
+            # 获取最近的历史快照（聚合投影直接产出展示结构），库中不足 limit 条时从归档中补齐
+            snapshots = await recent(db.equity_snapshots, query, limit, EQUITY_PROJECTION)
+            if len(snapshots) < limit and cold_store.reaches("equity_snapshots", None):
+                cold = await asyncio.to_thread(cold_store.query, "equity_snapshots", account_id, limit=limit,
+                                               projection=EQUITY_PROJECTION)
+                snapshots = merge_desc(snapshots, cold, limit, "timestamp")
+            # 返回前反转一下，让时间正序排列供图表显示
+            return snapshots[::-1]
+
+        # 按时间范围查询：默认最近一天，从聚合表中取合适分辨率，再降采样到目标点数
+        end = _local(end) or datetime.now()
+        start = _local(start) or end - timedelta(days=1)
+        target = max(points or limit, 3)
+        if resolution in (None, "auto"):
+            resolution = _pick_resolution(end - start, target)
+
+        if resolution == "raw":
+            collection, fields = db.equity_snapshots, SNAPSHOT_FIELDS
+        else:
+            collection, fields = db.equity_rollups, ROLLUP_FIELDS
+        max_rows = settings.EQUITY_HISTORY_MAX_ROWS
+        pipeline = range_pipeline(range_query(account_id, start, end, resolution), fields, max_rows)
+        rows = (await collection.aggregate(pipeline).to_list(None))[::-1]
+        if resolution == "raw" and len(rows) < max_rows and cold_store.reaches("equity_snapshots", start):
+            # 越过归档水位的原始快照从冷数据读取，早于库中数据，拼在前面
+            first = rows[0]["timestamp"] if rows else None
+            cold = await asyncio.to_thread(cold_store.query, "equity_snapshots", account_id, start, end,
+                                           limit=max_rows, projection=SNAPSHOT_FIELDS)
+            cold = [doc for doc in cold if first is None or doc["timestamp"] < first][:max_rows - len(rows)]
+            rows = cold[::-1] + rows
+        # 整个时间范围按曲线形状降采样到目标点数，首尾两点始终保留
+        rows = lttb(rows, target)
+        for row in rows:
+            row["timestamp"] = _format_time(row["timestamp"])
+        return rows
     except Exception as e:
-        print(f"Error fetching equity history from DB: {e}")
+        logger.error(f"Error fetching equity history from DB: {e}")
         return []
 
 @router.get("/latest")
 async def get_latest_equity(db = Depends(get_database)):
     try:
-        doc = await db.equity_snapshots.find_one(sort=[("timestamp", -1)])
-        if doc:
-            return {
-                "account_id": doc.get("account_id", ""),
-                "timestamp": str(doc.get("timestamp", "")),
-                "balance": float(doc.get("balance") or 0.0),
-                "available": float(doc.get("available") or 0.0),
-                "pnl": float(doc.get("pnl") or 0.0)
-            }
+        latest = await recent(db.equity_snapshots, {}, 1, EQUITY_PROJECTION)
+        if latest:
+            return latest[0]
     except Exception as e:
-        print(f"Error fetching latest equity: {e}")
+        logger.error(f"Error fetching latest equity: {e}")
     return None
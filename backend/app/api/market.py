@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+from ..services.ipc import call
+
+router = APIRouter()
+
+# 行情数据全部来自内存中的环形缓冲区（ROLE=api 时经 ingest 进程读取）
+
+@router.get("/quotes")
+async def get_quotes(symbols: Optional[str] = None):
+    # symbols: 逗号分隔的合约列表，缺省返回全部
+    return await call("market.quotes", symbols.split(",") if symbols else None)
+
+@router.get("/ticks")
+async def get_ticks(symbol: str, limit: int = Query(100, ge=1, le=10000)):
+    return await call("market.ticks", symbol, limit)
+
+@router.get("/bars")
+async def get_bars(symbol: str, resolution: str = Query("1m", pattern="^(1s|1m)$"), limit: int = Query(100, ge=1, le=10000)):
+    return await call("market.bars", symbol, resolution, limit)
+
+@router.get("/stats")
+async def get_market_stats():
+    return await call("market.stats")
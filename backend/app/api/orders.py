@@ -1,51 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from ..core.config import settings
 from ..db.mongodb import get_database
-from ..services.engine_client import engine_client
+from ..models.schemas import OrderCreate, CancelRequest
+from ..services.ipc import call
+from ..services.order_book import order_book
+from ..services.serializers import ORDER_PROJECTION
+from ..services.versions import versions
+from .caching import conditional_json
+from .paging import build_query, fetch_page, cold_source, export_cold, export_rows, export_media_type
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("")
-async def get_orders(limit: int = 100, account_id: Optional[str] = None, db = Depends(get_database)):
+async def get_orders(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    account_id: Optional[str] = None,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    db = Depends(get_database)
+):
     try:
-        # 获取最近的报单
-        query = {}
-        if account_id:
-            query["account_id"] = account_id
-            
-        cursor = db.orders.find(query).sort("timestamp", -1).limit(limit)
-        orders = []
-        async for doc in cursor:
-            orders.append({
-                "account_id": doc.get("account_id", ""),
-                "client_id": str(doc.get("client_id", "")),
-                "order_ref": str(doc.get("order_ref", "")),
-                "symbol": doc.get("symbol", ""),
-                "direction": doc.get("direction", ""),
-                "offset": doc.get("offset", ""),
-                "status": str(doc.get("status", "")),
-                # 兼容不同来源的字段名
-                "limit_price": doc.get("limit_price") or doc.get("price") or 0.0,
-                "volume_total": doc.get("volume_total") or doc.get("vol_total") or 0,
-                "volume_traded": doc.get("volume_traded") or doc.get("vol_traded") or 0,
-                "msg": doc.get("msg") or doc.get("status_msg") or "",
-                "insert_time": doc.get("timestamp") or doc.get("insert_time") or ""
-            })
-        return orders
+        # 获取最近的报单；翻页使用上一页返回的 X-Next-Cursor，数据未变时不查库
+        query = build_query(account_id, start, end, cursor)
+        cold = cold_source("orders", account_id, start, end, cursor)
+        return await conditional_json(request, versions.etag("orders", account_id),
+                                      lambda headers: fetch_page(db.orders, query, limit, ORDER_PROJECTION, headers, cold))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error fetching orders from DB: {e}")
+        logger.error(f"Error fetching orders from DB: {e}")
         return []
 
+@router.get("/export")
+async def export_orders(
+    account_id: Optional[str] = None,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db = Depends(get_database)
+):
+    query = build_query(account_id, start, end)
+    return StreamingResponse(
+        export_rows(db.orders, query, ORDER_PROJECTION, format, export_cold("orders", account_id, start, end)),
+        media_type=export_media_type(format),
+        headers={"Content-Disposition": f"attachment; filename=orders.{format}"}
+    )
+
+@router.get("/open")
+async def get_open_orders(request: Request, account_id: Optional[str] = None):
+    # 未终结的报单（可撤），直接读内存中的报单索引
+    return await conditional_json(request, versions.etag("open_orders", account_id),
+                                  lambda headers: order_book.get_open(account_id))
+
+@router.get("/latency")
+async def get_order_latency(account_id: Optional[str] = None, symbol: Optional[str] = None):
+    # 报单到确认 / 报单到首次成交的延迟分布（秒），按账户和合约统计
+    return await call("orders.latency", account_id, symbol)
+
 @router.post("")
 async def place_order(order: dict):
-    success = await engine_client.send_order(order)
+    success = await call("orders.send", order)
     if success:
         return {"status": "success", "message": "Order sent to engine"}
     raise HTTPException(status_code=503, detail="Engine not connected")
 
+def _batch_timeout(legs: int) -> float:
+    # API 进程等待 ingest 的时长：限速排队 + 等待确认
+    rate = settings.ORDER_RATE_LIMIT
+    queued = max(0, legs - settings.ORDER_RATE_BURST) / rate if rate > 0 else 0
+    return settings.INGEST_TIMEOUT + settings.ORDER_ACK_TIMEOUT + queued
+
+def _batch_response(legs: list, message: str) -> dict:
+    if all(leg["status"] == "rejected" for leg in legs):
+        raise HTTPException(status_code=503, detail="Engine not connected")
+    status = "success" if all(leg["status"] != "rejected" for leg in legs) else "partial"
+    return {"status": status, "message": message, "orders": legs}
+
+@router.post("/batch")
+async def place_orders(orders: List[OrderCreate]):
+    """
+    一篮子报单：各腿按账户限速后连续发往引擎，返回与请求顺序对应的每腿结果
+    (status: acked / sent / rejected，client_id 为引擎在 ORDER_ACK_TIMEOUT 内回报的编号，sent_at 为发送时刻毫秒)。
+    """
+    if not orders or len(orders) > settings.ORDER_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1-{settings.ORDER_BATCH_MAX} orders")
+    legs = await call("orders.send_batch", [o.model_dump(exclude_none=True) for o in orders],
+                      timeout=_batch_timeout(len(orders)))
+    return _batch_response(legs, "Orders sent to engine")
+
+@router.post("/batch/cancel")
+async def cancel_orders(cancels: List[CancelRequest]):
+    if not cancels or len(cancels) > settings.ORDER_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1-{settings.ORDER_BATCH_MAX} cancels")
+    legs = await call("orders.cancel_batch", [c.model_dump() for c in cancels],
+                      timeout=_batch_timeout(len(cancels)))
+    return _batch_response(legs, "Cancel requests sent to engine")
+
 @router.delete("/{client_id}")
 async def cancel_order(client_id: str, symbol: str, account_id: Optional[str] = None):
-    success = await engine_client.cancel_order(client_id, symbol, account_id)
+    success = await call("orders.cancel", client_id, symbol, account_id)
     if success:
         return {"status": "success", "message": "Cancel request sent to engine"}
     raise HTTPException(status_code=503, detail="Engine not connected")
\ No newline at end of file
@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+from bson import ObjectId
+from fastapi import HTTPException
+from ..services.archive import cold_store, merge_desc
+from ..services.documents import utc_datetime
+from ..services.serializers import PROJECTIONS, TIME_FIELDS
+
+# 成交 / 报单历史的游标分页与流式导出，结果由聚合投影直接产出展示结构
+# 游标为 (时间毫秒, _id) 的键集位置，按时间倒序翻页，不受新数据插入影响
+
+SORT_DESC = {"timestamp": -1, "_id": -1}
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_cursor(row: dict, time_field: str) -> str:
+    raw = json.dumps({"t": row[time_field], "i": row["id"]})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return utc_datetime(data["t"]), ObjectId(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_query(account_id=None, start=None, end=None, cursor=None) -> dict:
+    clauses = []
+    if account_id:
+        clauses.append({"account_id": account_id})
+    if start is not None or end is not None:
+        time_range = {}
+        if start is not None:
+            time_range["$gte"] = utc_datetime(start)
+        if end is not None:
+            time_range["$lte"] = utc_datetime(end)
+        clauses.append({"timestamp": time_range})
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        clauses.append({"$or": [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": last_id}},
+        ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def cold_source(name: str, account_id=None, start=None, end=None, cursor=None):
+    """时间范围越过归档水位时返回按 limit 读取冷数据（同样的投影）的函数，否则返回 None。"""
+    start = utc_datetime(start) if start is not None else None
+    if not cold_store.reaches(name, start):
+        return None
+    end = utc_datetime(end) if end is not None else None
+    before = decode_cursor(cursor) if cursor else None
+    projection = PROJECTIONS[name]
+    return lambda limit: cold_store.query(name, account_id, start, end, before, limit, projection=projection)
+
+
+def page_pipeline(query: dict, limit: int, projection: dict) -> list:
+    return [{"$match": query}, {"$sort": SORT_DESC}, {"$limit": limit}, {"$project": projection}]
+
+
+def export_pipeline(query: dict, projection: dict) -> list:
+    return [{"$match": query}, {"$sort": {"timestamp": 1, "_id": 1}}, {"$project": projection}]
+
+
+async def fetch_page(collection, query: dict, limit: int, projection: dict, headers: dict, cold=None):
+    """
+    取一页数据；页满时在 X-Next-Cursor 响应头中返回下一页游标。
+    cold 为 cold_source 的结果：库中不足一页或已翻到归档水位之前时，与冷数据合并后再取一页。
+    """
+    time_field = TIME_FIELDS[collection.name]
+    rows = await collection.aggregate(page_pipeline(query, limit, projection)).to_list(None)
+    if cold is not None and (len(rows) < limit or rows[-1][time_field] < cold_store.watermark(collection.name)):
+        rows = merge_desc(rows, await asyncio.to_thread(cold, limit), limit, time_field)
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1], time_field)
+    return rows
+
+
+async def _export_rows(collection, query: dict, projection: dict, cold):
+    if cold is not None:
+        for row in cold:
+            yield row
+    async for row in collection.aggregate(export_pipeline(query, projection), batchSize=EXPORT_BATCH_SIZE):
+        yield row
+
+
+def export_cold(name: str, account_id=None, start=None, end=None):
+    """导出时先输出的冷数据（时间范围越过归档水位时）。"""
+    start = utc_datetime(start) if start is not None else None
+    if not cold_store.reaches(name, start):
+        return None
+    end = utc_datetime(end) if end is not None else None
+    return cold_store.scan(name, account_id, start, end, projection=PROJECTIONS[name])
+
+
+async def export_rows(collection, query: dict, projection: dict, fmt: str, cold=None):
+    """按时间正序直接从 Motor 游标逐批输出 NDJSON / CSV，内存占用与总行数无关；cold 为先输出的冷数据（export_cold）。"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        # 列与投影一致，不依赖首行的字段顺序
+        writer = csv.DictWriter(buffer, fieldnames=[k for k, v in projection.items() if v != 0], extrasaction="ignore")
+        writer.writeheader()
+    rows = 0
+    async for row in _export_rows(collection, query, projection, cold):
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, default=str))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_media_type(fmt: str) -> str:
+    return "text/csv" if fmt == "csv" else "application/x-ndjson"
@@ -1,33 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from ..db.mongodb import get_database
+from ..services.serializers import TRADE_PROJECTION
+from ..services.versions import versions
+from .caching import conditional_json
+from .paging import build_query, fetch_page, cold_source, export_cold, export_rows, export_media_type
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("")
-async def get_trades(limit: int = 100, account_id: Optional[str] = None, db = Depends(get_database)):
+async def get_trades(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    account_id: Optional[str] = None,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    db = Depends(get_database)
+):
     try:
-        query = {}
-        if account_id:
-            query["account_id"] = account_id
-            
-        # 按照时间戳降序排列，确保最近的成交在最上方
-        cursor = db.trades.find(query).sort("timestamp", -1).limit(limit)
-        trades = []
-        async for doc in cursor:
-            trades.append({
-                "account_id": doc.get("account_id", ""),
-                "client_id": str(doc.get("client_id", "")),
-                "symbol": doc.get("symbol", ""),
-                "direction": doc.get("direction", ""),
-                "offset": doc.get("offset", ""),
-                "price": doc.get("price", 0.0),
-                "volume": doc.get("volume", 0),
-                "trade_time": doc.get("timestamp") or doc.get("trade_time", ""),
-                "order_ref": doc.get("order_ref", ""),
-                "trade_id": doc.get("trade_id", "")
-            })
-        return trades
+        # 按照时间戳降序排列，确保最近的成交在最上方；翻页使用上一页返回的 X-Next-Cursor
+        # 该账户（或全部账户）的成交没有新落库时返回 304 / 缓存的响应，不查库
+        query = build_query(account_id, start, end, cursor)
+        cold = cold_source("trades", account_id, start, end, cursor)
+        return await conditional_json(request, versions.etag("trades", account_id),
+                                      lambda headers: fetch_page(db.trades, query, limit, TRADE_PROJECTION, headers, cold))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error fetching trades from DB: {e}")
-        return []
\ No newline at end of file
+        logger.error(f"Error fetching trades from DB: {e}")
+        return []
+
+@router.get("/export")
+async def export_trades(
+    account_id: Optional[str] = None,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db = Depends(get_database)
+):
+    query = build_query(account_id, start, end)
+    return StreamingResponse(
+        export_rows(db.trades, query, TRADE_PROJECTION, format, export_cold("trades", account_id, start, end)),
+        media_type=export_media_type(format),
+        headers={"Content-Disposition": f"attachment; filename=trades.{format}"}
+    )
@@ -8,6 +8,65 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "hft_db"
     ENGINE_WS_URL: str = "ws://localhost:8888"
+    # 多引擎：名称 -> {"url": ..., "accounts": [...]}，accounts 可省略（从引擎消息中学习）；为空时只连 ENGINE_WS_URL
+    ENGINES: dict = {}
+    LOG_LEVEL: str = "INFO"
+    # 进程角色：all 单进程 / ingest 独占引擎连接与落库 / api 只读副本（可多 worker），两者经 Unix socket 通信
+    ROLE: str = "all"
+    INGEST_SOCKET: str = "ingest.sock"
+    INGEST_PORT: int = 8867
+    INGEST_TIMEOUT: float = 5.0
+    INGEST_MAX_BUFFER: int = 64 * 1024 * 1024
+    # 落库流水线：每批最多条数 / 最长等待秒数
+    WRITE_BATCH_SIZE: int = 500
+    WRITE_FLUSH_INTERVAL: float = 0.05
+    # 落库积压：状态类集合开始按文档合并的队列长度 / 成交等集合内存中最多排队条数（超出溢出到磁盘）/ 积压时每批条数 / 溢出目录
+    WRITE_QUEUE_HIGH_WATER: int = 1000
+    WRITE_QUEUE_MAX: int = 20000
+    WRITE_CATCHUP_BATCH_SIZE: int = 5000
+    WRITE_SPILL_DIR: str = "spill"
+    # 读接口 ETag 响应缓存的最大条目数（按路径 + 查询串）
+    RESPONSE_CACHE_ENTRIES: int = 512
+    # 浏览器推送：每个连接每秒最多推送次数 / 积压事件上限（超出即断开）
+    STREAM_MAX_PUSH_HZ: float = 10.0
+    STREAM_MAX_PENDING: int = 1000
+    # 权益曲线：原始快照 / 1s / 1m 聚合的保留秒数（1h 聚合永久保留），单次查询最多读取行数（超出时保留最新的）
+    # 原始快照的 TTL 有意短于 ARCHIVE_AFTER_TRADING_DAYS：到期直接删除、不归档，更早的曲线由 equity_rollups 提供
+    EQUITY_RAW_TTL_SECONDS: int = 3 * 86400
+    EQUITY_1S_RETENTION_SECONDS: int = 7 * 86400
+    EQUITY_1M_RETENTION_SECONDS: int = 180 * 86400
+    EQUITY_HISTORY_MAX_ROWS: int = 50000
+    # 行情：预分配的合约数 / 每个合约保留的 tick 数 / 每个分辨率保留的 K 线数
+    MARKET_DATA_ENABLED: bool = True
+    MD_MAX_SYMBOLS: int = 256
+    MD_TICK_RING_SIZE: int = 1024
+    MD_BAR_RING_SIZE: int = 600
+    # 报单延迟跟踪：待确认报单的超时秒数 / 最多跟踪的 client_id 数
+    ORDER_TRACK_TIMEOUT: float = 30.0
+    ORDER_TRACK_MAX: int = 10000
+    # 报单限速：每账户每秒报单 / 撤单笔数（0 不限）/ 突发笔数；批量报单每批最多笔数 / 等待引擎确认的秒数
+    ORDER_RATE_LIMIT: float = 50.0
+    ORDER_RATE_BURST: int = 20
+    ORDER_BATCH_MAX: int = 100
+    ORDER_ACK_TIMEOUT: float = 2.0
+    # 引擎消息日志：目录 / 单段大小 / msync 间隔秒数 / 已落库旧段保留个数 / 是否记录 tick
+    JOURNAL_ENABLED: bool = True
+    JOURNAL_DIR: str = "journal"
+    JOURNAL_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    JOURNAL_FSYNC_INTERVAL: float = 0.05
+    JOURNAL_KEEP_SEGMENTS: int = 16
+    JOURNAL_TICKS: bool = False
+    # 报单索引：同一报单回报的合并写库间隔秒数 / 内存保留的报单数（挂单不计）/ 启动时加载挂单的回溯秒数
+    ORDER_FLUSH_INTERVAL: float = 0.1
+    ORDER_BOOK_MAX: int = 50000
+    ORDER_OPEN_MAX_AGE: int = 86400
+    # 成交统计：交易日切换的小时（夜盘归下一交易日）/ 聚合写库间隔秒数
+    TRADING_DAY_ROLL_HOUR: int = 20
+    ANALYTICS_FLUSH_INTERVAL: float = 1.0
+    # 冷数据归档：目录 / 保留在 Mongo 中的交易日数 / Parquet 压缩算法
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_AFTER_TRADING_DAYS: int = 20
+    ARCHIVE_COMPRESSION: str = "zstd"
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
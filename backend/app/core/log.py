@@ -0,0 +1,44 @@
+import logging
+import time
+
+
+def _format(event: str, fields: dict) -> str:
+    return event + "".join(f" {k}={v!r}" if isinstance(v, str) else f" {k}={v}" for k, v in fields.items())
+
+
+class SampledLog:
+    """
+    结构化（event key=value）日志，按事件名限频：每个事件每 interval 秒最多输出一条，
+    期间被抑制的条数附在下一条的 suppressed 字段里。用于替代接收循环等热路径上的 print。
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 5.0):
+        self.logger = logger
+        self.interval = interval
+        self._last: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}
+
+    def log(self, level: int, event: str, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        if now - self._last.get(event, -self.interval) < self.interval:
+            self._suppressed[event] = self._suppressed.get(event, 0) + 1
+            return
+        self._last[event] = now
+        suppressed = self._suppressed.pop(event, 0)
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(level, _format(event, fields))
+
+    def debug(self, event: str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self.log(logging.ERROR, event, **fields)
@@ -0,0 +1,174 @@
+from bisect import bisect_left
+
+# 延迟类直方图的默认桶上界（秒）
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 单条消息解码 / 处理这类微秒级耗时用更细的桶
+FAST_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                0.001, 0.0025, 0.005, 0.01, 0.05)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """固定桶直方图：observe 只做一次二分查找和计数，不保存样本，内存恒定。"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """按桶估算分位数，返回所在桶的上界（落在 +Inf 桶时返回最大有限上界）。"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[min(i, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Family:
+    """
+    一个指标名下按标签值区分的一组指标。labels() 返回的子指标可以缓存在调用方，
+    热路径上只剩一次属性自增，没有锁（全部在事件循环线程内更新）。
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: tuple, factory):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self._factory = factory
+        self.children: dict[tuple, object] = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._factory()
+        return child
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values, le=None) -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    def __init__(self):
+        self._families: list[Family] = []
+        self._callbacks: list[tuple] = []
+
+    def _add(self, name, help, kind, labelnames, factory) -> Family:
+        family = Family(name, help, kind, tuple(labelnames), factory)
+        self._families.append(family)
+        return family
+
+    def counter(self, name: str, help: str, labelnames=()) -> Family:
+        return self._add(name, help, "counter", labelnames, Counter)
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Family:
+        return self._add(name, help, "gauge", labelnames, Gauge)
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Family:
+        return self._add(name, help, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def gauge_callback(self, name: str, help: str, labelnames, fn):
+        """抓取时才计算的 gauge（如队列深度）；fn 返回 {标签值元组: 数值}。"""
+        self._callbacks.append((name, help, tuple(labelnames), fn))
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）。"""
+        lines = []
+        for f in self._families:
+            lines.append(f"# HELP {f.name} {f.help}")
+            lines.append(f"# TYPE {f.name} {f.kind}")
+            for values, m in list(f.children.items()):
+                if f.kind != "histogram":
+                    lines.append(f"{f.name}{_fmt_labels(f.labelnames, values)} {m.value}")
+                    continue
+                cumulative = 0
+                for bound, c in zip(m.buckets, m.counts):
+                    cumulative += c
+                    lines.append(f"{f.name}_bucket{_fmt_labels(f.labelnames, values, bound)} {cumulative}")
+                lines.append(f"{f.name}_bucket{_fmt_labels(f.labelnames, values, '+Inf')} {m.count}")
+                lines.append(f"{f.name}_sum{_fmt_labels(f.labelnames, values)} {m.sum}")
+                lines.append(f"{f.name}_count{_fmt_labels(f.labelnames, values)} {m.count}")
+        for name, help, labelnames, fn in self._callbacks:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for values, value in fn().items():
+                lines.append(f"{name}{_fmt_labels(labelnames, values)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# 无标签的指标直接取出唯一的子指标，未更新前也会以 0 输出
+# 引擎接入
+ENGINE_MESSAGES = registry.counter("hft_engine_messages_total", "Engine frames received", ("msg_type",))
+ENGINE_DECODE_SECONDS = registry.histogram("hft_engine_decode_seconds", "Engine frame decode time", buckets=FAST_BUCKETS).labels()
+ENGINE_HANDLE_SECONDS = registry.histogram("hft_engine_handle_seconds", "Engine message handler time", ("msg_type",), FAST_BUCKETS)
+ENGINE_ERRORS = registry.counter("hft_engine_errors_total", "Engine frames that failed to decode or handle", ("stage",))
+ENGINE_CONNECTED = registry.gauge("hft_engine_connected", "1 while the engine websocket is connected", ("engine",))
+ENGINE_RECONNECTS = registry.counter("hft_engine_reconnects_total", "Engine websocket connection attempts after a failure", ("engine",))
+
+# 落库
+MONGO_WRITE_SECONDS = registry.histogram("hft_mongo_write_seconds", "bulk_write latency", ("collection",))
+MONGO_WRITE_OPS = registry.counter("hft_mongo_write_ops_total", "Write operations flushed", ("collection",))
+MONGO_WRITE_ERRORS = registry.counter("hft_mongo_write_errors_total", "Failed bulk_write calls", ("collection",))
+
+# 报单
+ORDER_ACK_SECONDS = registry.histogram("hft_order_ack_seconds", "Order send to first rtn", ("account_id", "symbol"))
+ORDER_FILL_SECONDS = registry.histogram("hft_order_fill_seconds", "Order send to first trade", ("account_id", "symbol"))
+
+# HTTP
+HTTP_REQUEST_SECONDS = registry.histogram("hft_http_request_seconds", "API request latency", ("method", "route"))
+HTTP_REQUESTS = registry.counter("hft_http_requests_total", "API requests", ("method", "route", "status"))
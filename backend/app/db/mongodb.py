@@ -1,15 +1,85 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
 from ..core.config import settings
 
+logger = logging.getLogger(__name__)
+
 class MongoDB:
     client: AsyncIOMotorClient = None
     db = None
 
 db_client = MongoDB()
 
+INDEX_OPTIONS_CONFLICT = 85
+
+# 各集合需要的索引，启动时逐一确保存在（已存在则为空操作）
+INDEXES = {
+    "orders": [
+        # rtn 按 client_id upsert
+        IndexModel([("client_id", ASCENDING)], unique=True),
+        # 键集分页按 (timestamp, _id) 倒序
+        IndexModel([("account_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "trades": [
+        # 成交按 (client_id, trade_id) 幂等 upsert；历史上没有 trade_id 的成交不参与唯一约束
+        IndexModel([("client_id", ASCENDING), ("trade_id", ASCENDING)], unique=True,
+                   partialFilterExpression={"trade_id": {"$exists": True}}),
+        # 没有 trade_id 的成交按 (client_id, timestamp, volume) 幂等 upsert
+        IndexModel([("client_id", ASCENDING), ("timestamp", ASCENDING)]),
+        IndexModel([("account_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "equity_snapshots": [
+        IndexModel([("account_id", ASCENDING), ("timestamp", DESCENDING)]),
+        # 原始快照只保留一段时间，长周期曲线走 equity_rollups
+        IndexModel([("timestamp", DESCENDING)], expireAfterSeconds=settings.EQUITY_RAW_TTL_SECONDS),
+    ],
+    "equity_rollups": [
+        IndexModel([("account_id", ASCENDING), ("resolution", ASCENDING), ("timestamp", ASCENDING)], unique=True),
+        IndexModel([("resolution", ASCENDING), ("timestamp", ASCENDING)]),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "trade_analytics": [
+        IndexModel([("account_id", ASCENDING), ("trading_day", ASCENDING), ("symbol", ASCENDING)], unique=True),
+        IndexModel([("trading_day", ASCENDING)]),
+    ],
+    "positions": [
+        IndexModel([("account_id", ASCENDING), ("symbol", ASCENDING)]),
+    ],
+    "account": [
+        IndexModel([("account_id", ASCENDING)], unique=True),
+    ],
+    "connection_status": [
+        IndexModel([("account_id", ASCENDING), ("source", ASCENDING)], unique=True),
+    ],
+}
+
+async def _create_index(db, name, index):
+    try:
+        await db[name].create_indexes([index])
+    except OperationFailure as e:
+        ttl = index.document.get("expireAfterSeconds")
+        if e.code != INDEX_OPTIONS_CONFLICT or ttl is None:
+            raise
+        # 已有同键索引但 TTL 不同：原地修改过期时间
+        await db.command("collMod", name, index={"keyPattern": index.document["key"], "expireAfterSeconds": ttl})
+
+async def ensure_indexes(db):
+    for name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await _create_index(db, name, index)
+            except PyMongoError as e:
+                # 例如历史数据中存在重复 client_id 导致唯一索引无法建立
+                logger.error(f"Failed to create index {index.document['name']} on {name}: {e}")
+
 async def connect_to_mongo():
     db_client.client = AsyncIOMotorClient(settings.MONGODB_URL)
     db_client.db = db_client.client[settings.DATABASE_NAME]
+    await ensure_indexes(db_client.db)
 
 async def close_mongo_connection():
     db_client.client.close()
@@ -0,0 +1,18 @@
+"""
+独立的 ingest 进程：独占引擎连接、日志与落库，经 Unix socket（INGEST_SOCKET）向 API 进程同步状态并代为下发指令。
+HTTP 只监听本机 INGEST_PORT（/metrics 等），对外服务由 ROLE=api 的多 worker 进程提供。
+用法 (backend 目录下):
+    python -m app.ingest
+    ROLE=api uvicorn app.main:app --host 0.0.0.0 --port 8866 --workers 4
+"""
+import uvicorn
+from .core.config import settings
+
+
+def main():
+    settings.ROLE = "ingest"
+    uvicorn.run("app.main:app", host="127.0.0.1", port=settings.INGEST_PORT, workers=1)
+
+
+if __name__ == "__main__":
+    main()
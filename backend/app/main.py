@@ -1,10 +1,28 @@
 import asyncio
-from fastapi import FastAPI
+import logging
+from time import perf_counter
+from fastapi import FastAPI, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .core.config import settings
-from .db.mongodb import connect_to_mongo, close_mongo_connection
-from .api import trades, orders, equity, positions, account
+from .core.metrics import registry, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+from .db.mongodb import connect_to_mongo, close_mongo_connection, get_database
+from .api import trades, orders, equity, positions, account, market, dashboard, analytics as analytics_api
 from .services.engine_client import engine_client
+from .services.write_pipeline import write_pipeline
+from .services.stream_hub import stream_hub
+from .services.state_store import state_store
+from .services.equity_rollup import equity_rollup
+from .services.market_data import market_data
+from .services.journal import journal
+from .services.analytics import analytics
+from .services.order_book import order_book
+from .services.ipc import ingest_server, ingest_client, IngestUnavailable
+from .models.schemas import TickMessage, RtnMessage, TradeMessage
+
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -15,25 +33,97 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    # 按路由模板（而非实际路径）统计 /api 请求耗时，避免标签基数随参数增长
+    if not request.url.path.startswith("/api"):
+        return await call_next(request)
+    start = perf_counter()
+    response = await call_next(request)
+    if "route" in request.scope:
+        path = request.url.path
+        for name, value in request.scope.get("path_params", {}).items():
+            path = path.replace(f"/{value}", f"/{{{name}}}")
+    else:
+        path = "unmatched"
+    HTTP_REQUEST_SECONDS.labels(request.method, path).observe(perf_counter() - start)
+    HTTP_REQUESTS.labels(request.method, path, response.status_code).inc()
+    return response
+
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    if settings.ROLE == "api":
+        # 只读副本：状态由 ingest 进程同步，不连接引擎、不写库
+        ingest_client.start()
+        return
+    # 先从库中恢复内存状态，再开始接收引擎消息
+    await state_store.warm(get_database())
+    await equity_rollup.warm(get_database())
+    await order_book.warm(get_database())
+    write_pipeline.start()
+    if settings.MARKET_DATA_ENABLED:
+        engine_client.register_handler(TickMessage, market_data.on_tick)
+    engine_client.register_handler(RtnMessage, analytics.on_rtn)
+    engine_client.register_handler(TradeMessage, analytics.on_trade)
+    if settings.JOURNAL_ENABLED:
+        journal.open()
+    await analytics.warm(get_database(), journal.seq if journal.enabled else None)
+    analytics.start()
+    order_book.start()
+    if settings.JOURNAL_ENABLED:
+        # 回放上次退出前未确认落库的日志，再开始接收新消息
+        replayed = engine_client.replay(journal.unapplied())
+        if replayed:
+            logger.info(f"Replayed {replayed} journaled engine messages after seq {journal.checkpoint}")
+        journal.start(write_pipeline.applied_seq)
+    if settings.ROLE == "ingest":
+        await ingest_server.start()
     # 异步启动引擎连接
     asyncio.create_task(engine_client.connect())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if settings.ROLE == "api":
+        await ingest_client.stop()
+        await close_mongo_connection()
+        return
+    if settings.ROLE == "ingest":
+        await ingest_server.stop()
+    # 先把队列中未落库的数据写完再断开数据库
+    equity_rollup.flush()
+    await analytics.stop()
+    await order_book.stop()
+    await write_pipeline.stop()
+    await journal.close(write_pipeline.applied_seq)
     await close_mongo_connection()
 
+@app.exception_handler(IngestUnavailable)
+async def ingest_unavailable(request: Request, exc: IngestUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
 @app.get("/")
 async def root():
     return {"message": "HFT-UI Backend API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/ws/stream")
+async def stream(websocket: WebSocket):
+    # 订阅: {"action": "subscribe", "account_id": "...", "channels": ["orders", "trades", ...]}
+    await stream_hub.serve(websocket)
+
 # Include routers
 app.include_router(trades.router, prefix="/api/trades", tags=["trades"])
 app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
 app.include_router(equity.router, prefix="/api/equity", tags=["equity"])
 app.include_router(positions.router, prefix="/api/positions", tags=["positions"])
 app.include_router(account.router, prefix="/api/account", tags=["account"])
+app.include_router(market.router, prefix="/api/market", tags=["market"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(analytics_api.router, prefix="/api/analytics", tags=["analytics"])
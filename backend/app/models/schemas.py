@@ -1,26 +1,37 @@
+import msgspec
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
+
+# ---- MongoDB 中的规范文档（services/documents.py 在写入时生成，tools/migrate_documents.py 转换旧文档）----
+# 字段名、类型固定，读接口直接用投影输出；成交 / 报单的 timestamp 为 UTC 时间，权益快照为本地时间
 
 class Trade(BaseModel):
     account_id: str
+    client_id: int
+    trade_id: Optional[str] = None   # 为空时不写入该字段（唯一索引只约束有 trade_id 的成交）
+    order_ref: str = ""
     symbol: str
     direction: str # 'B'/'S'
     offset: str # 'O'/'C'/'T'
     price: float
     volume: int
-    trade_time: datetime
-    order_ref: str
+    timestamp: datetime
 
 class Order(BaseModel):
     account_id: str
-    order_ref: str
+    client_id: int
+    order_ref: str = ""
+    order_sys_id: str = ""
     symbol: str
+    direction: str = ""
+    offset: str = ""
     status: str
     limit_price: float
     volume_total: int
     volume_traded: int
-    insert_time: Optional[datetime] = None
+    msg: str = ""
+    timestamp: datetime   # 最近一次回报的时间
 
 class OrderCreate(BaseModel):
     account_id: Optional[str] = None
@@ -30,8 +41,100 @@ class OrderCreate(BaseModel):
     price: float
     volume: int
 
+class CancelRequest(BaseModel):
+    client_id: str
+    symbol: str
+    account_id: Optional[str] = None
+
 class EquitySnapshot(BaseModel):
     account_id: str
     timestamp: datetime
-    total_pnl: float
-    positions: list[dict]
+    balance: float
+    available: float
+    pnl: float
+
+
+# ---- 引擎上行消息（websocket_protocol.md），使用 msgspec 按 type 字段直接解码为带类型的结构 ----
+# client_id 为 18 位整数，按 int 精确解码（不经过 float）；缺省字段为 None，转 dict 时省略
+
+class EngineMessage(msgspec.Struct, tag_field="type", omit_defaults=True, kw_only=True):
+    pass
+
+class RtnMessage(EngineMessage, tag="rtn"):
+    client_id: int
+    account_id: Optional[str] = None
+    order_ref: Optional[str] = None
+    order_sys_id: Optional[str] = None
+    symbol: Optional[str] = None
+    direction: Optional[str] = None
+    offset: Optional[str] = None
+    status: Union[str, int, None] = None
+    vol_total: Optional[int] = None
+    vol_traded: Optional[int] = None
+    price: Optional[float] = None
+    msg: Optional[str] = None
+    timestamp: Optional[int] = None
+    # 兼容部分来源使用的字段名
+    limit_price: Optional[float] = None
+    volume_total: Optional[int] = None
+    volume_traded: Optional[int] = None
+    status_msg: Optional[str] = None
+
+class TradeMessage(EngineMessage, tag="trade"):
+    client_id: int
+    trade_id: Union[str, int, None] = None
+    account_id: Optional[str] = None
+    order_ref: Optional[str] = None
+    symbol: Optional[str] = None
+    direction: Optional[str] = None
+    offset: Optional[str] = None
+    price: Optional[float] = None
+    volume: Optional[int] = None
+    timestamp: Optional[int] = None
+    trade_time: Union[str, int, None] = None
+
+class AccountMessage(EngineMessage, tag="account"):
+    account_id: Optional[str] = None
+    balance: Optional[float] = None
+    available: Optional[float] = None
+    margin: Optional[float] = None
+    pnl: Optional[float] = None
+
+class PositionItem(msgspec.Struct, omit_defaults=True, kw_only=True):
+    symbol: Optional[str] = None
+    account_id: Optional[str] = None
+    symbol_id: Optional[int] = None
+    long_td: Optional[int] = None
+    long_yd: Optional[int] = None
+    long_total: Optional[int] = None
+    long_price: Optional[float] = None
+    long_pnl: Optional[float] = None
+    short_td: Optional[int] = None
+    short_yd: Optional[int] = None
+    short_total: Optional[int] = None
+    short_price: Optional[float] = None
+    short_pnl: Optional[float] = None
+    pnl: Optional[float] = None
+
+class PosSnapshotMessage(EngineMessage, tag="pos_snapshot"):
+    data: list[PositionItem] = []
+
+class StatusMessage(EngineMessage, tag="status"):
+    account_id: Optional[str] = None
+    source: Optional[str] = None
+    code: Union[str, int, None] = None
+    msg: Optional[str] = None
+
+class TickMessage(EngineMessage, tag="tick"):
+    symbol: str
+    last_price: float = 0.0
+    volume: int = 0
+    turnover: float = 0.0
+    open_interest: float = 0.0
+    bid_price1: float = 0.0
+    bid_volume1: int = 0
+    ask_price1: float = 0.0
+    ask_volume1: int = 0
+    timestamp: Optional[int] = None
+
+ENGINE_MESSAGE_TYPES = (RtnMessage, TradeMessage, AccountMessage, PosSnapshotMessage, StatusMessage, TickMessage)
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from ..core.config import settings
+from ..models.schemas import RtnMessage, TradeMessage
+from .order_book import order_book
+from .write_pipeline import WriteOp, write_pipeline
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("fills", "volume", "turnover", "buy_volume", "buy_turnover", "sell_volume", "sell_turnover",
+            "realized_pnl", "orders", "filled_orders", "cancelled_orders", "order_volume")
+CANCELLED = "5"
+
+
+def trading_day(ts_ms: int = None) -> str:
+    """
+    成交/报单所属交易日（YYYYMMDD）：TRADING_DAY_ROLL_HOUR 之后的夜盘归下一交易日，
+    周五夜盘及周六凌晨归下周一。
+    """
+    dt = datetime.fromtimestamp(ts_ms / 1000) if ts_ms else datetime.now()
+    day = dt.date()
+    if dt.hour >= settings.TRADING_DAY_ROLL_HOUR:
+        day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day.strftime("%Y%m%d")
+
+
+def trading_day_start(day: str) -> datetime:
+    """交易日 day 的起点：前一个工作日的 TRADING_DAY_ROLL_HOUR（周一为上周五夜盘开始）。"""
+    prev = datetime.strptime(day, "%Y%m%d") - timedelta(days=1)
+    while prev.weekday() >= 5:
+        prev -= timedelta(days=1)
+    return prev.replace(hour=settings.TRADING_DAY_ROLL_HOUR)
+
+
+def trading_days_back(day: str, n: int) -> str:
+    """day 之前第 n 个交易日（只跳过周末）。"""
+    d = datetime.strptime(day, "%Y%m%d")
+    while n > 0:
+        d -= timedelta(days=1)
+        if d.weekday() < 5:
+            n -= 1
+    return d.strftime("%Y%m%d")
+
+
+def _new_book() -> dict:
+    return {"long_qty": 0, "long_avg": 0.0, "short_qty": 0, "short_avg": 0.0}
+
+
+def _new_aggregate(account_id: str, symbol: str, day: str) -> dict:
+    return {"account_id": account_id, "symbol": symbol, "trading_day": day, "seq": 0,
+            **dict.fromkeys(COUNTERS, 0), "book": _new_book()}
+
+
+def analytics_view(doc: dict) -> dict:
+    """聚合文档 -> 接口返回结构，附带按方向的 VWAP 和成交率。"""
+    ratio = lambda a, b: a / b if b else None
+    return {
+        "account_id": doc.get("account_id"),
+        "symbol": doc.get("symbol"),
+        "trading_day": doc.get("trading_day"),
+        **{k: doc.get(k, 0) for k in COUNTERS},
+        "vwap": ratio(doc.get("turnover", 0), doc.get("volume", 0)),
+        "buy_vwap": ratio(doc.get("buy_turnover", 0), doc.get("buy_volume", 0)),
+        "sell_vwap": ratio(doc.get("sell_turnover", 0), doc.get("sell_volume", 0)),
+        "fill_rate": ratio(doc.get("filled_orders", 0), doc.get("orders", 0)),
+        "volume_fill_rate": ratio(doc.get("volume", 0), doc.get("order_volume", 0)),
+        "position": doc.get("book"),
+    }
+
+
+class TradeAnalytics:
+    """
+    按 (account_id, symbol, trading_day) 增量维护成交统计：成交笔数 / 量 / 额、分方向 VWAP、
+    平均成本法已实现盈亏、报单数与成交率。每条 rtn / trade 只做常数次字典更新，
+    变化的键按 ANALYTICS_FLUSH_INTERVAL 合并写入 trade_analytics（每键一个文档），接口直接读内存。
+    金额按 价格 × 手数 计算，不含合约乘数。
+    """
+
+    def __init__(self):
+        self.aggregates: dict[tuple, dict] = {}   # (account_id, symbol, day) -> 聚合
+        self._books: dict[tuple, dict] = {}       # (account_id, symbol) -> 持仓成本，跨交易日延续；聚合里存其快照
+        self._orders: dict[int, list] = {}        # client_id -> [key, direction, offset, filled, cancelled]
+        self._dirty: set[tuple] = set()
+        self.unflushed_seq = 0                    # 尚未写库的最早日志序号，启动后由 write_pipeline 计入确认水位
+        self._task: asyncio.Task = None
+
+    def _aggregate(self, account_id: str, symbol: str, day: str) -> dict:
+        key = (account_id, symbol, day)
+        agg = self.aggregates.get(key)
+        if agg is None:
+            agg = self.aggregates[key] = _new_aggregate(account_id, symbol, day)
+        return agg
+
+    def _fresh(self, agg: dict) -> bool:
+        # 日志回放时跳过已计入持久化聚合的帧，避免重复统计
+        seq = write_pipeline.current_seq
+        if seq and seq <= agg["seq"]:
+            return False
+        agg["seq"] = seq
+        if seq and not self.unflushed_seq:
+            self.unflushed_seq = seq
+        self._dirty.add((agg["account_id"], agg["symbol"], agg["trading_day"]))
+        return True
+
+    def on_rtn(self, msg: RtnMessage):
+        # 每帧只做一次 _fresh 判断：同一帧内再次判断会被当作已计入而跳过
+        order = self._orders.get(msg.client_id)
+        agg, fresh = None, False
+        if order is None:
+            if not msg.symbol:
+                return
+            agg = self._aggregate(msg.account_id or "default", msg.symbol, trading_day(msg.timestamp))
+            fresh = self._fresh(agg)
+            if not fresh:
+                return
+            order = self._orders[msg.client_id] = [
+                (agg["account_id"], agg["symbol"], agg["trading_day"]), msg.direction, msg.offset, False, False]
+            agg["orders"] += 1
+            agg["order_volume"] += msg.vol_total if msg.vol_total is not None else (msg.volume_total or 0)
+        if str(msg.status) == CANCELLED and not order[4]:
+            if agg is None:
+                agg = self.aggregates.get(order[0])
+                fresh = agg is not None and self._fresh(agg)
+            if fresh:
+                order[4] = True
+                agg["cancelled_orders"] += 1
+
+    def on_trade(self, msg: TradeMessage):
+        order = self._orders.get(msg.client_id)
+        if order is not None:
+            known = {"account_id": order[0][0], "symbol": order[0][1], "direction": order[1], "offset": order[2]}
+        else:
+            # 报单的 rtn 已被淘汰或早于本进程：从报单簿补齐成交缺少的字段
+            known = order_book.get(msg.client_id) or {}
+        account_id = msg.account_id or known.get("account_id") or "default"
+        symbol = msg.symbol or known.get("symbol")
+        if not symbol or not msg.volume:
+            return
+        direction = msg.direction or known.get("direction")
+        offset = msg.offset or known.get("offset")
+        agg = self._aggregate(account_id, symbol, trading_day(msg.timestamp))
+        if not self._fresh(agg):
+            return
+        book = self._books.setdefault((account_id, symbol), _new_book())
+        self.apply_fill(agg, book, direction, offset, float(msg.price or 0.0), int(msg.volume))
+        if order is not None and not order[3]:
+            order[3] = True
+            filled = self.aggregates.get(order[0])
+            if filled is not None:
+                filled["filled_orders"] += 1
+                self._dirty.add(order[0])
+
+    @staticmethod
+    def apply_fill(agg: dict, book: dict, direction, offset, price: float, volume: int):
+        notional = price * volume
+        agg["fills"] += 1
+        agg["volume"] += volume
+        agg["turnover"] += notional
+        side = "buy" if direction == "B" else "sell"
+        agg[f"{side}_volume"] += volume
+        agg[f"{side}_turnover"] += notional
+
+        # 平均成本法：开仓累加成本，平仓按均价结算（没有已知持仓的平仓量不计盈亏）
+        held = "long" if direction == "B" else "short"
+        if offset == "O":
+            qty = book[f"{held}_qty"]
+            book[f"{held}_avg"] = (book[f"{held}_avg"] * qty + notional) / (qty + volume)
+            book[f"{held}_qty"] = qty + volume
+        elif offset:
+            closed = "short" if direction == "B" else "long"
+            qty = min(volume, book[f"{closed}_qty"])
+            if qty:
+                avg = book[f"{closed}_avg"]
+                agg["realized_pnl"] += (avg - price) * qty if closed == "short" else (price - avg) * qty
+                book[f"{closed}_qty"] -= qty
+                if not book[f"{closed}_qty"]:
+                    book[f"{closed}_avg"] = 0.0
+        agg["book"] = dict(book)
+
+    def get(self, account_id: str = None, symbol: str = None, day: str = None) -> list:
+        day = day or trading_day()
+        if account_id and symbol:
+            agg = self.aggregates.get((account_id, symbol, day))
+            return [analytics_view(agg)] if agg else []
+        return [analytics_view(agg) for (acc, sym, d), agg in sorted(self.aggregates.items())
+                if d == day and (not account_id or acc == account_id) and (not symbol or sym == symbol)]
+
+    def has_day(self, day: str) -> bool:
+        return day >= self._oldest_day()
+
+    def _oldest_day(self) -> str:
+        # 内存中只保留最近几天的聚合，更早的由接口查库
+        return (datetime.strptime(trading_day(), "%Y%m%d") - timedelta(days=3)).strftime("%Y%m%d")
+
+    def start(self):
+        # 日志检查点不能越过仍只在内存中的聚合，否则崩溃后回放会漏计这些帧
+        write_pipeline.hold(self)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.ANALYTICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+                self._prune()
+            except Exception as e:
+                logger.error(f"Analytics flush failed: {e}")
+
+    def flush(self):
+        if not self._dirty:
+            return
+        ops = []
+        for key in self._dirty:
+            agg = self.aggregates.get(key)
+            if agg is not None:
+                ops.append(WriteOp(
+                    "update",
+                    {"account_id": key[0], "trading_day": key[2], "symbol": key[1]},
+                    {"$set": {**agg, "updated_at": int(time.time() * 1000)}},
+                    upsert=True
+                ))
+        self._dirty.clear()
+        # 写操作挂在最早未落库的序号上提交，确认落库前流水线水位不会越过它
+        write_pipeline.submit("trade_analytics", *ops, seq=self.unflushed_seq or write_pipeline.current_seq)
+        self.unflushed_seq = 0
+
+    def _prune(self):
+        oldest = self._oldest_day()
+        for key in [k for k in self.aggregates if k[2] < oldest and k not in self._dirty]:
+            del self.aggregates[key]
+        for cid in [c for c, order in self._orders.items() if order[0][2] < oldest]:
+            del self._orders[cid]
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+
+    async def warm(self, db, max_seq: int = None):
+        """
+        加载近期交易日的聚合和各合约最新的持仓成本。max_seq 为当前日志的最大序号，
+        文档里记录的序号比它还大说明日志已被重建，此时不再用序号去重。
+        """
+        try:
+            async for doc in db.trade_analytics.find({"trading_day": {"$gte": self._oldest_day()}}).sort("trading_day", 1):
+                doc.pop("_id", None)
+                doc.pop("updated_at", None)
+                if max_seq is not None and doc.get("seq", 0) > max_seq:
+                    doc["seq"] = 0
+                agg = {**_new_aggregate(doc["account_id"], doc["symbol"], doc["trading_day"]), **doc}
+                self.aggregates[(doc["account_id"], doc["symbol"], doc["trading_day"])] = agg
+                self._books[(doc["account_id"], doc["symbol"])] = dict(agg["book"])
+            logger.info(f"Analytics warmed: {len(self.aggregates)} aggregates")
+        except Exception as e:
+            logger.error(f"Failed to warm analytics: {e}")
+
+
+analytics = TradeAnalytics()
@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from bson import ObjectId
+from ..core.config import settings
+from .analytics import trading_day, trading_day_start, trading_days_back
+from .documents import epoch_ms, utc_datetime
+
+logger = logging.getLogger(__name__)
+
+# 归档的集合：按交易日分区写入 ARCHIVE_DIR/<集合>/<YYYYMMDD>.parquet，水位记录在 ARCHIVE_DIR/<集合>/manifest.json
+COLLECTIONS = ("trades", "orders", "equity_snapshots")
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _to_ms(value, collection: str) -> int:
+    # trades / orders 的 timestamp 为 UTC datetime，权益快照为本地时间 datetime
+    if isinstance(value, datetime) and collection == "equity_snapshots":
+        return int(value.timestamp() * 1000)
+    return epoch_ms(value)
+
+
+def time_bound(collection: str, ms: int) -> datetime:
+    """把毫秒时间戳换成该集合 timestamp 字段的类型，用于查询条件。"""
+    return datetime.fromtimestamp(ms / 1000) if collection == "equity_snapshots" else utc_datetime(ms)
+
+
+def _sort_key(doc):
+    return doc.get("timestamp") or 0, str(doc.get("_id", ""))
+
+
+def _table(rows: list) -> pa.Table:
+    # 按所有行的字段并集逐列建表：from_pylist 只按首行推断结构，首行缺少的字段（如 trade_id）会被丢弃
+    columns = {}
+    for name in dict.fromkeys(key for row in rows for key in row):
+        values = [row.get(name) for row in rows]
+        try:
+            columns[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # 同一字段在历史数据中类型不一致（如 status 既有 "3" 又有 3）时，该列统一存为字符串
+            columns[name] = pa.array([None if v is None else str(v) for v in values], pa.string())
+    return pa.table(columns)
+
+
+def _doc(row: dict) -> dict:
+    # 还原为与 Mongo 文档一致的结构：去掉空列，_id 还原为 ObjectId 以便与热数据统一排序和生成翻页游标
+    doc = {k: v for k, v in row.items() if v is not None}
+    if ObjectId.is_valid(doc.get("_id")):
+        doc["_id"] = ObjectId(doc["_id"])
+    return doc
+
+
+def _column(table: pa.Table, name: str):
+    return table.column(name) if name in table.column_names else pa.nulls(table.num_rows)
+
+
+def _project(table: pa.Table, projection: dict) -> list:
+    """
+    在列上执行与 Mongo 相同的投影（serializers 中的 *_PROJECTION），得到与热数据一致的展示结构。
+    只支持投影里用到的 1 / $toString / $toLong / $ifNull / $dateToString。
+    """
+    columns = {}
+    for name, spec in projection.items():
+        if spec == 0:
+            continue
+        if spec == 1:
+            columns[name] = _column(table, name)
+            continue
+        (op, arg), = spec.items()
+        if op == "$toString":
+            columns[name] = _column(table, arg[1:]).cast(pa.string())
+        elif op == "$toLong":
+            column = _column(table, arg[1:])
+            if pa.types.is_timestamp(column.type):
+                column = column.cast(pa.timestamp("ms"), safe=False)
+            columns[name] = column.cast(pa.int64())
+        elif op == "$ifNull":
+            column = _column(table, arg[0][1:])
+            if pa.types.is_null(column.type):
+                # 分区中没有该列（如全部成交都没有 trade_id）：null 类型不能 fill_null，直接生成默认值列
+                column = pa.array([arg[1]] * table.num_rows)
+            columns[name] = pc.fill_null(column, arg[1])
+        elif op == "$dateToString":
+            # 毫秒精度的时间戳按 %S 输出时带三位小数，即 Mongo 的 %S.%L
+            column = _column(table, arg["date"][1:]).cast(pa.timestamp("ms"), safe=False)
+            columns[name] = pc.strftime(column, format=arg["format"].replace("%S.%L", "%S"))
+        else:
+            raise ValueError(f"Unsupported projection operator {op}")
+    return pa.table(columns).to_pylist()
+
+
+class ColdStore:
+    """
+    冷数据：超过 ARCHIVE_AFTER_TRADING_DAYS 个交易日的成交、报单、权益快照按交易日写成 Parquet 分区并从 Mongo 删除。
+    分区写入后不再修改（补归档时整体重写），读取时内存映射、按账户和时间下推过滤；
+    水位之前的数据只在冷数据中，历史接口的时间范围越过水位时与 Mongo 结果合并。
+    """
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.ARCHIVE_DIR)
+        self._manifests: dict[str, tuple] = {}   # collection -> (mtime, manifest)
+
+    def _dir(self, collection: str) -> Path:
+        return self.root / collection
+
+    def _manifest(self, collection: str) -> dict:
+        path = self._dir(collection) / "manifest.json"
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        cached = self._manifests.get(collection)
+        if cached is None or cached[0] != mtime:
+            cached = self._manifests[collection] = (mtime, json.loads(path.read_text()))
+        return cached[1]
+
+    def watermark(self, collection: str) -> int:
+        """毫秒时间戳，早于它的记录已归档；0 表示没有冷数据。"""
+        return self._manifest(collection).get("watermark", 0)
+
+    def partitions(self, collection: str) -> list:
+        return sorted(p.stem for p in self._dir(collection).glob("*.parquet"))
+
+    def _write_manifest(self, collection: str, manifest: dict):
+        path = self._dir(collection) / "manifest.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, path)
+
+    def write_partition(self, collection: str, day: str, docs: list) -> int:
+        """把一个交易日的文档写入分区（与已有分区按 _id 去重合并），先写临时文件再替换。"""
+        directory = self._dir(collection)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{day}.parquet"
+        rows = {str(doc["_id"]): {**doc, "_id": str(doc["_id"])} for doc in docs}
+        if path.exists():
+            for row in pq.read_table(path).to_pylist():
+                rows.setdefault(row["_id"], row)
+        ordered = sorted(rows.values(), key=_sort_key)
+        table = _table(ordered)
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp, compression=settings.ARCHIVE_COMPRESSION)
+        # 读回校验行数和列：之后会从 Mongo 删除这些记录，分区不完整时宁可中止
+        written = pq.read_metadata(tmp)
+        names = set(pq.read_schema(tmp).names)
+        if written.num_rows != len(ordered) or names != set(table.column_names):
+            tmp.unlink(missing_ok=True)
+            raise ValueError(f"Partition {collection}/{day} verification failed: "
+                             f"{written.num_rows}/{len(ordered)} rows, columns {sorted(names)}")
+        os.replace(tmp, path)
+        return len(ordered)
+
+    def read_partition(self, collection: str, day: str) -> list:
+        """读出一个分区的全部文档（迁移工具重写分区时使用）。"""
+        return [_doc(row) for row in pq.read_table(self._dir(collection) / f"{day}.parquet").to_pylist()]
+
+    def _days(self, collection: str, start, end, descending: bool) -> list:
+        first = trading_day(_to_ms(start, collection)) if start is not None else ""
+        last = trading_day(_to_ms(end, collection)) if end is not None else "99999999"
+        days = [day for day in self.partitions(collection) if first <= day <= last]
+        return days[::-1] if descending else days
+
+    def _read(self, collection: str, day: str, account_id, start, end):
+        filters = []
+        if account_id:
+            filters.append(("account_id", "==", account_id))
+        if start is not None:
+            filters.append(("timestamp", ">=", start))
+        if end is not None:
+            filters.append(("timestamp", "<=", end))
+        return pq.read_table(self._dir(collection) / f"{day}.parquet", memory_map=True, filters=filters or None)
+
+    def query(self, collection: str, account_id: str = None, start=None, end=None, before: tuple = None,
+              limit: int = None, descending: bool = True, projection: dict = None) -> list:
+        """
+        按时间排序返回冷数据；start / end 与该集合的 timestamp 同类型，before 为翻页游标 (timestamp, _id)，只取严格早于它的记录。
+        给出 projection 时返回投影后的展示结构，否则返回文档。分区按交易日有序，取满 limit 条即停止读取更早（或更晚）的分区。
+        """
+        if before is not None:
+            end = before[0] if end is None else min(end, before[0])
+        order = "descending" if descending else "ascending"
+        rows = []
+        for day in self._days(collection, start, end, descending):
+            table = self._read(collection, day, account_id, start, end)
+            if not table.num_rows:
+                continue
+            table = table.sort_by([("timestamp", order), ("_id", order)])
+            if before is not None:
+                ts, last_id = before
+                table = table.filter(pc.or_(pc.less(table["timestamp"], pa.scalar(ts, table["timestamp"].type)),
+                                            pc.and_(pc.equal(table["timestamp"], pa.scalar(ts, table["timestamp"].type)),
+                                                    pc.less(table["_id"], str(last_id)))))
+            if limit is not None:
+                table = table.slice(0, limit - len(rows))
+            rows.extend(_project(table, projection) if projection else [_doc(row) for row in table.to_pylist()])
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def scan(self, collection: str, account_id: str = None, start=None, end=None, projection: dict = None):
+        """按时间正序逐分区输出冷数据（给出 projection 时为展示结构），供流式导出使用。"""
+        for day in self._days(collection, start, end, descending=False):
+            table = self._read(collection, day, account_id, start, end).sort_by([("timestamp", "ascending"), ("_id", "ascending")])
+            for batch in table.to_batches(ARCHIVE_BATCH_SIZE):
+                batch = pa.Table.from_batches([batch])
+                yield from _project(batch, projection) if projection else (_doc(row) for row in batch.to_pylist())
+
+    def reaches(self, collection: str, start) -> bool:
+        """请求的时间范围（start 为空表示不限）是否可能包含已归档的记录。"""
+        watermark = self.watermark(collection)
+        return bool(watermark) and (start is None or _to_ms(start, collection) < watermark)
+
+    def cutoff(self, days: int = None) -> int:
+        """当前交易日往前 days 个交易日的起点（毫秒），早于它的记录应归档。"""
+        day = trading_days_back(trading_day(), settings.ARCHIVE_AFTER_TRADING_DAYS if days is None else days)
+        return int(trading_day_start(day).timestamp() * 1000)
+
+    async def archive(self, db, collection: str, cutoff_ms: int) -> tuple:
+        """
+        把 timestamp 早于 cutoff_ms 的记录按交易日写入分区，每个分区写完后再从 Mongo 删除。
+        先推进水位再搬移：搬移期间同一记录可能同时出现在冷热两侧，读取时按 _id 去重；中途失败可重新执行。
+        返回 (归档条数, 分区数)。
+        """
+        sample = await db[collection].find_one({}, {"timestamp": 1})
+        if sample is None or "timestamp" not in sample:
+            return 0, 0
+        manifest = self._manifest(collection)
+        self._dir(collection).mkdir(parents=True, exist_ok=True)
+        self._write_manifest(collection, {**manifest, "watermark": max(manifest.get("watermark", 0), cutoff_ms)})
+
+        cursor = db[collection].find({"timestamp": {"$lt": time_bound(collection, cutoff_ms)}})
+        cursor = cursor.sort([("timestamp", 1), ("_id", 1)]).batch_size(ARCHIVE_BATCH_SIZE)
+        moved = days = 0
+        day, docs = None, []
+        async for doc in cursor:
+            doc_day = trading_day(_to_ms(doc["timestamp"], collection))
+            if doc_day != day and docs:
+                moved += await self._move(db, collection, day, docs)
+                days += 1
+                docs = []
+            day = doc_day
+            docs.append(doc)
+        if docs:
+            moved += await self._move(db, collection, day, docs)
+            days += 1
+        return moved, days
+
+    async def _move(self, db, collection: str, day: str, docs: list) -> int:
+        total = self.write_partition(collection, day, docs)
+        ids = [doc["_id"] for doc in docs]
+        for i in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+            await db[collection].delete_many({"_id": {"$in": ids[i:i + ARCHIVE_BATCH_SIZE]}})
+        logger.info(f"Archived {len(docs)} {collection} of trading day {day} ({total} rows in partition)")
+        return len(docs)
+
+
+def merge_desc(hot: list, cold: list, limit: int, time_field: str) -> list:
+    """合并冷热两侧按时间倒序的投影结果，按 (time_field, id) 排序、按 id 去重后取前 limit 条。"""
+    seen = set()
+    merged = []
+    for row in sorted(hot + cold, key=lambda r: (r[time_field], r["id"]), reverse=True):
+        if row["id"] not in seen:
+            seen.add(row["id"])
+            merged.append(row)
+    return merged[:limit]
+
+
+cold_store = ColdStore()
@@ -0,0 +1,105 @@
+import time
+from datetime import datetime, timedelta, timezone
+from ..models.schemas import RtnMessage, TradeMessage
+
+# 引擎消息 -> MongoDB 规范文档（结构见 models/schemas.py 的 Trade / Order / EquitySnapshot）
+# 兼容字段名（price / limit_price、vol_total / volume_total 等）只在这里归一，读接口不再做回退
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+def utc_datetime(ms: int) -> datetime:
+    """毫秒时间戳 -> 不带时区的 UTC datetime（与 Motor 读出的类型一致）。"""
+    return _EPOCH + ms * _MS
+
+
+def epoch_ms(value) -> int:
+    """UTC datetime（不带时区视为 UTC）或旧文档中的毫秒整数 -> 毫秒时间戳。"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - _EPOCH) // _MS
+    return int(value or 0)
+
+
+def trade_document(msg: TradeMessage, default_ms: int = None, order: dict = None) -> dict:
+    """
+    协议中的成交回报只带 client_id / trade_id / price / volume / timestamp，
+    账户、合约、方向、开平、order_ref 取自 order（该 client_id 在 order_book 中的报单），消息中带了则以消息为准。
+    """
+    ts = msg.timestamp
+    if ts is None:
+        ts = msg.trade_time if isinstance(msg.trade_time, int) else default_ms or int(time.time() * 1000)
+    order = order or {}
+    doc = {
+        "account_id": msg.account_id or order.get("account_id") or "default",
+        "client_id": msg.client_id,
+        "order_ref": msg.order_ref or order.get("order_ref") or "",
+        "symbol": msg.symbol or order.get("symbol") or "",
+        "direction": msg.direction or order.get("direction") or "",
+        "offset": msg.offset or order.get("offset") or "",
+        "price": float(msg.price or 0.0),
+        "volume": int(msg.volume or 0),
+        "timestamp": utc_datetime(ts),
+    }
+    # 没有 trade_id 的成交不写该字段，避免与 (client_id, trade_id) 唯一索引冲突
+    if msg.trade_id is not None:
+        doc["trade_id"] = str(msg.trade_id)
+    return doc
+
+
+def new_order(client_id: int, default_ms: int = None) -> dict:
+    """首个 rtn 到达前的报单文档，之后由 order_fields 逐条覆盖。"""
+    return {
+        "account_id": "default",
+        "client_id": client_id,
+        "order_ref": "",
+        "order_sys_id": "",
+        "symbol": "",
+        "direction": "",
+        "offset": "",
+        "status": "",
+        "limit_price": 0.0,
+        "volume_total": 0,
+        "volume_traded": 0,
+        "msg": "",
+        "timestamp": utc_datetime(default_ms or int(time.time() * 1000)),
+    }
+
+
+def order_fields(msg: RtnMessage) -> dict:
+    """一条 rtn 带来的报单字段（只含消息中出现的），已换成规范字段名和类型。"""
+    fields = {}
+    for name in ("account_id", "order_ref", "order_sys_id", "symbol", "direction", "offset"):
+        value = getattr(msg, name)
+        if value is not None:
+            fields[name] = str(value)
+    if msg.status is not None:
+        fields["status"] = str(msg.status)
+    price = msg.price if msg.price is not None else msg.limit_price
+    if price is not None:
+        fields["limit_price"] = float(price)
+    total = msg.vol_total if msg.vol_total is not None else msg.volume_total
+    if total is not None:
+        fields["volume_total"] = int(total)
+    traded = msg.vol_traded if msg.vol_traded is not None else msg.volume_traded
+    if traded is not None:
+        fields["volume_traded"] = int(traded)
+    text = msg.msg if msg.msg is not None else msg.status_msg
+    if text is not None:
+        fields["msg"] = text
+    if msg.timestamp is not None:
+        fields["timestamp"] = utc_datetime(msg.timestamp)
+    return fields
+
+
+def equity_document(account_id: str, timestamp: datetime, balance, available, pnl) -> dict:
+    # 权益快照的 timestamp 为本地时间（与 equity_rollups 的分桶一致）
+    return {
+        "account_id": account_id,
+        "timestamp": timestamp,
+        "balance": float(balance or 0.0),
+        "available": float(available or 0.0),
+        "pnl": float(pnl or 0.0),
+    }
@@ -1,150 +1,422 @@
 import asyncio
 import json
 import logging
+import msgspec
 import websockets
 from collections import defaultdict
-from ..db.mongodb import get_database
+from time import perf_counter, time_ns
+from datetime import datetime
+from typing import Union
 from ..core.config import settings
+from ..core.log import SampledLog
+from ..core.metrics import (
+    registry, ENGINE_MESSAGES, ENGINE_DECODE_SECONDS, ENGINE_HANDLE_SECONDS,
+    ENGINE_ERRORS, ENGINE_CONNECTED, ENGINE_RECONNECTS,
+)
+from ..models.schemas import (
+    ENGINE_MESSAGE_TYPES, RtnMessage, TradeMessage, AccountMessage,
+    PosSnapshotMessage, StatusMessage, TickMessage,
+)
+from .write_pipeline import WriteOp, write_pipeline
+from .stream_hub import stream_hub
+from .state_store import state_store
+from .equity_rollup import equity_rollup
+from .documents import trade_document, equity_document
+from .serializers import trade_view, order_view, status_view
+from .order_latency import order_latency, OrderTicket
+from .order_throttle import order_throttle
+from .order_book import order_book
+from .journal import journal, received_time
 
 logger = logging.getLogger(__name__)
+_log = SampledLog(logger)
 
-class EngineClient:
-    def __init__(self):
-        self.ws_url = settings.ENGINE_WS_URL
+
+class _Header(msgspec.Struct):
+    type: str = ""
+
+_decoder = msgspec.json.Decoder(Union[ENGINE_MESSAGE_TYPES])
+_header_decoder = msgspec.json.Decoder(_Header)
+_KNOWN_TYPES = {t.__struct_config__.tag for t in ENGINE_MESSAGE_TYPES}
+_TICK_MARKERS = ('"type":"tick"', '"type": "tick"')
+# 每种消息类型的计数器和耗时直方图预先取好，热路径上不再按标签查找
+_TYPE_METRICS = {
+    t: (ENGINE_MESSAGES.labels(t.__struct_config__.tag), ENGINE_HANDLE_SECONDS.labels(t.__struct_config__.tag))
+    for t in ENGINE_MESSAGE_TYPES
+}
+_TICKS_SKIPPED = ENGINE_MESSAGES.labels("tick_skipped")
+_INVALID = ENGINE_MESSAGES.labels("invalid")
+_DECODE_ERRORS = ENGINE_ERRORS.labels("decode")
+_HANDLE_ERRORS = ENGINE_ERRORS.labels("handle")
+
+def _is_tick(message) -> bool:
+    if isinstance(message, (bytes, bytearray)):
+        return any(m.encode() in message for m in _TICK_MARKERS)
+    return any(m in message for m in _TICK_MARKERS)
+
+class EngineConnection:
+    """
+    与一个引擎实例的连接：独立的读循环、写任务、出站队列和重连状态，互不阻塞。
+    收到的帧交给 EngineClient.handle_message 统一解码分发；accounts 为该引擎负责的账户（配置或从消息中学到）。
+    """
+
+    def __init__(self, client: "EngineClient", name: str, url: str, accounts=()):
+        self.client = client
+        self.name = name
+        self.url = url
+        self.accounts: set[str] = set(accounts)
         self.ws = None
-        self._lock = asyncio.Lock()
-        self.pos_cache = {} # symbol -> position_dict
+        # 出站队列：(已序列化的报文, 报单跟踪记录或 None)，由连接期间的写任务独占发送
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self.failures = 0
+        self.last_error: str = None
+        self.connected_since: datetime = None
+        self._connected = ENGINE_CONNECTED.labels(name)
+        self._reconnects = ENGINE_RECONNECTS.labels(name)
 
-    async def connect(self):
+    async def run(self):
         while True:
+            writer = None
             try:
-                print(f"DEBUG: Attempting to connect to Engine WebSocket at {self.ws_url}")
-                async with websockets.connect(self.ws_url) as websocket:
-                    async with self._lock:
-                        self.ws = websocket
-                    logger.info(f"Connected to Engine WebSocket at {self.ws_url}")
-                    print(f"DEBUG: Successfully connected to {self.ws_url}")
+                _log.info("engine_connecting", engine=self.name, url=self.url)
+                async with websockets.connect(self.url) as websocket:
+                    writer = asyncio.create_task(self._writer(websocket))
+                    self.ws = websocket
+                    self._connected.set(1)
+                    self.failures = 0
+                    self.connected_since = datetime.now()
+                    self.publish_health()
+                    logger.info(f"Connected to engine {self.name} at {self.url}")
+                    client = self.client
                     while True:
                         message = await websocket.recv()
-                        await self.handle_message(message)
+                        # 先写日志再处理，落库失败或进程退出后可从检查点回放
+                        if journal.enabled and (settings.JOURNAL_TICKS or not _is_tick(message)):
+                            received_us = time_ns() // 1000
+                            seq = journal.append(message, received_us)
+                            if seq:
+                                write_pipeline.begin(seq)
+                                client.handle_message(message, received_time(received_us), self)
+                                continue
+                        client.handle_message(message, connection=self)
             except Exception as e:
-                logger.error(f"WebSocket connection error: {e}. Retrying in 5s...")
-                print(f"DEBUG: WebSocket connection error: {e}")
-                async with self._lock:
-                    self.ws = None
-                await asyncio.sleep(5)
+                self.failures += 1
+                self.last_error = str(e)
+                _log.error("engine_connection_error", engine=self.name, url=self.url, error=str(e),
+                           failures=self.failures, retry_in=5)
+            self.ws = None
+            self.connected_since = None
+            self._connected.set(0)
+            self.publish_health()
+            if writer:
+                writer.cancel()
+            self._drop_outbox()
+            await asyncio.sleep(5)
+            self._reconnects.inc()
+
+    async def _writer(self, websocket):
+        # 唯一的发送方：报文在入队前已序列化，这里只负责打点和写 socket
+        while True:
+            payload, ticket = await self._outbox.get()
+            if ticket is not None:
+                ticket.mark_sent()
+            await websocket.send(payload)
+
+    def _drop_outbox(self):
+        dropped = 0
+        while not self._outbox.empty():
+            self._outbox.get_nowait()
+            dropped += 1
+        if dropped:
+            logger.error(f"Engine {self.name} disconnected, dropped {dropped} unsent outbound messages")
+
+    def enqueue(self, payload: dict, ticket=None) -> bool:
+        # 未连接时立即拒绝，不排队等待重连
+        if self.ws is None:
+            return False
+        self._outbox.put_nowait((json.dumps(payload), ticket))
+        return True
+
+    def health(self) -> dict:
+        if self.ws is not None:
+            return {"code": "0", "msg": f"{self.url} connected since {self.connected_since:%H:%M:%S}"}
+        return {"code": "-1", "msg": f"{self.url} disconnected ({self.failures} failures): {self.last_error or ''}"}
+
+    def publish_health(self, accounts=None):
+        """连接状态以 source = engine:<name> 写入各账户的连接状态（只在内存中，不落库）。"""
+        source = f"engine:{self.name}"
+        health = self.health()
+        for account_id in accounts or self.accounts:
+            data = {**health, "account_id": account_id, "source": source}
+            state_store.apply_status(account_id, source, data)
+            stream_hub.publish("status", account_id, source, status_view, data)
+
+
+class EngineClient:
+    """
+    引擎连接管理：按 ENGINES 配置为每个引擎实例建立一个 EngineConnection，
+    报单 / 撤单按 account_id 路由到负责该账户的连接；所有连接收到的消息共用同一套解码和处理函数。
+    """
+
+    def __init__(self, engines: dict = None):
+        self.connections: dict[str, EngineConnection] = {}
+        self._routes: dict[str, EngineConnection] = {}   # account_id -> 连接
+        self._configured: set[str] = set()               # 配置中指定了归属的账户，不会被学习覆盖
+        for name, engine in (engines or settings.ENGINES or {"default": {"url": settings.ENGINE_WS_URL}}).items():
+            self.add_connection(name, engine["url"], engine.get("accounts", ()))
+        self._received_at: datetime = None   # 回放时为日志中记录的接收时间
+        # 消息类型 -> 处理函数列表，行情等模块可通过 register_handler 追加
+        self._handlers: dict[type, list] = {}
+        self.register_handler(RtnMessage, self._on_rtn)
+        self.register_handler(TradeMessage, self._on_trade)
+        self.register_handler(AccountMessage, self._on_account)
+        self.register_handler(PosSnapshotMessage, self._on_pos_snapshot)
+        self.register_handler(StatusMessage, self._on_status)
+        self.register_handler(RtnMessage, order_latency.on_rtn)
+        self.register_handler(TradeMessage, order_latency.on_trade)
+
+    def add_connection(self, name: str, url: str, accounts=()) -> EngineConnection:
+        connection = self.connections[name] = EngineConnection(self, name, url, accounts)
+        for account_id in connection.accounts:
+            self._routes[account_id] = connection
+            self._configured.add(account_id)
+        return connection
+
+    async def connect(self):
+        """并发运行所有引擎连接，各自独立重连。"""
+        await asyncio.gather(*(connection.run() for connection in self.connections.values()))
+
+    def _learn(self, account_id: str, connection: EngineConnection):
+        # 从引擎推送的消息中学到账户归属；配置指定的归属优先
+        if account_id in self._configured:
+            if self._routes[account_id] is not connection:
+                _log.warning("engine_account_conflict", account_id=account_id, engine=connection.name,
+                             configured=self._routes[account_id].name)
+            connection.accounts.add(account_id)
+            return
+        previous = self._routes.get(account_id)
+        if previous is not None and previous is not connection:
+            previous.accounts.discard(account_id)
+        self._routes[account_id] = connection
+        connection.accounts.add(account_id)
+        logger.info(f"Account {account_id} routed to engine {connection.name}")
+        connection.publish_health([account_id])
+
+    def route(self, account_id: str = None):
+        """负责该账户的连接；只有一个引擎时所有账户都走它。"""
+        connection = self._routes.get(account_id) if account_id else None
+        if connection is None and len(self.connections) == 1:
+            connection = next(iter(self.connections.values()))
+        return connection
 
-    async def handle_message(self, message):
+    def register_handler(self, message_type, handler):
+        """为某种引擎消息注册处理函数，同一类型可注册多个，按注册顺序调用。"""
+        self._handlers.setdefault(message_type, []).append(handler)
+
+    def replay(self, records) -> int:
+        """按序重新处理日志记录 (seq, received_us, payload)，落库操作照常进入 write_pipeline。"""
+        count = 0
+        for seq, received_us, payload in records:
+            write_pipeline.begin(seq)
+            self.handle_message(payload, received_time(received_us))
+            count += 1
+        return count
+
+    def handle_message(self, message, received_at: datetime = None, connection: EngineConnection = None):
+        # 只解析并入队，落库由 write_pipeline 的写入任务批量完成，不阻塞接收循环
+        self._received_at = received_at
         try:
-            data = json.loads(message)
-            msg_type = data.get("type")
-            
-            # print(f"DEBUG: Received message type: {msg_type}") # Too noisy for all ticks
-            
-            db = get_database()
-            if db is None:
+            # 没有订阅行情时 tick 只做字符串匹配即丢弃，不做完整解码
+            if TickMessage not in self._handlers and _is_tick(message):
+                _TICKS_SKIPPED.inc()
                 return
+            start = perf_counter()
+            msg = _decoder.decode(message)
+            ENGINE_DECODE_SECONDS.observe(perf_counter() - start)
+        except msgspec.ValidationError as e:
+            # 未知消息类型直接忽略，已知类型字段不合法才记录
+            try:
+                msg_type = _header_decoder.decode(message).type
+            except msgspec.DecodeError:
+                msg_type = None
+            _INVALID.inc()
+            if msg_type in _KNOWN_TYPES:
+                _DECODE_ERRORS.inc()
+                _log.error("engine_invalid_message", msg_type=msg_type, error=str(e))
+            return
+        except msgspec.DecodeError as e:
+            _DECODE_ERRORS.inc()
+            _log.error("engine_decode_error", error=str(e))
+            return
+
+        counter, latency = _TYPE_METRICS[type(msg)]
+        counter.inc()
+        if connection is not None:
+            account_id = getattr(msg, "account_id", None)
+            if account_id and account_id not in connection.accounts:
+                self._learn(account_id, connection)
+        start = perf_counter()
+        for handler in self._handlers.get(type(msg), ()):
+            try:
+                handler(msg)
+            except Exception as e:
+                _HANDLE_ERRORS.inc()
+                _log.error("engine_handler_error", msg_type=type(msg).__struct_config__.tag,
+                           handler=getattr(handler, "__qualname__", repr(handler)), error=str(e))
+        latency.observe(perf_counter() - start)
+
+    def _on_rtn(self, msg: RtnMessage):
+        # 协议规定使用 client_id 作为客户端唯一标识；同一报单的多条回报由 order_book 合并后写库
+        if not order_book.apply(msg):
+            return
+        order = order_book.get(msg.client_id)
+        stream_hub.publish("orders", order["account_id"], msg.client_id, order_view, order)
+
+    def _on_trade(self, msg: TradeMessage):
+        # 账户、合约等字段由对应报单补全，成交按真实账户落库和推送
+        # 消息没有时间时取日志中记录的接收时间，回放得到相同的文档
+        received_ms = int(self._received_at.timestamp() * 1000) if self._received_at else None
+        doc = trade_document(msg, received_ms, order=order_book.get(msg.client_id))
+        if "trade_id" in doc:
+            key = {"client_id": msg.client_id, "trade_id": doc["trade_id"]}
+        else:
+            # 没有 trade_id 的成交以 (client_id, timestamp, volume) 为键
+            key = {"client_id": msg.client_id, "timestamp": doc["timestamp"], "volume": doc["volume"], "trade_id": {"$exists": False}}
+        # 按键幂等写入，日志回放不会产生重复成交
+        write_pipeline.submit("trades", WriteOp("update", key, {"$set": doc}, upsert=True), account_id=doc["account_id"])
+        stream_hub.publish("trades", doc["account_id"], None, trade_view, doc)
+
+    def _on_account(self, msg: AccountMessage):
+        data = msgspec.to_builtins(msg)
+        # 更新账户资金信息
+        account_id = msg.account_id or "default"
+        state_store.apply_account(account_id, data)
+        write_pipeline.submit("account", WriteOp(
+            "update",
+            {"account_id": account_id},
+            {"$set": data},
+            upsert=True
+        ))
+        stream_hub.publish("account", account_id, account_id, state_store.get_account, account_id)
+        # 记录权益快照用于历史曲线，同时更新 1s/1m/1h 聚合
+        now = self._received_at or datetime.now()
+        equity_rollup.update(account_id, now, data)
+        snapshot = equity_document(account_id, now, msg.balance, msg.available, msg.pnl)
+        write_pipeline.submit("equity_snapshots", WriteOp(
+            "update",
+            {"account_id": account_id, "timestamp": now},
+            {"$set": snapshot},
+            upsert=True
+        ))
+
+    def _on_pos_snapshot(self, msg: PosSnapshotMessage):
+        # Group positions by account_id
+        positions_by_account = defaultdict(list)
+        for pos in msg.data:
+            if not pos.symbol: continue
+            # Extract account_id for this specific position item
+            positions_by_account[pos.account_id or "default"].append(msgspec.to_builtins(pos))
+
+        # Update DB for each account present in the snapshot
+        # Note: This logic assumes the snapshot contains ALL positions for the included accounts.
+        # If an account is not in the snapshot, its DB data remains touched.
+        for acc_id, acc_positions in positions_by_account.items():
+            # 与上次应用的快照比较，只写入变化的行，无变化则整个账户跳过
+            changed, removed = state_store.apply_positions(acc_id, acc_positions)
+            if not changed and not removed:
+                continue
+            logger.info(f"Updating positions for account {acc_id}: {len(changed)} changed, {len(removed)} removed")
 
-            if msg_type == "rtn":
-                # 协议规定使用 client_id 作为客户端唯一标识
-                await db.orders.update_one(
-                    {"client_id": data["client_id"]},
-                    {"$set": data},
-                    upsert=True
-                )
-            elif msg_type == "trade":
-                await db.trades.insert_one(data)
-            elif msg_type == "account":
-                # 更新账户资金信息
-                # print(f"Saving account data to DB: {data}")
-                account_id = data.get("account_id") or "default"
-                await db.account.update_one(
-                    {"account_id": account_id},
-                    {"$set": data},
-                    upsert=True
-                )
-                # 记录权益快照用于历史曲线
-                from datetime import datetime
-                snapshot = {
-                    "account_id": account_id,
-                    "timestamp": datetime.now(),
-                    "balance": data.get("balance", 0.0),
-                    "available": data.get("available", 0.0),
-                    "pnl": data.get("pnl", 0.0)
-                }
-                await db.equity_snapshots.insert_one(snapshot)
-            elif msg_type == "pos_snapshot":
-                incoming_data = data.get("data", [])
-                
-                # Group positions by account_id
-                positions_by_account = defaultdict(list)
-                
-                for pos in incoming_data:
-                    symbol = pos.get("symbol")
-                    if not symbol: continue
-                    
-                    # Extract account_id for this specific position item
-                    acc_id = pos.get("account_id") or "default"
-                    positions_by_account[acc_id].append(pos)
-                    
-                    # Optional: Update memory cache if needed (though DB is primary source of truth now)
-                    # self.pos_cache[(acc_id, symbol)] = pos
-
-                # Update DB for each account present in the snapshot
-                # Note: This logic assumes the snapshot contains ALL positions for the included accounts.
-                # If an account is not in the snapshot, its DB data remains touched.
-                for acc_id, acc_positions in positions_by_account.items():
-                    logger.info(f"Updating positions for account {acc_id}: {len(acc_positions)} items")
-                    
-                    # 1. Delete existing positions for this account
-                    await db.positions.delete_many({"account_id": acc_id})
-                    
-                    # 2. Insert new positions
-                    if acc_positions:
-                        await db.positions.insert_many(acc_positions)
-
-            elif msg_type == "status":
-                print(f"DEBUG: Processing STATUS message: {data}")
-                account_id = data.get("account_id", "default")
-                source = data.get("source", "CTP")
-                await db.connection_status.update_one(
-                    {"account_id": account_id, "source": source},
-                    {"$set": data},
-                    upsert=True
-                )
-            elif msg_type == "tick":
-                pass
-
-        except Exception as e:
-            logger.error(f"Error handling message: {e}")
-            print(f"DEBUG: Error handling message: {e}")
+            ops = [WriteOp("replace", {"account_id": acc_id, "symbol": row["symbol"]}, row, upsert=True) for row in changed]
+            if removed:
+                ops.append(WriteOp("delete", {"account_id": acc_id, "symbol": {"$in": removed}}))
+            write_pipeline.submit("positions", *ops)
+            stream_hub.publish("positions", acc_id, acc_id, state_store.get_positions, acc_id)
+
+    def _on_status(self, msg: StatusMessage):
+        data = msgspec.to_builtins(msg)
+        account_id = msg.account_id or "default"
+        source = msg.source or "CTP"
+        _log.debug("engine_status", account_id=account_id, source=source, code=msg.code, msg=msg.msg)
+        state_store.apply_status(account_id, source, data)
+        write_pipeline.submit("connection_status", WriteOp(
+            "update",
+            {"account_id": account_id, "source": source},
+            {"$set": data},
+            upsert=True
+        ))
+        stream_hub.publish("status", account_id, source, status_view, data)
+
+    async def _submit_order(self, order_data: dict, wait: bool = False):
+        # 先按账户限速再入队；返回报单跟踪记录，未连接时返回 None
+        account_id = order_data.get("account_id")
+        connection = self.route(account_id)
+        if connection is None or connection.ws is None:
+            return None
+        await order_throttle.acquire(account_id)
+        ticket = order_latency.track(order_data)
+        if wait:
+            ticket.waiter = asyncio.get_running_loop().create_future()
+        return ticket if connection.enqueue({"action": "order", **order_data}, ticket) else None
+
+    async def _submit_cancel(self, client_id, symbol, account_id=None):
+        try:
+            # 协议要求 client_id 为 18位整数，此处需强制转换
+            int_client_id = int(client_id)
+        except ValueError:
+            logger.error(f"Invalid client_id format: {client_id}")
+            return None
+        connection = self.route(account_id)
+        if connection is None or connection.ws is None:
+            return None
+        await order_throttle.acquire(account_id)
+        payload = {
+            "action": "cancel",
+            "client_id": int_client_id,
+            "account_id": account_id,
+            "symbol": symbol
+        }
+        logger.info(f"Sending cancel request to engine {connection.name}: {payload}")
+        # 撤单不参与延迟统计，跟踪记录只用来取发送时刻
+        ticket = OrderTicket(payload)
+        return ticket if connection.enqueue(payload, ticket) else None
 
     async def send_order(self, order_data):
-        async with self._lock:
-            if self.ws:
-                payload = {"action": "order", **order_data}
-                await self.ws.send(json.dumps(payload))
-                return True
-        return False
+        return await self._submit_order(order_data) is not None
 
     async def cancel_order(self, client_id, symbol, account_id=None):
-        async with self._lock:
-            if self.ws:
-                try:
-                    # 协议要求 client_id 为 18位整数，此处需强制转换
-                    int_client_id = int(client_id)
-                    payload = {
-                        "action": "cancel",
-                        "client_id": int_client_id,
-                        "account_id": account_id,
-                        "symbol": symbol
-                    }
-                    logger.info(f"Sending cancel request: {payload}")
-                    await self.ws.send(json.dumps(payload))
-                    return True
-                except ValueError:
-                    logger.error(f"Invalid client_id format: {client_id}")
-                    return False
-        return False
-
-engine_client = EngineClient()
\ No newline at end of file
+        return await self._submit_cancel(client_id, symbol, account_id) is not None
+
+    async def send_orders(self, orders: list) -> list:
+        """
+        批量报单：各腿并发限速、按顺序入队，令牌充足时在同一轮事件循环内全部入队、由写任务连续发出；
+        之后最多等待 ORDER_ACK_TIMEOUT 秒，取引擎首个 rtn 分配的 client_id。
+        """
+        tickets = await asyncio.gather(*(self._submit_order(order, wait=True) for order in orders))
+        waiters = [ticket.waiter for ticket in tickets if ticket is not None]
+        if waiters:
+            await asyncio.wait(waiters, timeout=settings.ORDER_ACK_TIMEOUT)
+        return [_leg_result(ticket) for ticket in tickets]
+
+    async def cancel_orders(self, cancels: list) -> list:
+        """批量撤单：cancels 为 {client_id, symbol, account_id} 列表，限速后连续入队，不等待回报（sent_at 为空表示仍在出站队列中）。"""
+        tickets = await asyncio.gather(*(
+            self._submit_cancel(c.get("client_id"), c.get("symbol"), c.get("account_id")) for c in cancels
+        ))
+        return [_leg_result(ticket, cancel.get("client_id")) for ticket, cancel in zip(tickets, cancels)]
+
+
+def _leg_result(ticket, client_id=None) -> dict:
+    if ticket is None:
+        return {"status": "rejected", "client_id": client_id, "sent_at": None}
+    client_id = ticket.client_id or client_id
+    return {
+        "status": "acked" if ticket.client_id else "sent",
+        "client_id": str(client_id) if client_id is not None else None,
+        "sent_at": ticket.sent_ts,
+    }
+
+engine_client = EngineClient()
+
+registry.gauge_callback("hft_engine_outbox_depth", "Outbound engine messages waiting to be sent", ("engine",),
+                        lambda: {(name,): c._outbox.qsize() for name, c in engine_client.connections.items()})
@@ -0,0 +1,128 @@
+import logging
+from datetime import datetime, timedelta
+from ..core.config import settings
+from .write_pipeline import WriteOp, write_pipeline
+
+logger = logging.getLogger(__name__)
+
+# 分辨率 -> 桶长度（秒），从细到粗
+RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600}
+FIELDS = ("balance", "available", "pnl")
+
+
+def bucket_start(ts: datetime, seconds: int) -> datetime:
+    epoch = int(ts.timestamp()) // seconds * seconds
+    return datetime.fromtimestamp(epoch)
+
+
+def retention(resolution: str):
+    return {
+        "1s": settings.EQUITY_1S_RETENTION_SECONDS,
+        "1m": settings.EQUITY_1M_RETENTION_SECONDS,
+    }.get(resolution)
+
+
+class EquityRollup:
+    """
+    按账户维护权益的 1s / 1m / 1h OHLC 聚合，写入 equity_rollups。
+    未收盘的桶保存在内存中；每当 1s 桶收盘时，顺带把仍在进行中的 1m / 1h 桶写一次，
+    因此每个账户每秒最多 3 次 upsert，与引擎推送频率无关。
+    """
+
+    def __init__(self):
+        self._open: dict[tuple, dict] = {}  # (account_id, resolution) -> 桶
+
+    def update(self, account_id: str, ts: datetime, data: dict):
+        values = {f: float(data.get(f) or 0.0) for f in FIELDS}
+        second_closed = False
+        for resolution, seconds in RESOLUTIONS.items():
+            start = bucket_start(ts, seconds)
+            key = (account_id, resolution)
+            bucket = self._open.get(key)
+            if bucket is not None and bucket["timestamp"] == start:
+                for f, v in values.items():
+                    ohlc = bucket[f]
+                    ohlc["h"] = max(ohlc["h"], v)
+                    ohlc["l"] = min(ohlc["l"], v)
+                    ohlc["c"] = v
+                bucket["count"] += 1
+                if second_closed:
+                    self._persist(bucket)
+                continue
+
+            if bucket is not None:
+                self._persist(bucket)
+                second_closed = second_closed or resolution == "1s"
+            self._open[key] = {
+                "account_id": account_id,
+                "resolution": resolution,
+                "timestamp": start,
+                "count": 1,
+                **{f: {"o": v, "h": v, "l": v, "c": v} for f, v in values.items()},
+            }
+
+    def flush(self):
+        """把所有未收盘的桶写入数据库（退出前调用）。"""
+        for bucket in self._open.values():
+            self._persist(bucket)
+
+    def _persist(self, bucket: dict):
+        doc = {**bucket, **{f: dict(bucket[f]) for f in FIELDS}}
+        keep = retention(bucket["resolution"])
+        if keep:
+            # 按分辨率设置过期时间，由 expire_at 上的 TTL 索引清理
+            doc["expire_at"] = bucket["timestamp"] + timedelta(seconds=keep)
+        write_pipeline.submit("equity_rollups", WriteOp(
+            "update",
+            {"account_id": bucket["account_id"], "resolution": bucket["resolution"], "timestamp": bucket["timestamp"]},
+            {"$set": doc},
+            upsert=True
+        ))
+
+    async def warm(self, db):
+        """恢复各账户最近的 1m / 1h 桶，避免重启后覆盖掉已经聚合的部分。"""
+        try:
+            now = datetime.now()
+            for resolution in ("1m", "1h"):
+                start = bucket_start(now, RESOLUTIONS[resolution])
+                async for doc in db.equity_rollups.find({"resolution": resolution, "timestamp": start}):
+                    doc.pop("_id", None)
+                    doc.pop("expire_at", None)
+                    self._open[(doc["account_id"], resolution)] = doc
+        except Exception as e:
+            logger.error(f"Failed to warm equity rollups: {e}")
+
+
+def lttb(points: list, threshold: int, y: str = "balance") -> list:
+    """Largest-Triangle-Three-Buckets 降采样，保留曲线形状。points 需按时间升序。"""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+
+    xs = [p["timestamp"].timestamp() for p in points]
+    ys = [p[y] for p in points]
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(ys[avg_start:avg_end]) / (avg_end - avg_start)
+
+        # 当前桶中与上一个选中点、下一个桶平均点构成最大三角形的点
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+equity_rollup = EquityRollup()
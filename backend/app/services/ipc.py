@@ -0,0 +1,239 @@
+import asyncio
+import inspect
+import itertools
+import logging
+import os
+from datetime import datetime
+import msgspec
+from ..core.config import settings
+from .analytics import analytics
+from .engine_client import engine_client
+from .market_data import market_data
+from .order_book import order_book, TERMINAL
+from .order_latency import order_latency
+from .state_store import state_store
+from .stream_hub import stream_hub
+from .versions import versions
+
+logger = logging.getLogger(__name__)
+
+# ingest 进程与 API 进程之间的本地通道（Unix socket），每帧一行 JSON 数组，元素为事件 [类型, 参数...]
+# ingest -> api: reset / v / account / positions / status / order / push / reply
+# api -> ingest: [请求类型, 请求号, 参数...]，请求类型为 call
+
+_encoder = msgspec.json.Encoder()
+_decoder = msgspec.json.Decoder()
+
+# API 进程经 ingest 执行的操作：只存在于 ingest 进程内存中的数据，以及发往引擎的指令
+CALLS = {
+    "orders.send": engine_client.send_order,
+    "orders.cancel": engine_client.cancel_order,
+    "orders.send_batch": engine_client.send_orders,
+    "orders.cancel_batch": engine_client.cancel_orders,
+    "orders.latency": order_latency.summary,
+    "positions.stats": lambda: state_store.pos_stats,
+    "market.quotes": market_data.quotes,
+    "market.ticks": market_data.recent_ticks,
+    "market.bars": market_data.recent_bars,
+    "market.stats": market_data.stats,
+    "analytics.get": analytics.get,
+}
+
+
+class IngestUnavailable(Exception):
+    """API 进程无法经 ingest 完成请求（未连接、断线或超时）。"""
+
+
+async def _invoke(name: str, args):
+    result = CALLS[name](*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def call(name: str, *args, timeout: float = None):
+    """单进程 / ingest 进程中直接执行，API 进程中转给 ingest 执行（timeout 默认 INGEST_TIMEOUT）。"""
+    if settings.ROLE == "api":
+        return await ingest_client.request(name, *args, timeout=timeout)
+    return await _invoke(name, args)
+
+
+class IngestServer:
+    """
+    ingest 进程一侧：接受 API 进程连接，先发完整快照，之后把状态、版本号和推送变化按事件循环的一轮合并成一帧广播。
+    没有 API 进程连接时 emit 只做一次判断。跟不上的连接（发送缓冲超过 INGEST_MAX_BUFFER）直接断开，重连后重新取快照。
+    """
+
+    def __init__(self):
+        self._clients: set[asyncio.StreamWriter] = set()
+        self._batch: list = []
+        self._server = None
+
+    async def start(self):
+        path = settings.INGEST_SOCKET
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path)
+        versions.relay = state_store.relay = order_book.relay = stream_hub.relay = self.emit
+        logger.info(f"Ingest IPC listening on {path}")
+
+    def emit(self, *event):
+        if not self._clients:
+            return
+        if not self._batch:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._batch.append(event)
+
+    def _flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        frame = _encoder.encode(batch) + b"\n"
+        for writer in list(self._clients):
+            if writer.transport.get_write_buffer_size() > settings.INGEST_MAX_BUFFER:
+                logger.warning("API process not keeping up with ingest events, disconnecting it")
+                self._drop(writer)
+            else:
+                writer.write(frame)
+
+    def _drop(self, writer):
+        self._clients.discard(writer)
+        writer.close()
+
+    def _snapshot(self) -> list:
+        events = [("reset", versions.boot)]
+        for account_id, account in state_store.accounts.items():
+            events.append(("account", account_id, account))
+        for account_id, by_symbol in state_store.positions.items():
+            events.append(("positions", account_id, list(by_symbol.values())))
+        for account_id, by_source in state_store.statuses.items():
+            for source, status in by_source.items():
+                events.append(("status", account_id, source, status))
+        for order in order_book.orders.values():
+            if order["status"] not in TERMINAL:
+                events.append(("order", order))
+        events.extend(("v", *item) for item in versions.items())
+        return events
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(_encoder.encode(self._snapshot()) + b"\n")
+        self._clients.add(writer)
+        logger.info(f"API process connected ({len(self._clients)} total)")
+        try:
+            while line := await reader.readline():
+                op, request_id, *args = _decoder.decode(line)
+                asyncio.create_task(self._handle(writer, request_id, args))
+        except (ConnectionError, ValueError, msgspec.DecodeError) as e:
+            logger.error(f"API process connection error: {e}")
+        finally:
+            self._drop(writer)
+
+    async def _handle(self, writer, request_id, args):
+        name, call_args = args
+        try:
+            reply = ("reply", request_id, True, await _invoke(name, call_args))
+        except Exception as e:
+            reply = ("reply", request_id, False, str(e))
+        if writer in self._clients:
+            writer.write(_encoder.encode([reply]) + b"\n")
+
+    async def stop(self):
+        versions.relay = state_store.relay = order_book.relay = stream_hub.relay = None
+        if self._server:
+            self._server.close()
+        for writer in list(self._clients):
+            self._drop(writer)
+
+
+class IngestClient:
+    """
+    API 进程一侧：连接 ingest 进程，把快照和后续事件应用到本进程的 state_store / order_book / versions，
+    推送事件转交本进程的 stream_hub；报单、撤单等经 request 交给 ingest 执行。断线后每秒重连。
+    """
+
+    def __init__(self):
+        self._writer: asyncio.StreamWriter = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: asyncio.Task = None
+
+    def start(self):
+        versions.replica = True
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(settings.INGEST_SOCKET, limit=settings.INGEST_MAX_BUFFER)
+                self._writer = writer
+                logger.info(f"Connected to ingest process at {settings.INGEST_SOCKET}")
+                while line := await reader.readline():
+                    # 一帧内的事件一次应用完，状态和对应的版本号对读接口同时可见
+                    for event in _decoder.decode(line):
+                        self._apply(*event)
+            except (OSError, ValueError, msgspec.DecodeError) as e:
+                logger.error(f"Ingest connection error: {e}")
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(IngestUnavailable("Ingest process disconnected"))
+            self._pending.clear()
+            await asyncio.sleep(1)
+
+    def _apply(self, kind, *args):
+        if kind == "push":
+            stream_hub.deliver(*args)
+        elif kind == "v":
+            versions.set(*args)
+        elif kind == "order":
+            order = args[0]
+            # JSON 中的 datetime 为 ISO 字符串，还原后与 ingest 进程内存中的报单文档一致
+            order["timestamp"] = datetime.fromisoformat(order["timestamp"])
+            order_book.restore(order)
+            if order["status"] in TERMINAL:
+                # 副本只需要挂单视图
+                order_book.orders.pop(order.get("client_id"), None)
+        elif kind == "account":
+            state_store.apply_account(*args)
+        elif kind == "positions":
+            state_store.apply_positions(*args)
+        elif kind == "status":
+            state_store.apply_status(*args)
+        elif kind == "reply":
+            request_id, ok, result = args
+            future = self._pending.pop(request_id, None)
+            if future is not None and not future.done():
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        elif kind == "reset":
+            versions.reset(args[0])
+            state_store.clear()
+            order_book.clear()
+
+    async def request(self, name: str, *args, timeout: float = None):
+        if self._writer is None:
+            raise IngestUnavailable("Ingest process not connected")
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(_encoder.encode(["call", request_id, name, list(args)]) + b"\n")
+        timeout = timeout or settings.INGEST_TIMEOUT
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise IngestUnavailable(f"Ingest process did not answer {name} in {timeout}s")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._writer:
+            self._writer.close()
+
+
+ingest_server = IngestServer()
+ingest_client = IngestClient()
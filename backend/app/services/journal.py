@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 记录头：负载长度, 负载 crc32, 序号, 接收时间（Unix 微秒）
+_HEADER = struct.Struct("<IIQQ")
+_SUFFIX = ".seg"
+_CHECKPOINT = "checkpoint"
+
+
+def received_time(received_us: int) -> datetime:
+    """日志中的接收时间换算为本地时间；实时处理与回放用同一换算，保证按时间戳幂等写入的文档一致。"""
+    return datetime.fromtimestamp(received_us // 1_000_000).replace(microsecond=received_us % 1_000_000)
+
+
+class Segment:
+    """
+    一个预分配大小、内存映射的日志段文件，文件名为段内第一条记录的序号。
+    段内记录紧密排列，遇到长度为 0、crc 不符或序号不连续即视为结尾（崩溃时写了一半的记录被丢弃）。
+    """
+
+    def __init__(self, path: Path, size: int = 0, writable: bool = False):
+        self.path = path
+        self.first_seq = int(path.stem)
+        self.writable = writable
+        if writable and not path.exists():
+            with open(path, "wb") as f:
+                # 真正分配磁盘空间，避免稀疏文件在磁盘写满时于 mmap 写入处触发 SIGBUS
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(f.fileno(), 0, size)
+                else:
+                    f.truncate(size)
+        self._file = open(path, "r+b" if writable else "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.pos = 0
+        self.last_seq = self.first_seq - 1
+
+    def records(self):
+        """按顺序产出 (seq, received_us, payload)，同时把 pos / last_seq 推进到最后一条有效记录之后。"""
+        mm, pos, expected = self.mm, 0, self.first_seq
+        while pos + _HEADER.size <= self.size:
+            length, crc, seq, ts = _HEADER.unpack_from(mm, pos)
+            end = pos + _HEADER.size + length
+            if length == 0 or seq != expected or end > self.size:
+                break
+            payload = mm[pos + _HEADER.size:end]
+            if zlib.crc32(payload) != crc:
+                break
+            pos, expected = end, seq + 1
+            self.pos, self.last_seq = pos, seq
+            yield seq, ts, payload
+
+    def scan(self):
+        for _ in self.records():
+            pass
+
+    def append(self, seq: int, ts: int, payload: bytes) -> bool:
+        end = self.pos + _HEADER.size + len(payload)
+        if end > self.size:
+            return False
+        _HEADER.pack_into(self.mm, self.pos, len(payload), zlib.crc32(payload), seq, ts)
+        self.mm[self.pos + _HEADER.size:end] = payload
+        self.pos, self.last_seq = end, seq
+        return True
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        if self.writable:
+            self.mm.flush()
+        self.mm.close()
+        self._file.close()
+
+
+def _segment_paths(directory: Path) -> list:
+    return sorted(directory.glob(f"*{_SUFFIX}"), key=lambda p: int(p.stem))
+
+
+def read_journal(directory, start_seq: int = 0):
+    """只读遍历日志目录，产出序号 >= start_seq 的 (seq, received_us, payload)，供回放工具使用。"""
+    paths = _segment_paths(Path(directory))
+    for i, path in enumerate(paths):
+        if i + 1 < len(paths) and int(paths[i + 1].stem) <= start_seq:
+            continue
+        if path.stat().st_size == 0:
+            continue
+        segment = Segment(path)
+        try:
+            for record in segment.records():
+                if record[0] >= start_seq:
+                    yield record
+        finally:
+            segment.close()
+
+
+class Journal:
+    """
+    引擎原始消息的追加日志：每帧先写入内存映射的日志段再交给处理函数，fsync（msync）按固定间隔批量执行。
+    检查点记录已确认落库的最大序号（由 write_pipeline 的确认水位给出），启动时回放检查点之后的记录。
+    """
+
+    def __init__(self, directory: str = None, segment_bytes: int = None):
+        self.directory = Path(directory or settings.JOURNAL_DIR)
+        self.segment_bytes = segment_bytes or settings.JOURNAL_SEGMENT_BYTES
+        self.enabled = False
+        self.seq = 0
+        self.checkpoint = 0
+        self._active: Segment = None
+        self._retired: list[Segment] = []   # 已轮换、待最后一次 msync 后关闭的段
+        self._dirty = False
+        self._task: asyncio.Task = None
+
+    def open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = self.directory / _CHECKPOINT
+        if checkpoint_path.exists():
+            self.checkpoint = int(checkpoint_path.read_text().strip() or 0)
+        paths = _segment_paths(self.directory)
+        if paths and paths[-1].stat().st_size == 0:
+            # 创建段文件后、分配空间前崩溃留下的空文件
+            paths.pop().unlink()
+        if paths:
+            self._active = Segment(paths[-1], writable=True)
+            self._active.scan()
+            self.seq = self._active.last_seq
+        else:
+            self.seq = self.checkpoint
+        self.enabled = True
+        logger.info(f"Journal opened at {self.directory}: last seq {self.seq}, checkpoint {self.checkpoint}")
+
+    def append(self, message, received_us: int = None):
+        """写入一帧并返回其序号；新段无法创建（如磁盘已满）时停用日志并返回 None，不影响消息处理。"""
+        payload = message.encode() if isinstance(message, str) else bytes(message)
+        seq = self.seq + 1
+        ts = received_us or time.time_ns() // 1000
+        if self._active is None or not self._active.append(seq, ts, payload):
+            try:
+                self._rotate(seq, len(payload))
+            except OSError as e:
+                logger.error(f"Journal disabled, cannot create segment: {e}")
+                self.enabled = False
+                return None
+            self._active.append(seq, ts, payload)
+        self.seq = seq
+        self._dirty = True
+        return seq
+
+    def _rotate(self, seq: int, length: int):
+        size = max(self.segment_bytes, _HEADER.size + length)
+        segment = Segment(self.directory / f"{seq:020d}{_SUFFIX}", size, writable=True)
+        if self._active is not None:
+            # 旧段可能正在后台 msync，交给同步任务关闭
+            self._retired.append(self._active)
+        self._active = segment
+
+    def unapplied(self):
+        """检查点之后、尚未确认落库的记录。"""
+        return read_journal(self.directory, self.checkpoint + 1)
+
+    def start(self, applied_seq):
+        """启动后台任务：定期 msync 活动段，并把 applied_seq() 返回的水位写为检查点。"""
+        self._task = asyncio.create_task(self._run(applied_seq))
+
+    async def _run(self, applied_seq):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.JOURNAL_FSYNC_INTERVAL)
+            try:
+                if self._dirty:
+                    self._dirty = False
+                    active, retired, self._retired = self._active, self._retired, []
+                    await loop.run_in_executor(None, self._sync, active, retired)
+                self._save_checkpoint(applied_seq())
+            except Exception as e:
+                logger.error(f"Journal sync failed: {e}")
+
+    @staticmethod
+    def _sync(active: Segment, retired: list):
+        for segment in retired:
+            segment.close()
+        active.flush()
+
+    def _save_checkpoint(self, seq: int):
+        # 检查点不能超过已写入日志的序号，也不回退
+        seq = min(seq, self.seq)
+        if seq <= self.checkpoint:
+            return
+        path = self.directory / _CHECKPOINT
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(str(seq))
+        os.replace(tmp, path)
+        self.checkpoint = seq
+        self._prune()
+
+    def _prune(self):
+        # 已全部落库的旧段只保留最近 JOURNAL_KEEP_SEGMENTS 个，用于回填
+        paths = _segment_paths(self.directory)
+        applied = [p for p, nxt in zip(paths, paths[1:]) if int(nxt.stem) - 1 <= self.checkpoint]
+        for path in applied[:max(0, len(applied) - settings.JOURNAL_KEEP_SEGMENTS)]:
+            path.unlink(missing_ok=True)
+
+    async def close(self, applied_seq=None):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for segment in self._retired:
+            segment.close()
+        self._retired = []
+        if self._active is not None:
+            self._active.flush()
+            if applied_seq is not None:
+                self._save_checkpoint(applied_seq())
+            self._active.close()
+            self._active = None
+        self.enabled = False
+
+
+journal = Journal()
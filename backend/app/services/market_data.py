@@ -0,0 +1,148 @@
+import logging
+import time
+import numpy as np
+from ..core.config import settings
+from ..models.schemas import TickMessage
+
+logger = logging.getLogger(__name__)
+
+TICK_FIELDS = ("timestamp", "last_price", "volume", "turnover", "open_interest",
+               "bid_price1", "bid_volume1", "ask_price1", "ask_volume1")
+BAR_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+# 分辨率 -> 桶长度（毫秒）
+BAR_RESOLUTIONS = {"1s": 1000, "1m": 60000}
+
+_TS, _PRICE, _VOLUME, _TURNOVER, _OI, _BID, _BID_VOL, _ASK, _ASK_VOL = range(len(TICK_FIELDS))
+_BT, _BO, _BH, _BL, _BC, _BV = range(len(BAR_FIELDS))
+
+
+class MarketData:
+    """
+    行情子系统。所有存储在启动时按 max_symbols 一次性分配：
+    - 每个合约一个定长 tick 环形缓冲区（float64，时间戳/成交量在 2^53 以内可精确表示）
+    - 最新行情即环形缓冲区中最近写入的一格，天然按合约合并
+    - 1s / 1m K 线增量聚合，收盘后写入各自的定长环形缓冲区
+    处理单个 tick 只做标量写入，不创建数组、不增长任何容器，内存占用与 tick 数量无关。
+    """
+
+    def __init__(self, max_symbols: int = None, ring_size: int = None, bar_ring_size: int = None):
+        self.max_symbols = max_symbols or settings.MD_MAX_SYMBOLS
+        self.ring_size = ring_size or settings.MD_TICK_RING_SIZE
+        self.bar_ring_size = bar_ring_size or settings.MD_BAR_RING_SIZE
+        self._index: dict[str, int] = {}
+        self._symbols: list[str] = []
+        self._ticks = np.zeros((self.max_symbols, self.ring_size, len(TICK_FIELDS)))
+        self._tick_count = np.zeros(self.max_symbols, dtype=np.int64)
+        self._last_volume = np.zeros(self.max_symbols)
+        self._bars = {r: np.zeros((self.max_symbols, self.bar_ring_size, len(BAR_FIELDS))) for r in BAR_RESOLUTIONS}
+        self._bar_count = {r: np.zeros(self.max_symbols, dtype=np.int64) for r in BAR_RESOLUTIONS}
+        self._open_bar = {r: np.zeros((self.max_symbols, len(BAR_FIELDS))) for r in BAR_RESOLUTIONS}
+        self.dropped = 0
+
+    def _row(self, symbol: str):
+        row = self._index.get(symbol)
+        if row is None and len(self._symbols) < self.max_symbols:
+            row = self._index[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return row
+
+    def on_tick(self, msg: TickMessage):
+        row = self._row(msg.symbol)
+        if row is None:
+            # 超出预分配的合约数，丢弃并计数
+            self.dropped += 1
+            return
+        ts = msg.timestamp or int(time.time() * 1000)
+        price = msg.last_price
+
+        n = self._tick_count[row]
+        t = self._ticks
+        pos = n % self.ring_size
+        t[row, pos, _TS] = ts
+        t[row, pos, _PRICE] = price
+        t[row, pos, _VOLUME] = msg.volume
+        t[row, pos, _TURNOVER] = msg.turnover
+        t[row, pos, _OI] = msg.open_interest
+        t[row, pos, _BID] = msg.bid_price1
+        t[row, pos, _BID_VOL] = msg.bid_volume1
+        t[row, pos, _ASK] = msg.ask_price1
+        t[row, pos, _ASK_VOL] = msg.ask_volume1
+        self._tick_count[row] = n + 1
+
+        # 引擎推送的是当日累计成交量，K 线取增量；首个 tick 或换日（累计量回落）记 0
+        last_volume = self._last_volume[row]
+        delta = msg.volume - last_volume if 0 < last_volume <= msg.volume else 0
+        self._last_volume[row] = msg.volume
+
+        if price > 0:
+            for resolution, span in BAR_RESOLUTIONS.items():
+                self._update_bar(resolution, row, ts - ts % span, price, delta)
+
+    def _update_bar(self, resolution, row, start, price, volume):
+        bar = self._open_bar[resolution]
+        if bar[row, _BT] == start:
+            if price > bar[row, _BH]:
+                bar[row, _BH] = price
+            if price < bar[row, _BL]:
+                bar[row, _BL] = price
+            bar[row, _BC] = price
+            bar[row, _BV] += volume
+            return
+
+        if bar[row, _BT]:
+            # 上一根 K 线收盘，拷入环形缓冲区
+            n = self._bar_count[resolution][row]
+            self._bars[resolution][row, n % self.bar_ring_size] = bar[row]
+            self._bar_count[resolution][row] = n + 1
+        bar[row, _BT] = start
+        bar[row, _BO] = bar[row, _BH] = bar[row, _BL] = bar[row, _BC] = price
+        bar[row, _BV] = volume
+
+    def _recent(self, ring, count, row, limit):
+        n = int(count[row])
+        size = ring.shape[1]
+        limit = min(limit, n, size)
+        positions = np.arange(n - limit, n) % size
+        return ring[row, positions]
+
+    def quotes(self, symbols: list = None) -> list:
+        names = symbols if symbols else self._symbols
+        rows = [self._index[s] for s in names if s in self._index and self._tick_count[self._index[s]]]
+        if not rows:
+            return []
+        latest = self._ticks[rows, (self._tick_count[rows] - 1) % self.ring_size]
+        return [{"symbol": self._symbols[r], **dict(zip(TICK_FIELDS, values))}
+                for r, values in zip(rows, latest.tolist())]
+
+    def recent_ticks(self, symbol: str, limit: int = 100) -> list:
+        row = self._index.get(symbol)
+        if row is None:
+            return []
+        data = self._recent(self._ticks, self._tick_count, row, limit)
+        return [dict(zip(TICK_FIELDS, values)) for values in data.tolist()]
+
+    def recent_bars(self, symbol: str, resolution: str = "1m", limit: int = 100) -> list:
+        """按时间正序返回最近的 K 线，最后一根为尚未收盘的当前 K 线。"""
+        row = self._index.get(symbol)
+        if row is None or resolution not in BAR_RESOLUTIONS:
+            return []
+        data = self._recent(self._bars[resolution], self._bar_count[resolution], row, limit)
+        bars = [dict(zip(BAR_FIELDS, values)) for values in data.tolist()]
+        current = self._open_bar[resolution][row]
+        if current[_BT]:
+            bars.append(dict(zip(BAR_FIELDS, current.tolist())))
+        return bars[-limit:]
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self._symbols),
+            "max_symbols": self.max_symbols,
+            "ticks": int(self._tick_count.sum()),
+            "dropped": self.dropped,
+            "memory_bytes": self._ticks.nbytes
+                + sum(a.nbytes for a in self._bars.values())
+                + sum(a.nbytes for a in self._open_bar.values()),
+        }
+
+
+market_data = MarketData()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from ..core.config import settings
+from ..core.metrics import registry
+from ..models.schemas import RtnMessage
+from .documents import new_order, order_fields, utc_datetime
+from .serializers import order_view
+from .versions import versions
+from .write_pipeline import WriteOp, write_pipeline
+
+logger = logging.getLogger(__name__)
+
+# 全部成交 / 部分成交不在队列中 / 未成交不在队列中 / 已撤单（CTP OrderStatus），之后不会再有状态变化
+TERMINAL = frozenset(("0", "2", "4", "5"))
+
+_COALESCED = registry.counter("hft_order_rtn_coalesced_total", "rtn reports merged into a pending order write").labels()
+_STALE = registry.counter("hft_order_rtn_stale_total", "rtn reports dropped as out of order").labels()
+
+
+class OrderBook:
+    """
+    以 client_id 为键的报单内存索引，保存各报单合并后的规范文档（documents.new_order / order_fields）。
+    rtn 按状态机应用：进入终态后的回报、成交量回退的回报视为乱序丢弃；
+    同一报单在 ORDER_FLUSH_INTERVAL 内的多条回报合并为一次 upsert。未终结的报单按账户索引，供挂单接口直接读取。
+    """
+
+    def __init__(self):
+        self.orders: OrderedDict[int, dict] = OrderedDict()
+        self._open: dict[str, dict[int, dict]] = {}    # account_id -> client_id -> 展示结构
+        self._dirty: dict[int, None] = {}
+        self.unflushed_seq = 0
+        self.relay = None   # ingest 进程中把报单变化转发给 API 进程
+        self._task: asyncio.Task = None
+
+    def apply(self, msg: RtnMessage) -> bool:
+        """应用一条 rtn，返回是否改变了报单（乱序回报返回 False）。"""
+        fields = order_fields(msg)
+        client_id = msg.client_id
+        order = self.orders.get(client_id)
+        if order is None:
+            order = self.orders[client_id] = new_order(client_id)
+        else:
+            traded = fields.get("volume_traded")
+            if order["status"] in TERMINAL or (traded is not None and traded < order["volume_traded"]):
+                _STALE.inc()
+                return False
+        order.update(fields)
+
+        if client_id in self._dirty:
+            _COALESCED.inc()
+        else:
+            self._dirty[client_id] = None
+            seq = write_pipeline.current_seq
+            if seq and not self.unflushed_seq:
+                self.unflushed_seq = seq
+
+        self._index(client_id, order)
+        if self.relay:
+            self.relay("order", order)
+        return True
+
+    def _index(self, client_id: int, order: dict):
+        account_id = order["account_id"]
+        by_client = self._open.setdefault(account_id, {})
+        if order["status"] in TERMINAL:
+            by_client.pop(client_id, None)
+        else:
+            by_client[client_id] = order_view(order)
+        versions.bump("open_orders", account_id)
+
+    def restore(self, order: dict):
+        """放入已合并好的报单（启动预热或从 ingest 进程同步），不触发写库。"""
+        client_id = order.get("client_id")
+        if client_id is None:
+            return
+        self.orders[client_id] = order
+        self._index(client_id, order)
+
+    def clear(self):
+        self.orders.clear()
+        self._open.clear()
+        self._dirty.clear()
+        self.unflushed_seq = 0
+
+    def get(self, client_id: int):
+        return self.orders.get(client_id)
+
+    def get_open(self, account_id: str = None) -> list:
+        # 最近的挂单在前
+        if account_id:
+            return list(reversed(self._open.get(account_id, {}).values()))
+        return [view for by_client in self._open.values() for view in reversed(by_client.values())]
+
+    def start(self):
+        write_pipeline.hold(self)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.ORDER_FLUSH_INTERVAL)
+            try:
+                self.flush()
+                self._evict()
+            except Exception as e:
+                logger.error(f"Order book flush failed: {e}")
+
+    def flush(self):
+        # 每个报单一条 last-write-wins 的 upsert，挂在最早未落库的序号上提交，确认前流水线水位不会越过它
+        dirty, self._dirty = self._dirty, {}
+        seq = self.unflushed_seq or write_pipeline.current_seq
+        for client_id in dirty:
+            order = self.orders.get(client_id)
+            if order is not None:
+                write_pipeline.submit("orders", WriteOp("update", {"client_id": client_id}, {"$set": order}, upsert=True),
+                                      account_id=order["account_id"], seq=seq)
+        self.unflushed_seq = 0
+
+    def _evict(self):
+        # 只淘汰最早的已终结报单，挂单始终保留
+        excess = len(self.orders) - settings.ORDER_BOOK_MAX
+        for client_id in list(self.orders)[:max(0, excess)]:
+            if self.orders[client_id]["status"] in TERMINAL and client_id not in self._dirty:
+                del self.orders[client_id]
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+
+    async def warm(self, db):
+        """加载最近 ORDER_OPEN_MAX_AGE 秒内未终结的报单，重启后挂单视图不丢失。"""
+        cutoff = utc_datetime(int((time.time() - settings.ORDER_OPEN_MAX_AGE) * 1000))
+        try:
+            async for doc in db.orders.find({"timestamp": {"$gte": cutoff}, "status": {"$nin": list(TERMINAL)}}).sort("timestamp", 1):
+                doc.pop("_id", None)
+                self.restore(doc)
+            logger.info(f"Order book warmed: {len(self.orders)} open orders")
+        except Exception as e:
+            logger.error(f"Failed to warm order book: {e}")
+
+
+order_book = OrderBook()
+
+registry.gauge_callback("hft_open_orders", "Working orders held in the order book", ("account_id",),
+                        lambda: {(acc,): len(by_client) for acc, by_client in order_book._open.items()})
@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict, defaultdict, deque
+from ..core.config import settings
+from ..core.metrics import ORDER_ACK_SECONDS, ORDER_FILL_SECONDS
+from ..models.schemas import RtnMessage, TradeMessage
+
+
+def _order_key(account_id, symbol, direction, offset, price, volume):
+    return (account_id or "", symbol or "", direction or "", offset or "",
+            round(float(price or 0.0), 6), int(volume or 0))
+
+
+class OrderTicket:
+    """一笔已提交报单的跟踪记录：发送时刻由出站写任务打点，首个 rtn 到达时关联上 client_id（并唤醒 waiter）。"""
+
+    __slots__ = ("key", "account_id", "symbol", "submitted_at", "sent_at", "sent_ts", "client_id", "acked_at", "waiter")
+
+    def __init__(self, order: dict):
+        self.account_id = order.get("account_id") or "default"
+        self.symbol = order.get("symbol") or ""
+        self.key = _order_key(order.get("account_id"), order.get("symbol"), order.get("direction"),
+                              order.get("offset"), order.get("price"), order.get("volume"))
+        self.submitted_at = time.monotonic()
+        self.sent_at = None   # monotonic，用于计算延迟
+        self.sent_ts = None   # Unix 毫秒，用于返回给调用方
+        self.client_id = None
+        self.acked_at = None
+        self.waiter = None    # 需要等待确认的调用方（批量报单）设置的 future
+
+    def mark_sent(self):
+        self.sent_at = time.monotonic()
+        self.sent_ts = int(time.time() * 1000)
+
+
+class OrderLatencyTracker:
+    """
+    统计报单到确认（首个 rtn）、报单到首次成交（首个 trade）的延迟，按 (account_id, symbol) 分直方图。
+    下单指令中没有 client_id（由引擎分配），因此按 账户/合约/方向/开平/价格/数量 以先进先出方式
+    把首个新 client_id 的 rtn 匹配回待确认的报单，之后按 client_id 关联成交。
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, deque] = defaultdict(deque)     # 报单特征 -> 待确认的 ticket
+        self._acked: OrderedDict[int, OrderTicket] = OrderedDict()  # client_id -> 已确认、待成交
+        self._seen: OrderedDict[int, None] = OrderedDict()          # 见过的 client_id，只处理首个 rtn
+        # 直方图直接放在指标注册表中，/metrics 与 /api/orders/latency 共用
+        self.ack_latency = ORDER_ACK_SECONDS
+        self.fill_latency = ORDER_FILL_SECONDS
+
+    def track(self, order: dict) -> OrderTicket:
+        ticket = OrderTicket(order)
+        self._pending[ticket.key].append(ticket)
+        self._expire()
+        return ticket
+
+    def on_rtn(self, msg: RtnMessage):
+        cid = msg.client_id
+        if cid in self._seen:
+            return
+        self._seen[cid] = None
+        if len(self._seen) > settings.ORDER_TRACK_MAX:
+            self._seen.popitem(last=False)
+
+        key = _order_key(msg.account_id, msg.symbol, msg.direction, msg.offset,
+                         msg.price if msg.price is not None else msg.limit_price,
+                         msg.vol_total if msg.vol_total is not None else msg.volume_total)
+        queue = self._pending.get(key)
+        if not queue:
+            return
+        ticket = queue.popleft()
+        if not queue:
+            del self._pending[key]
+        ticket.client_id = cid
+        ticket.acked_at = time.monotonic()
+        if ticket.waiter is not None and not ticket.waiter.done():
+            ticket.waiter.set_result(cid)
+        if ticket.sent_at is None:
+            return
+
+        self.ack_latency.labels(ticket.account_id, ticket.symbol).observe(ticket.acked_at - ticket.sent_at)
+        self._acked[cid] = ticket
+        if len(self._acked) > settings.ORDER_TRACK_MAX:
+            self._acked.popitem(last=False)
+
+    def on_trade(self, msg: TradeMessage):
+        ticket = self._acked.pop(msg.client_id, None)
+        if ticket is not None:
+            self.fill_latency.labels(ticket.account_id, ticket.symbol).observe(time.monotonic() - ticket.sent_at)
+
+    def _expire(self):
+        # 超时仍未确认的报单（被拒、引擎未回报）不再参与匹配
+        deadline = time.monotonic() - settings.ORDER_TRACK_TIMEOUT
+        for key in [k for k, q in self._pending.items() if q[0].submitted_at < deadline]:
+            queue = self._pending[key]
+            while queue and queue[0].submitted_at < deadline:
+                queue.popleft()
+            if not queue:
+                del self._pending[key]
+
+    def summary(self, account_id: str = None, symbol: str = None) -> list:
+        keys = set(self.ack_latency.children) | set(self.fill_latency.children)
+        result = []
+        for acc, sym in sorted(keys):
+            if (account_id and acc != account_id) or (symbol and sym != symbol):
+                continue
+            result.append({
+                "account_id": acc,
+                "symbol": sym,
+                "ack": self.ack_latency.labels(acc, sym).summary(),
+                "fill": self.fill_latency.labels(acc, sym).summary(),
+            })
+        return result
+
+
+order_latency = OrderLatencyTracker()
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from ..core.config import settings
+from ..core.metrics import registry
+
+_THROTTLED = registry.counter("hft_order_throttled_total", "Engine commands delayed by the per-account rate limit", ("account_id",))
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 burst 个；令牌不足时排队等待而不是拒绝，等待者按先后顺序放行。"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> bool:
+        """取一个令牌，返回是否经过了等待。令牌充足时不让出事件循环，同一批报单在一轮内连续入队。"""
+        self.waiting += 1
+        try:
+            async with self._lock:
+                self._refill()
+                waited = self.tokens < 1
+                while self.tokens < 1:
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+                    self._refill()
+                self.tokens -= 1
+                return waited
+        finally:
+            self.waiting -= 1
+
+
+class OrderThrottle:
+    """按 account_id 限制发往引擎的报单 / 撤单频率（ORDER_RATE_LIMIT 笔/秒，ORDER_RATE_BURST 突发），为 0 时不限。"""
+
+    def __init__(self):
+        self.buckets: dict[str, TokenBucket] = {}
+
+    async def acquire(self, account_id: str = None):
+        if settings.ORDER_RATE_LIMIT <= 0:
+            return
+        account_id = account_id or "default"
+        bucket = self.buckets.get(account_id)
+        if bucket is None:
+            bucket = self.buckets[account_id] = TokenBucket(settings.ORDER_RATE_LIMIT, settings.ORDER_RATE_BURST)
+        if await bucket.acquire():
+            _THROTTLED.labels(account_id).inc()
+
+
+order_throttle = OrderThrottle()
+
+registry.gauge_callback("hft_order_throttle_waiting", "Engine commands queued behind the per-account rate limit", ("account_id",),
+                        lambda: {(acc,): b.waiting for acc, b in order_throttle.buckets.items()})
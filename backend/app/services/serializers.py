@@ -0,0 +1,150 @@
+# 数据库文档 / 内存状态 -> 前端展示结构，实时推送与内存读接口使用；Mongo 读接口用下方的投影得到同样的结构
+from .documents import epoch_ms
+
+
+def trade_view(doc):
+    # doc 为规范成交文档（documents.trade_document），输出与 TRADE_PROJECTION 相同
+    return {
+        "account_id": doc["account_id"],
+        "client_id": str(doc["client_id"]),
+        "symbol": doc["symbol"],
+        "direction": doc["direction"],
+        "offset": doc["offset"],
+        "price": doc["price"],
+        "volume": doc["volume"],
+        "trade_time": epoch_ms(doc["timestamp"]),
+        "order_ref": doc["order_ref"],
+        "trade_id": doc.get("trade_id", "")
+    }
+
+
+def order_view(doc):
+    # doc 为规范报单文档（order_book 中的报单），输出与 ORDER_PROJECTION 相同
+    return {
+        "account_id": doc["account_id"],
+        "client_id": str(doc["client_id"]),
+        "order_ref": doc["order_ref"],
+        "symbol": doc["symbol"],
+        "direction": doc["direction"],
+        "offset": doc["offset"],
+        "status": doc["status"],
+        "limit_price": doc["limit_price"],
+        "volume_total": doc["volume_total"],
+        "volume_traded": doc["volume_traded"],
+        "msg": doc["msg"],
+        "insert_time": epoch_ms(doc["timestamp"])
+    }
+
+
+# 读接口的聚合投影：由 Mongo 直接产出展示结构（client_id 转字符串、时间转毫秒），Python 侧不再逐条转换。
+# id 为 _id 的字符串形式，用于生成翻页游标；冷热数据合并按 (TIME_FIELDS 中的时间字段, id) 排序、按 id 去重
+TRADE_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "account_id": 1,
+    "client_id": {"$toString": "$client_id"},
+    "symbol": 1,
+    "direction": 1,
+    "offset": 1,
+    "price": 1,
+    "volume": 1,
+    "trade_time": {"$toLong": "$timestamp"},
+    "order_ref": 1,
+    "trade_id": {"$ifNull": ["$trade_id", ""]},
+}
+ORDER_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "account_id": 1,
+    "client_id": {"$toString": "$client_id"},
+    "order_ref": 1,
+    "symbol": 1,
+    "direction": 1,
+    "offset": 1,
+    "status": 1,
+    "limit_price": 1,
+    "volume_total": 1,
+    "volume_traded": 1,
+    "msg": 1,
+    "insert_time": {"$toLong": "$timestamp"},
+}
+# 权益快照为本地时间，按本地时间格式化为字符串
+EQUITY_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "account_id": 1,
+    "timestamp": {"$dateToString": {"date": "$timestamp", "format": "%Y-%m-%d %H:%M:%S.%L"}},
+    "balance": 1,
+    "available": 1,
+    "pnl": 1,
+}
+PROJECTIONS = {"trades": TRADE_PROJECTION, "orders": ORDER_PROJECTION, "equity_snapshots": EQUITY_PROJECTION}
+TIME_FIELDS = {"trades": "trade_time", "orders": "insert_time", "equity_snapshots": "timestamp"}
+
+
+# 最近记录的排序，须与 db/mongodb.py 的索引一致：成交 / 报单按 (timestamp, _id)，
+# 权益快照只有 (account_id, timestamp) 与 TTL 的 (timestamp) 索引，按 timestamp 排序
+RECENT_SORTS = {"equity_snapshots": {"timestamp": -1}}
+DEFAULT_SORT = {"timestamp": -1, "_id": -1}
+
+
+def recent_pipeline(name: str, query: dict, limit: int, projection: dict) -> list:
+    return [{"$match": query}, {"$sort": RECENT_SORTS.get(name, DEFAULT_SORT)}, {"$limit": limit}, {"$project": projection}]
+
+
+async def recent(collection, query: dict, limit: int, projection: dict) -> list:
+    """按时间倒序取最近 limit 条的投影结果（仪表盘、订阅快照、权益曲线使用）。"""
+    return await collection.aggregate(recent_pipeline(collection.name, query, limit, projection)).to_list(None)
+
+
+def position_view(doc):
+    # 严格按照协议获取 Td 和 Yd 仓位
+    long_td = int(doc.get("long_td", 0))
+    long_yd = int(doc.get("long_yd", 0))
+    short_td = int(doc.get("short_td", 0))
+    short_yd = int(doc.get("short_yd", 0))
+
+    # 优先使用 Td + Yd 计算总仓位，除非引擎明确提供了更准确的 total 字段
+    long_total = doc.get("long_total")
+    if long_total is None:
+        long_total = long_td + long_yd
+
+    short_total = doc.get("short_total")
+    if short_total is None:
+        short_total = short_td + short_yd
+
+    return {
+        "account_id": doc.get("account_id", ""),
+        "symbol": doc.get("symbol", "Unknown"),
+        "symbol_id": int(doc.get("symbol_id", 0)),
+        "long_td": long_td,
+        "long_yd": long_yd,
+        "long_total": int(long_total),
+        "long_price": float(doc.get("long_price", 0.0)),
+        "long_pnl": float(doc.get("long_pnl", 0.0)),
+        "short_td": short_td,
+        "short_yd": short_yd,
+        "short_total": int(short_total),
+        "short_price": float(doc.get("short_price", 0.0)),
+        "short_pnl": float(doc.get("short_pnl", 0.0)),
+        "pnl": float(doc.get("pnl", 0.0))
+    }
+
+
+def account_view(doc):
+    return {
+        "account_id": doc.get("account_id", ""),
+        "balance": doc.get("balance", 0.0),
+        "available": doc.get("available", 0.0),
+        "margin": doc.get("margin", 0.0),
+        "pnl": doc.get("pnl", 0.0)
+    }
+
+
+def status_view(doc):
+    return {
+        "account_id": doc.get("account_id", ""),
+        "source": doc.get("source", ""),
+        "code": doc.get("code", ""),
+        "msg": doc.get("msg", "")
+    }
@@ -0,0 +1,131 @@
+import json
+import logging
+from .serializers import position_view, account_view, status_view
+from .versions import versions
+
+logger = logging.getLogger(__name__)
+
+
+def _row_hash(row: dict) -> int:
+    try:
+        return hash(tuple(sorted(row.items())))
+    except TypeError:
+        return hash(json.dumps(row, sort_keys=True, default=str))
+
+
+class StateStore:
+    """
+    账户 / 持仓 / 连接状态的内存权威状态，由 handle_message 更新，读接口直接从这里返回。
+    MongoDB 只作为写后持久化，启动时用 warm() 从库中恢复。
+    持仓按 (account_id, symbol) 存放，保存的是已经转换好的展示结构，读时无需再计算。
+    每次变化递增对应 (集合, account_id) 的版本号。
+    """
+
+    def __init__(self):
+        self.relay = None   # ingest 进程中把状态变化转发给 API 进程
+        self.clear()
+
+    def clear(self):
+        self.accounts: dict[str, dict] = {}
+        self.positions: dict[str, dict[str, dict]] = {}   # account_id -> symbol -> position
+        self.statuses: dict[str, dict[str, dict]] = {}    # account_id -> source -> status
+        self._position_hashes: dict[str, dict[str, int]] = {}  # account_id -> symbol -> 行哈希
+        self.pos_stats = {"snapshots": 0, "snapshots_skipped": 0, "rows_skipped": 0, "rows_changed": 0, "rows_removed": 0}
+
+    def apply_account(self, account_id: str, data: dict):
+        self.accounts[account_id] = account_view({**data, "account_id": account_id})
+        versions.bump("account", account_id)
+        if self.relay:
+            self.relay("account", account_id, data)
+
+    def apply_positions(self, account_id: str, items: list):
+        """
+        持仓快照为该账户的全量持仓：与上次应用的快照逐行比较（按行哈希），
+        返回 (变化的行, 已消失的合约)，两者都为空表示快照无变化。
+        """
+        previous = self._position_hashes.get(account_id, {})
+        current = {}
+        changed = []
+        for pos in items:
+            row = {**pos, "account_id": account_id}
+            row.pop("_id", None)
+            symbol = row["symbol"]
+            row_hash = _row_hash(row)
+            current[symbol] = row_hash
+            if previous.get(symbol) != row_hash:
+                changed.append(row)
+        removed = [symbol for symbol in previous if symbol not in current]
+
+        stats = self.pos_stats
+        stats["snapshots"] += 1
+        stats["rows_skipped"] += len(current) - len(changed)
+        stats["rows_changed"] += len(changed)
+        stats["rows_removed"] += len(removed)
+        if not changed and not removed:
+            stats["snapshots_skipped"] += 1
+            return changed, removed
+
+        self._position_hashes[account_id] = current
+        by_symbol = self.positions.setdefault(account_id, {})
+        for symbol in removed:
+            by_symbol.pop(symbol, None)
+        for row in changed:
+            by_symbol[row["symbol"]] = position_view(row)
+        versions.bump("positions", account_id)
+        if self.relay:
+            self.relay("positions", account_id, items)
+        return changed, removed
+
+    def apply_status(self, account_id: str, source: str, data: dict):
+        self.statuses.setdefault(account_id, {})[source] = status_view(
+            {**data, "account_id": account_id, "source": source})
+        versions.bump("connection_status", account_id)
+        if self.relay:
+            self.relay("status", account_id, source, data)
+
+    def get_account(self, account_id: str = None):
+        if account_id:
+            return self.accounts.get(account_id)
+        return next(iter(self.accounts.values()), None)
+
+    def get_positions(self, account_id: str = None) -> list:
+        if account_id:
+            return list(self.positions.get(account_id, {}).values())
+        return [pos for by_symbol in self.positions.values() for pos in by_symbol.values()]
+
+    def get_position(self, account_id: str, symbol: str):
+        return self.positions.get(account_id, {}).get(symbol)
+
+    def get_statuses(self, account_id: str = None) -> list:
+        if account_id:
+            return list(self.statuses.get(account_id, {}).values())
+        return [s for by_source in self.statuses.values() for s in by_source.values()]
+
+    def account_ids(self) -> list:
+        return list(self.accounts.keys())
+
+    async def warm(self, db):
+        """启动时从 MongoDB 加载最近一次持久化的状态。"""
+        try:
+            async for doc in db.account.find({}):
+                account_id = doc.get("account_id")
+                if account_id:
+                    self.apply_account(account_id, doc)
+
+            by_account: dict[str, list] = {}
+            async for doc in db.positions.find({}):
+                if doc.get("symbol"):
+                    by_account.setdefault(doc.get("account_id") or "default", []).append(doc)
+            for account_id, items in by_account.items():
+                self.apply_positions(account_id, items)
+
+            async for doc in db.connection_status.find({}):
+                self.apply_status(doc.get("account_id", "default"), doc.get("source", "CTP"), doc)
+
+            logger.info(f"State store warmed: {len(self.accounts)} accounts, "
+                        f"{sum(len(p) for p in self.positions.values())} positions")
+        except Exception as e:
+            logger.error(f"Failed to warm state store: {e}")
+
+
+state_store = StateStore()
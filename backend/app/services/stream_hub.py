@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from fastapi import WebSocket, WebSocketDisconnect
+from ..db.mongodb import get_database
+from ..core.config import settings
+from ..core.metrics import registry
+from .serializers import TRADE_PROJECTION, ORDER_PROJECTION, recent
+from .state_store import state_store
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("orders", "trades", "positions", "account", "status")
+MAX_SNAPSHOT_LIMIT = 1000  # 与 /api/trades、/api/orders 的 limit 上限一致
+
+
+class Subscriber:
+    """
+    单个浏览器连接。发布方只往缓冲区里写，由独立的发送任务按 max_rate 推送，
+    两次推送之间同一 key 的更新只保留最新一条（成交除外，逐条保留）。
+    """
+
+    def __init__(self, websocket: WebSocket, max_rate: float, max_pending: int):
+        self.ws = websocket
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.max_pending = max_pending
+        self.topics: set[tuple] = set()
+        self.overflow = False
+        self._direct: list[str] = []          # 快照等需原样发送的消息
+        self._pending: dict[tuple, dict] = {}  # (channel, account_id, key) -> 最新数据
+        self._events: list[dict] = []          # 不可合并的事件（成交）
+        self.priming = 0
+        self._wakeup = asyncio.Event()
+
+    def push(self, channel, account_id, key, data):
+        item = {"channel": channel, "account_id": account_id, "data": data}
+        if key is None:
+            self._events.append(item)
+            if len(self._events) > self.max_pending:
+                self.overflow = True
+        else:
+            self._pending[(channel, account_id, key)] = item
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def send_direct(self, message: dict):
+        self._direct.append(json.dumps(message, default=str))
+        self._wakeup.set()
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.overflow:
+                # 跟不上推送速度的客户端直接断开，由前端重连并重新拉取快照
+                logger.warning("Stream subscriber too slow, closing connection")
+                await self.ws.close(code=1013)
+                return
+            if self.priming:
+                continue
+
+            messages, self._direct = self._direct, []
+            items = self._events + list(self._pending.values())
+            self._events, self._pending = [], {}
+            if items:
+                messages.append(json.dumps({"type": "delta", "items": items}, default=str))
+            for message in messages:
+                await self.ws.send_text(message)
+
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+
+class StreamHub:
+    """后端到浏览器的推送中心：由 EngineClient.handle_message 直接发布，按 (account_id, channel) 分发。"""
+
+    def __init__(self):
+        self._topics: dict[tuple, set[Subscriber]] = defaultdict(set)
+        self.relay = None   # ingest 进程中把推送转发给 API 进程，由其 deliver 给各自的浏览器连接
+
+    def publish(self, channel, account_id, key, view, doc):
+        subscribers = self._topics.get((account_id, channel))
+        if not subscribers and not self.relay:
+            return
+        data = view(doc)
+        if self.relay:
+            self.relay("push", channel, account_id, key, data)
+        for sub in subscribers or ():
+            sub.push(channel, account_id, key, data)
+
+    def deliver(self, channel, account_id, key, data):
+        for sub in self._topics.get((account_id, channel)) or ():
+            sub.push(channel, account_id, key, data)
+
+    async def serve(self, websocket: WebSocket):
+        await websocket.accept()
+        sub = Subscriber(websocket, settings.STREAM_MAX_PUSH_HZ, settings.STREAM_MAX_PENDING)
+        sender = asyncio.create_task(sub.run())
+        try:
+            while not sender.done():
+                request = await websocket.receive_json()
+                action = request.get("action")
+                account_id = request.get("account_id") or "default"
+                channels = [c for c in request.get("channels") or CHANNELS if c in CHANNELS]
+                if action == "subscribe":
+                    limit = request.get("limit") or 100
+                    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+                        # 非法参数只拒绝本次订阅，不断开连接
+                        sub.send_direct({"type": "error", "action": action, "detail": "limit must be a positive integer"})
+                        continue
+                    await self._subscribe(sub, account_id, channels, min(limit, MAX_SNAPSHOT_LIMIT))
+                elif action == "unsubscribe":
+                    for channel in channels:
+                        self._remove(sub, (account_id, channel))
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Stream connection error: {e}")
+        finally:
+            for topic in list(sub.topics):
+                self._remove(sub, topic)
+            sender.cancel()
+
+    async def _subscribe(self, sub: Subscriber, account_id, channels, limit):
+        # 先登记订阅再查询快照，期间到达的增量暂存，快照发出后再推送
+        sub.priming += 1
+        try:
+            for channel in channels:
+                topic = (account_id, channel)
+                sub.topics.add(topic)
+                self._topics[topic].add(sub)
+            for channel in channels:
+                data = await self._snapshot(channel, account_id, limit)
+                sub.send_direct({"type": "snapshot", "channel": channel, "account_id": account_id, "data": data})
+        finally:
+            sub.priming -= 1
+            sub.wake()
+
+    def _remove(self, sub: Subscriber, topic):
+        sub.topics.discard(topic)
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(sub)
+            if not subscribers:
+                del self._topics[topic]
+
+    async def _snapshot(self, channel, account_id, limit):
+        db = get_database()
+        query = {"account_id": account_id}
+        if channel == "trades" and db is not None:
+            return await recent(db.trades, query, limit, TRADE_PROJECTION)
+        if channel == "orders" and db is not None:
+            return await recent(db.orders, query, limit, ORDER_PROJECTION)
+        if channel == "positions":
+            return state_store.get_positions(account_id)
+        if channel == "account":
+            return state_store.get_account(account_id)
+        if channel == "status":
+            return state_store.get_statuses(account_id)
+
+stream_hub = StreamHub()
+
+registry.gauge_callback("hft_stream_subscriptions", "Browser subscriptions per channel", ("channel",),
+                        lambda: {(c,): sum(len(s) for (_, ch), s in stream_hub._topics.items() if ch == c) for c in CHANNELS})
@@ -0,0 +1,55 @@
+import os
+
+
+class VersionTable:
+    """
+    按 (集合, account_id) 记录的数据版本号，读接口据此生成 ETag。
+    所有版本号取自同一个递增计数器，某集合不限账户时的版本即其最近一次变化的计数值。
+    内存状态在应用时递增；经 write_pipeline 落库的集合在写入确认后递增，保证新 ETag 对应的查询能读到新数据。
+    API 进程（ROLE=api）为只读副本：不自行递增，版本号和启动标识都由 ingest 进程同步，各进程的 ETag 一致。
+    """
+
+    def __init__(self):
+        # 进程重启后计数器归零，ETag 带上启动标识避免与重启前的版本冲突
+        self.boot = os.urandom(4).hex()
+        self._counter = 0
+        self._versions: dict[tuple, int] = {}   # (collection, account_id) -> version
+        self._latest: dict[str, int] = {}       # collection -> version
+        self.replica = False
+        self.relay = None   # ingest 进程中转发版本变化给 API 进程
+
+    def bump(self, collection: str, account_id: str = None):
+        if self.replica:
+            return
+        self._counter += 1
+        self.set(collection, account_id, self._counter)
+        if self.relay:
+            self.relay("v", collection, account_id, self._counter)
+
+    def set(self, collection: str, account_id: str, version: int):
+        if account_id is not None:
+            self._versions[(collection, account_id)] = version
+        self._latest[collection] = max(self._latest.get(collection, 0), version)
+
+    def items(self):
+        """(collection, account_id, version)，account_id 为 None 的是不限账户的版本。"""
+        for (collection, account_id), version in self._versions.items():
+            yield collection, account_id, version
+        for collection, version in self._latest.items():
+            yield collection, None, version
+
+    def reset(self, boot: str):
+        self.boot = boot
+        self._versions.clear()
+        self._latest.clear()
+
+    def get(self, collection: str, account_id: str = None) -> int:
+        if account_id:
+            return self._versions.get((collection, account_id), 0)
+        return self._latest.get(collection, 0)
+
+    def etag(self, collection: str, account_id: str = None) -> str:
+        return f'"{self.boot}-{self.get(collection, account_id)}"'
+
+
+versions = VersionTable()
@@ -0,0 +1,312 @@
+import asyncio
+import itertools
+import logging
+import struct
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+import bson
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, PyMongoError
+from ..db.mongodb import get_database
+from ..core.config import settings
+from ..core.metrics import registry, MONGO_WRITE_SECONDS, MONGO_WRITE_OPS, MONGO_WRITE_ERRORS
+from .versions import versions
+
+logger = logging.getLogger(__name__)
+
+_CONFLATED = registry.counter("hft_write_conflated_total", "Queued writes replaced by a newer write to the same key", ("collection",))
+_SPILLED = registry.counter("hft_write_spilled_total", "Writes spilled to disk because the in-memory queue was full", ("collection",))
+
+# 各集合积压时的策略：spill 不丢弃，超出 WRITE_QUEUE_MAX 的部分按序溢出到磁盘；
+# conflate 为状态类集合，超过 WRITE_QUEUE_HIGH_WATER 后同一文档（相同过滤条件）只保留最新一次写入。未列出的集合按 spill 处理
+POLICIES = {
+    "trades": "spill",
+    "orders": "spill",
+    "equity_snapshots": "spill",
+    "equity_rollups": "spill",
+    "account": "conflate",
+    "positions": "conflate",
+    "connection_status": "conflate",
+    "trade_analytics": "conflate",
+}
+
+_OP_TYPES = {"insert": InsertOne, "update": UpdateOne, "replace": ReplaceOne, "delete": DeleteMany}
+
+
+class WriteOp(NamedTuple):
+    """
+    排队中的写操作：kind 为 insert / update / replace / delete，filter 为过滤条件，doc 为文档或更新语句。
+    队列、合并和溢出只使用这些字段，落库时才构造 pymongo 的操作对象。
+    """
+    kind: str
+    filter: dict = None
+    doc: dict = None
+    upsert: bool = False
+
+    def key(self):
+        # 以过滤条件作为合并键；插入、删除不合并，过滤条件不可哈希（如 $in 列表）时也不合并
+        if self.kind not in ("update", "replace"):
+            return None
+        try:
+            return self.kind, tuple(sorted(self.filter.items()))
+        except TypeError:
+            return None
+
+    def to_pymongo(self):
+        if self.kind == "insert":
+            return InsertOne(self.doc)
+        if self.kind == "delete":
+            return DeleteMany(self.filter)
+        return _OP_TYPES[self.kind](self.filter, self.doc, upsert=self.upsert)
+
+
+def _encode_op(op: WriteOp, seq: int, account_id) -> bytes:
+    return bson.encode({"k": op.kind, "f": op.filter, "d": op.doc, "u": op.upsert, "s": seq, "a": account_id})
+
+
+def _decode_op(record: dict) -> tuple:
+    return WriteOp(record["k"], record["f"], record["d"], record["u"]), record["s"], record["a"]
+
+
+class _Spill:
+    """
+    一个集合的溢出文件：按提交顺序追加 BSON 记录，写入任务从头顺序读回；读完后删除文件。
+    进程退出时未读回的记录不保留（下次首次溢出时覆盖），由引擎消息日志从检查点回放补回。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._out = None
+        self._in = None
+        self.count = 0       # 尚未读回的记录数
+        self.first_seq = 0   # 文件中最早的日志序号，读完前确认水位不越过它
+        self.bytes = 0
+
+    def append(self, op, seq: int, account_id):
+        if self._out is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._out = open(self.path, "wb")
+            self._in = open(self.path, "rb")
+            self.first_seq = seq
+        data = _encode_op(op, seq, account_id)
+        self._out.write(data)
+        self.count += 1
+        self.bytes += len(data)
+
+    def read(self, n: int) -> list:
+        self._out.flush()
+        entries = []
+        while len(entries) < n and self.count:
+            header = self._in.read(4)
+            size = struct.unpack("<i", header)[0]
+            entries.append(_decode_op(bson.decode(header + self._in.read(size - 4))))
+            self.count -= 1
+            self.bytes -= size
+        if not self.count:
+            self.close()
+            self.path.unlink(missing_ok=True)
+        return entries
+
+    def close(self):
+        for f in (self._out, self._in):
+            if f is not None:
+                f.close()
+        self._out = self._in = None
+        self.first_seq = self.bytes = 0
+
+
+class _Lane:
+    """一个集合的待写队列：key -> (op, 日志序号, account_id)，按提交顺序排列；不合并的操作使用唯一键。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.policy = POLICIES.get(name, "spill")
+        self.ops: OrderedDict = OrderedDict()
+        self.spill = _Spill(Path(settings.WRITE_SPILL_DIR) / f"{name}.bson")
+        self.ready = asyncio.Event()
+        self.stopping = False
+        self.inflight: list = []   # 已取出、尚未确认落库的一批
+        self._ids = itertools.count()
+        self._conflated = _CONFLATED.labels(name)
+        self._spilled = _SPILLED.labels(name)
+
+    def put(self, op, seq: int, account_id):
+        # 一旦开始溢出，后续写入都进溢出文件，直到读回完毕，保证写入顺序不变
+        if self.policy == "spill" and (self.spill.count or len(self.ops) >= settings.WRITE_QUEUE_MAX):
+            self.spill.append(op, seq, account_id)
+            self._spilled.inc()
+        else:
+            key = op.key() if self.policy == "conflate" and len(self.ops) >= settings.WRITE_QUEUE_HIGH_WATER else None
+            if key is None:
+                key = next(self._ids)
+            elif self.ops.pop(key, None) is not None:
+                # 旧写入被覆盖：移到队尾，与其后的写入（如删除）保持先后顺序
+                self._conflated.inc()
+            self.ops[key] = (op, seq, account_id)
+        self.ready.set()
+
+    def take(self, n: int) -> list:
+        batch = self.inflight = [self.ops.popitem(last=False)[1] for _ in range(min(n, len(self.ops)))]
+        if self.spill.count and len(self.ops) < settings.WRITE_QUEUE_MAX // 2:
+            for entry in self.spill.read(settings.WRITE_QUEUE_MAX - len(self.ops)):
+                self.ops[next(self._ids)] = entry
+        return batch
+
+    def first_seq(self) -> int:
+        if self.inflight:
+            return self.inflight[0][1]
+        if self.ops:
+            return next(iter(self.ops.values()))[1]
+        return self.spill.first_seq
+
+    def __len__(self):
+        return len(self.inflight) + len(self.ops) + self.spill.count
+
+
+class WritePipeline:
+    """
+    引擎消息的异步落库流水线。
+    接收循环只负责把写操作放入队列，每个集合一个写入任务，
+    攒够 batch_size 条或等待 flush_interval 秒后执行一次有序、已确认的 bulk_write；积压时每批最多 WRITE_CATCHUP_BATCH_SIZE 条，尽快追上。
+    数据库变慢时内存占用有上限：按 POLICIES 溢出到磁盘或按文档合并。
+    每个操作记录提交时所属的日志序号（begin 设置），applied_seq() 给出已全部确认落库的最大序号。
+    批次落库后递增涉及账户的 (集合, account_id) 版本号，读接口的 ETag 随之变化。
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None):
+        self.batch_size = batch_size or settings.WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.WRITE_FLUSH_INTERVAL
+        self._lanes: dict[str, _Lane] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._seq = 0
+        self._running = False
+        # 在内存中合并后再提交写操作的模块，其 unflushed_seq（尚未提交的最早序号）之前才算落库
+        self._buffers: list = []
+
+    def begin(self, seq: int):
+        """之后 submit 的操作都属于日志序号 seq 的那一帧。"""
+        self._seq = seq
+
+    @property
+    def current_seq(self) -> int:
+        """正在处理的那一帧的日志序号，未启用日志时为 0。"""
+        return self._seq
+
+    def hold(self, buffer):
+        self._buffers.append(buffer)
+
+    def applied_seq(self) -> int:
+        # 被合并掉的旧写入不再计入：覆盖它的新写入落库后状态即为最新
+        pending = [lane.first_seq() for lane in self._lanes.values() if len(lane)]
+        pending += [b.unflushed_seq for b in self._buffers if b.unflushed_seq]
+        return min(pending) - 1 if pending else self._seq
+
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def submit(self, collection: str, *ops, account_id: str = None, seq: int = None):
+        """seq 默认为当前帧的序号；合并后延迟提交的模块传入其最早未落库的序号。"""
+        seq = self._seq if seq is None else seq
+        lane = self._lanes.get(collection)
+        if lane is None:
+            lane = self._lanes[collection] = _Lane(collection)
+            if self._running:
+                self._start_writer(collection)
+        for op in ops:
+            lane.put(op, seq, account_id)
+
+    def qsize(self, collection: str) -> int:
+        lane = self._lanes.get(collection)
+        return len(lane) if lane else 0
+
+    def start(self):
+        self._running = True
+        for name in self._lanes:
+            if name not in self._tasks:
+                self._start_writer(name)
+
+    async def stop(self):
+        """停止写入任务，退出前把队列和溢出文件中剩余的操作全部落库。"""
+        self._running = False
+        for lane in self._lanes.values():
+            lane.stopping = True
+            lane.ready.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def _start_writer(self, name: str):
+        self._tasks[name] = asyncio.create_task(self._writer(self._lanes[name]))
+
+    async def _writer(self, lane: _Lane):
+        while True:
+            if not lane.ops and not lane.spill.count:
+                if lane.stopping:
+                    break
+                lane.ready.clear()
+                await lane.ready.wait()
+                continue
+            if len(lane) < self.batch_size and not lane.stopping:
+                # 不足一批时等待 flush_interval 再攒一些
+                await asyncio.sleep(self.flush_interval)
+            limit = settings.WRITE_CATCHUP_BATCH_SIZE if len(lane) > self.batch_size else self.batch_size
+            batch = lane.take(limit)
+            if not await self._flush(lane.name, [op for op, _, _ in batch]):
+                # 退出时仍没有数据库连接：本批次保留为未确认，水位不越过它，下次启动从日志回放
+                break
+            # 本批次已落库（或已确定丢弃），推进确认水位
+            lane.inflight = []
+            for account_id in {account_id for _, _, account_id in batch}:
+                versions.bump(lane.name, account_id)
+
+    async def _flush(self, name: str, batch: list) -> bool:
+        """写入一批 WriteOp；返回 False 表示没有写入也没有丢弃（停止时仍无数据库连接）。"""
+        db = get_database()
+        while db is None:
+            # 数据库尚未连接：保留本批次，等待后重试
+            if not self._running:
+                logger.error(f"No database while stopping, {len(batch)} {name} ops left unwritten")
+                return False
+            await asyncio.sleep(1)
+            db = get_database()
+        collection = db[name]
+        # 必须是已确认写入，否则失败时无从得知
+        if not collection.write_concern.acknowledged:
+            collection = collection.with_options(write_concern=WriteConcern(w=1))
+
+        latency = MONGO_WRITE_SECONDS.labels(name)
+        batch = [op.to_pymongo() for op in batch]
+        while batch:
+            start = perf_counter()
+            try:
+                await collection.bulk_write(batch, ordered=True)
+                latency.observe(perf_counter() - start)
+                MONGO_WRITE_OPS.labels(name).inc(len(batch))
+                return True
+            except BulkWriteError as e:
+                MONGO_WRITE_ERRORS.labels(name).inc()
+                # 有序批量写在第一条失败处中止：丢弃出错的那条，其余继续写入
+                errors = e.details.get("writeErrors") or []
+                failed = errors[0]["index"] if errors else 0
+                logger.error(f"Bulk write to {name} failed at op {failed}: {errors[:1]}")
+                batch = batch[failed + 1:]
+            except PyMongoError as e:
+                MONGO_WRITE_ERRORS.labels(name).inc()
+                logger.error(f"Bulk write to {name} failed: {e}. Retrying in 1s...")
+                await asyncio.sleep(1)
+            except Exception as e:
+                MONGO_WRITE_ERRORS.labels(name).inc()
+                # 非数据库错误重试也无意义，丢弃本批次但保证写入任务存活
+                logger.error(f"Bulk write to {name} dropped {len(batch)} ops: {e}")
+                return True
+        return True
+
+
+write_pipeline = WritePipeline()
+
+registry.gauge_callback("hft_write_queue_depth", "Operations waiting in the write pipeline (memory and spill)", ("collection",),
+                        lambda: {(name,): len(lane) for name, lane in write_pipeline._lanes.items()})
+registry.gauge_callback("hft_write_spill_bytes", "Bytes spilled to disk and not yet written to MongoDB", ("collection",),
+                        lambda: {(name,): lane.spill.bytes for name, lane in write_pipeline._lanes.items()})
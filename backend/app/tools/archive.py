@@ -0,0 +1,47 @@
+"""
+把超过 ARCHIVE_AFTER_TRADING_DAYS 个交易日的成交、报单、权益快照归档为按交易日分区的 Parquet 文件（ARCHIVE_DIR），并从 Mongo 删除。
+可在后端运行期间执行（建议收盘后由 cron 调度）；中途失败重新执行即可，已写入的分区按 _id 去重合并。
+原始权益快照在 Mongo 中有 TTL（EQUITY_RAW_TTL_SECONDS），默认短于归档天数，有意不归档（过期即删除，长期曲线由 equity_rollups 提供）；
+只有调大 TTL 使其长于归档天数时才会被归档，归档前的旧快照（如迁移前的数据）仍照常归档和合并读取。
+用法 (backend 目录下):
+    python -m app.tools.archive [--days 20] [--collection trades] [--dry-run] [--database hft_db] [--mongo mongodb://...]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from ..core.config import settings
+from ..services.archive import COLLECTIONS, ColdStore, time_bound
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongo)
+    db = client[args.database]
+    store = ColdStore(args.dir)
+    cutoff = store.cutoff(args.days)
+    print(f"Archiving records before {datetime.fromtimestamp(cutoff / 1000):%Y-%m-%d %H:%M} into {store.root}")
+    for collection in args.collection or COLLECTIONS:
+        started = time.perf_counter()
+        if args.dry_run:
+            count = await db[collection].count_documents({"timestamp": {"$lt": time_bound(collection, cutoff)}})
+            print(f"{collection}: {count} records would be archived")
+            continue
+        moved, days = await store.archive(db, collection, cutoff)
+        print(f"{collection}: archived {moved} records into {days} partitions in {time.perf_counter() - started:.2f}s")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old trades / orders / equity snapshots to Parquet")
+    parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_TRADING_DAYS, help="Mongo 中保留的交易日数")
+    parser.add_argument("--collection", action="append", choices=COLLECTIONS, help="只归档该集合，可重复")
+    parser.add_argument("--dir", default=settings.ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="只统计待归档条数")
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--mongo", default=settings.MONGODB_URL)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+把 trades / orders / equity_snapshots 中的旧文档转换为规范文档（models/schemas.py 的 Trade / Order / EquitySnapshot）。
+旧文档为引擎消息原样写入：字段名不统一（price / limit_price、vol_total / volume_total 等）、成交 / 报单的 timestamp 为毫秒整数。
+按 _id 分批扫描，已是规范结构的文档跳过，可重复执行；请在停止 ingest 进程后执行，避免与实时写入交替覆盖。
+--archive 同时重写 ARCHIVE_DIR 下已归档的 Parquet 分区。
+用法 (backend 目录下):
+    python -m app.tools.migrate_documents [--collection trades] [--dry-run] [--archive] [--database hft_db] [--mongo mongodb://...]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+import msgspec
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from ..core.config import settings
+from ..models.schemas import EquitySnapshot, Order, RtnMessage, Trade, TradeMessage
+from ..services.archive import COLLECTIONS, ColdStore
+from ..services.documents import epoch_ms, equity_document, new_order, order_fields, trade_document
+
+BATCH_SIZE = 1000
+
+
+def _created_ms(doc: dict) -> int:
+    # 旧文档缺少时间时用 _id 中的生成时间
+    _id = doc.get("_id")
+    return epoch_ms(_id.generation_time) if isinstance(_id, ObjectId) else None
+
+
+def _message(doc: dict, msg_type):
+    fields = {k: v for k, v in doc.items() if k != "_id"}
+    if isinstance(fields.get("timestamp"), datetime):
+        fields["timestamp"] = epoch_ms(fields["timestamp"])
+    return msgspec.convert(fields, msg_type, strict=False)
+
+
+def _trade(doc: dict) -> dict:
+    return trade_document(_message(doc, TradeMessage), _created_ms(doc))
+
+
+def _order(doc: dict) -> dict:
+    msg = _message(doc, RtnMessage)
+    order = new_order(msg.client_id, _created_ms(doc))
+    order.update(order_fields(msg))
+    return order
+
+
+def _equity(doc: dict) -> dict:
+    timestamp = doc.get("timestamp")
+    if not isinstance(timestamp, datetime):
+        # 权益快照为本地时间
+        ms = timestamp if isinstance(timestamp, int) else _created_ms(doc)
+        timestamp = datetime.fromtimestamp(ms / 1000)
+    return equity_document(doc.get("account_id") or "default", timestamp,
+                           doc.get("balance"), doc.get("available"), doc.get("pnl"))
+
+
+# 集合 -> (转换函数, 校验模型)
+CONVERTERS = {
+    "trades": (_trade, Trade),
+    "orders": (_order, Order),
+    "equity_snapshots": (_equity, EquitySnapshot),
+}
+
+
+class Stats:
+    def __init__(self):
+        self.scanned = self.converted = self.unchanged = self.invalid = self.failed = 0
+
+    def __str__(self):
+        return (f"scanned {self.scanned}, converted {self.converted}, unchanged {self.unchanged}, "
+                f"invalid {self.invalid}, write errors {self.failed}")
+
+
+def convert(collection: str, doc: dict, stats: Stats):
+    """返回转换后的规范文档（不含 _id）；已是规范结构或无法转换时返回 None。"""
+    to_document, model = CONVERTERS[collection]
+    stats.scanned += 1
+    try:
+        canonical = to_document(doc)
+        model(**canonical)
+    except (msgspec.ValidationError, ValidationError, TypeError, ValueError):
+        stats.invalid += 1
+        return None
+    current = {k: v for k, v in doc.items() if k != "_id"}
+    # 逐字段比较值和类型（1 == 1.0，但整数余额也需要改写为 float）
+    if current.keys() == canonical.keys() and all(type(v) is type(current[k]) and v == current[k] for k, v in canonical.items()):
+        stats.unchanged += 1
+        return None
+    stats.converted += 1
+    return canonical
+
+
+async def migrate_collection(db, collection: str, dry_run: bool) -> Stats:
+    stats = Stats()
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = await db[collection].find(query).sort("_id", 1).limit(BATCH_SIZE).to_list(None)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        ops = []
+        for doc in docs:
+            canonical = convert(collection, doc, stats)
+            if canonical is not None:
+                ops.append(ReplaceOne({"_id": doc["_id"]}, canonical))
+        if ops and not dry_run:
+            try:
+                await db[collection].bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # 如旧数据中同一成交的 trade_id 既有整数又有字符串，转换后触发唯一索引冲突
+                stats.failed += len(e.details.get("writeErrors") or [])
+    return stats
+
+
+def migrate_archive(store: ColdStore, collection: str, dry_run: bool) -> Stats:
+    stats = Stats()
+    for day in store.partitions(collection):
+        docs = store.read_partition(collection, day)
+        rows = [(doc, convert(collection, doc, stats)) for doc in docs]
+        if dry_run or all(canonical is None for _, canonical in rows):
+            continue
+        # 整个分区重写：无法转换的记录原样保留
+        store.write_partition(collection, day, [{**(canonical or doc), "_id": doc["_id"]} for doc, canonical in rows])
+    return stats
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongo)
+    db = client[args.database]
+    prefix = "[dry run] " if args.dry_run else ""
+    for collection in args.collection or COLLECTIONS:
+        started = time.perf_counter()
+        stats = await migrate_collection(db, collection, args.dry_run)
+        print(f"{prefix}{collection}: {stats} in {time.perf_counter() - started:.2f}s")
+        if args.archive:
+            started = time.perf_counter()
+            stats = await asyncio.to_thread(migrate_archive, ColdStore(args.dir), collection, args.dry_run)
+            print(f"{prefix}{collection} archive: {stats} in {time.perf_counter() - started:.2f}s")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy trades / orders / equity snapshots to canonical documents")
+    parser.add_argument("--collection", action="append", choices=COLLECTIONS, help="只迁移该集合，可重复")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    parser.add_argument("--archive", action="store_true", help="同时重写已归档的 Parquet 分区")
+    parser.add_argument("--dir", default=settings.ARCHIVE_DIR)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--mongo", default=settings.MONGODB_URL)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
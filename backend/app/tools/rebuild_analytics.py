@@ -0,0 +1,89 @@
+"""
+从 orders / trades 集合重新计算成交统计（trade_analytics），各集合按时间顺序流式扫描一遍；
+已归档的交易日先从 ARCHIVE_DIR 的 Parquet 分区读取，删除重建后所有交易日的统计都能恢复。
+与实时统计走同一套处理函数；运行期间后端内存中的聚合会在下次写库时覆盖结果，建议停服后执行或执行后重启后端。
+用法 (backend 目录下):
+    python -m app.tools.rebuild_analytics [--account 247060] [--dir archive] [--database hft_db] [--mongo mongodb://...]
+"""
+import argparse
+import asyncio
+import time
+import msgspec
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from ..core.config import settings
+from ..db.mongodb import ensure_indexes
+from ..models.schemas import RtnMessage, TradeMessage
+from ..services.analytics import TradeAnalytics
+from ..services.archive import ColdStore
+from ..services.documents import epoch_ms
+
+BATCH_SIZE = 1000
+
+
+def _handle(doc, handler, msg_type) -> bool:
+    try:
+        handler(msgspec.convert(doc, msg_type, strict=False))
+        return True
+    except msgspec.ValidationError:
+        return False
+
+
+async def _stream(collection, query, handler, msg_type, cold=None) -> tuple:
+    ok = skipped = 0
+    # 冷数据早于库中数据，先按时间正序处理
+    for doc in cold or ():
+        doc.pop("_id", None)
+        doc["timestamp"] = epoch_ms(doc.get("timestamp"))
+        if _handle(doc, handler, msg_type):
+            ok += 1
+        else:
+            skipped += 1
+    # 规范文档的 timestamp 为 UTC datetime，换回引擎消息的毫秒时间戳
+    pipeline = [{"$match": query}, {"$sort": {"timestamp": 1, "_id": 1}},
+                {"$addFields": {"timestamp": {"$toLong": "$timestamp"}}}, {"$project": {"_id": 0}}]
+    async for doc in collection.aggregate(pipeline, batchSize=BATCH_SIZE):
+        if _handle(doc, handler, msg_type):
+            ok += 1
+        else:
+            skipped += 1
+    return ok, skipped
+
+
+async def rebuild(args):
+    client = AsyncIOMotorClient(args.mongo)
+    db = client[args.database]
+    await ensure_indexes(db)
+    query = {"account_id": args.account} if args.account else {}
+    started = time.perf_counter()
+
+    # 先扫报单得到报单数、撤单数及 client_id -> 方向/开平，再扫成交
+    analytics = TradeAnalytics()
+    store = ColdStore(args.dir)
+    orders = await _stream(db.orders, query, analytics.on_rtn, RtnMessage, store.scan("orders", args.account))
+    trades = await _stream(db.trades, query, analytics.on_trade, TradeMessage, store.scan("trades", args.account))
+
+    await db.trade_analytics.delete_many(query)
+    now = int(time.time() * 1000)
+    ops = [UpdateOne({"account_id": acc, "trading_day": day, "symbol": sym},
+                     {"$set": {**agg, "updated_at": now}}, upsert=True)
+           for (acc, sym, day), agg in analytics.aggregates.items()]
+    for i in range(0, len(ops), BATCH_SIZE):
+        await db.trade_analytics.bulk_write(ops[i:i + BATCH_SIZE], ordered=False)
+    client.close()
+
+    print(f"Scanned {orders[0]} orders ({orders[1]} skipped), {trades[0]} trades ({trades[1]} skipped); "
+          f"wrote {len(ops)} aggregates in {time.perf_counter() - started:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild trade analytics from the trades collection")
+    parser.add_argument("--account", help="只重建该账户")
+    parser.add_argument("--dir", default=settings.ARCHIVE_DIR, help="归档目录，其中的成交 / 报单一并计入")
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--mongo", default=settings.MONGODB_URL)
+    asyncio.run(rebuild(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+把引擎消息日志全速回放进数据库，用于回填或生成确定性的基准输入。
+与正常运行走同一套处理函数和落库流水线，成交、权益快照等按幂等方式写入。
+用法 (backend 目录下):
+    python -m app.tools.replay_journal --database hft_db_replay [--journal journal] [--from-seq 1] [--mongo mongodb://...]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from ..core.config import settings
+from ..db.mongodb import connect_to_mongo, close_mongo_connection
+from ..models.schemas import TickMessage
+from ..services.engine_client import engine_client
+from ..services.equity_rollup import equity_rollup
+from ..services.journal import read_journal
+from ..services.market_data import market_data
+from ..services.order_book import order_book
+from ..services.write_pipeline import write_pipeline
+
+# 流水线积压超过该条数时暂停读取，避免整份日志堆在内存里
+MAX_PENDING = 200_000
+
+
+async def replay(args):
+    settings.MONGODB_URL = args.mongo
+    settings.DATABASE_NAME = args.database
+    await connect_to_mongo()
+    write_pipeline.start()
+    order_book.start()
+    if args.ticks:
+        engine_client.register_handler(TickMessage, market_data.on_tick)
+
+    started = time.perf_counter()
+    count, last_seq = 0, None
+    for seq, received_us, payload in read_journal(args.journal, args.from_seq):
+        if args.to_seq and seq > args.to_seq:
+            break
+        engine_client.replay([(seq, received_us, payload)])
+        count, last_seq = count + 1, seq
+        if count % 1000 == 0:
+            # 让写入任务有机会运行；积压过多时等待落库
+            await asyncio.sleep(0)
+            while write_pipeline.pending() > MAX_PENDING:
+                await asyncio.sleep(0.01)
+    decoded = time.perf_counter() - started
+
+    equity_rollup.flush()
+    await order_book.stop()
+    await write_pipeline.stop()
+    await close_mongo_connection()
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {count} messages (last seq {last_seq}) into {args.database}: "
+          f"{count / decoded if decoded else 0:.0f} msg/s processed, {elapsed:.2f}s including writes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an engine message journal into MongoDB")
+    parser.add_argument("--journal", default=settings.JOURNAL_DIR, help="日志目录")
+    parser.add_argument("--database", required=True, help="目标数据库（建议使用新库）")
+    parser.add_argument("--mongo", default=settings.MONGODB_URL)
+    parser.add_argument("--from-seq", type=int, default=0)
+    parser.add_argument("--to-seq", type=int, default=0)
+    parser.add_argument("--ticks", action="store_true", help="同时把 tick 交给行情模块处理")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+引擎消息解码基准：旧路径 (json.loads + if/elif) 对比 msgspec 类型化解码 + tick 快速丢弃。
+用法 (backend 目录下): python -m bench.decode [--n 200000]
+"""
+import argparse
+import json
+import time
+from app.services.engine_client import _decoder, _is_tick
+
+FRAMES = {
+    "rtn": {"type": "rtn", "client_id": 202602041234010001, "account_id": "247060", "order_ref": "010000000123",
+            "order_sys_id": "12345678", "symbol": "au2606", "direction": "B", "offset": "O", "status": "3",
+            "vol_total": 1, "vol_traded": 0, "price": 480.5, "msg": "已报入交易所", "timestamp": 1707012345678},
+    "trade": {"type": "trade", "client_id": 202602041234010001, "account_id": "247060", "trade_id": "999999",
+              "symbol": "au2606", "direction": "B", "offset": "O", "price": 480.4, "volume": 1, "timestamp": 1707012345678},
+    "account": {"type": "account", "account_id": "247060", "balance": 1000000.0, "available": 950000.0,
+                "margin": 50000.0, "pnl": 120.5},
+    "pos_snapshot": {"type": "pos_snapshot", "data": [
+        {"account_id": "247060", "symbol": f"au26{i:02d}", "long_td": 1, "long_yd": 0, "long_price": 480.1,
+         "long_pnl": 120.5, "short_td": 0, "short_yd": 0, "short_price": 0.0, "short_pnl": 0.0, "pnl": 120.5}
+        for i in range(10)]},
+    "status": {"type": "status", "account_id": "247060", "source": "CTP", "code": "0", "msg": "connected"},
+    "tick": {"type": "tick", "symbol": "au2606", "last_price": 480.4, "volume": 12345, "turnover": 5.9e9,
+             "open_interest": 200000, "bid_price1": 480.3, "bid_volume1": 12, "ask_price1": 480.5,
+             "ask_volume1": 7, "timestamp": 1707012345678},
+}
+
+def legacy(message):
+    data = json.loads(message)
+    msg_type = data.get("type")
+    if msg_type == "rtn":
+        return data["client_id"]
+    elif msg_type == "trade":
+        return data
+    elif msg_type == "account":
+        return data.get("account_id")
+    elif msg_type == "pos_snapshot":
+        return data.get("data", [])
+    elif msg_type == "status":
+        return data.get("account_id")
+    elif msg_type == "tick":
+        pass
+
+def typed(message, tick_consumed=False):
+    if not tick_consumed and _is_tick(message):
+        return None
+    return _decoder.decode(message)
+
+def bench(fn, frames, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(frames[i % len(frames)])
+    return (time.perf_counter() - start) / n * 1e9
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200000)
+    args = parser.parse_args()
+
+    encoded = {k: json.dumps(v, ensure_ascii=False) for k, v in FRAMES.items()}
+    # client_id 必须原样保留 18 位精度
+    assert _decoder.decode(encoded["rtn"]).client_id == 202602041234010001
+
+    print(f"{'frame':<14}{'json.loads ns':>16}{'msgspec ns':>14}{'speedup':>10}")
+    for name, frame in encoded.items():
+        old = bench(legacy, [frame], args.n)
+        new = bench(lambda m: typed(m, tick_consumed=True), [frame], args.n)
+        print(f"{name:<14}{old:>16.0f}{new:>14.0f}{old / new:>9.1f}x")
+
+    # 典型行情场景：80% tick，且没有行情订阅者
+    mix = [encoded["tick"]] * 8 + [encoded["rtn"], encoded["account"]]
+    old = bench(legacy, mix, args.n)
+    new = bench(typed, mix, args.n)
+    print(f"{'mix 80% tick':<14}{old:>16.0f}{new:>14.0f}{old / new:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+模拟 hft_eb 引擎的 WebSocket 服务端，按 websocket_protocol.md 推送 rtn / trade / account / pos_snapshot / status / tick，
+并响应 order / cancel 指令（先回 rtn 已报，再按 fill_ratio 回成交）。
+用法 (backend 目录下): python -m bench.fake_engine [--port 8888] [--accounts 2] [--symbols 20] [--rate tick=2000 --rate rtn=100]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, deque
+from datetime import datetime
+import websockets
+
+# 每秒推送条数；下单回报不计入，由 order 指令触发
+DEFAULT_RATES = {"rtn": 50.0, "trade": 20.0, "account": 5.0, "pos_snapshot": 1.0, "status": 0.2, "tick": 500.0}
+PRODUCTS = ("au", "ag", "cu", "al", "zn", "rb", "hc", "i", "j", "m", "y", "p", "c", "sr", "cf", "ta", "ma", "sc", "fu", "bu")
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def parse_rates(items) -> dict:
+    rates = dict(DEFAULT_RATES)
+    for item in items or ():
+        name, _, value = item.partition("=")
+        if name not in DEFAULT_RATES:
+            raise ValueError(f"unknown message type: {name}")
+        rates[name] = float(value)
+    return rates
+
+
+class FakeEngine:
+    def __init__(self, accounts: int = 2, symbols: int = 20, rates: dict = None,
+                 fill_ratio: float = 1.0, ack_delay: float = 0.0, seed: int = None):
+        self.accounts = [str(247060 + i) for i in range(accounts)]
+        self.symbols = [f"{PRODUCTS[i % len(PRODUCTS)]}26{i // len(PRODUCTS) % 12 + 1:02d}" for i in range(symbols)]
+        self.rates = rates or dict(DEFAULT_RATES)
+        self.fill_ratio = fill_ratio
+        self.ack_delay = ack_delay
+        self.sent = Counter()
+        self.received = Counter()
+        self._rng = random.Random(seed)
+        # 18 位 client_id：yyyymmddHHMM + 6 位序号
+        self._next_id = int(datetime.now().strftime("%Y%m%d%H%M")) * 10**6
+        self._next_trade = 0
+        self._recent = deque(maxlen=1000)   # 最近的报单 (client_id, account_id, symbol, direction, offset, price, volume)
+        self._prices = {s: 100.0 + 10 * i for i, s in enumerate(self.symbols)}
+        self._volumes = dict.fromkeys(self.symbols, 0)
+        self._balances = dict.fromkeys(self.accounts, 1_000_000.0)
+
+    # ---- 消息构造 ----
+
+    def _client_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def _price(self, symbol) -> float:
+        price = self._prices[symbol] = round(max(1.0, self._prices[symbol] + self._rng.choice((-0.2, 0, 0.2))), 2)
+        return price
+
+    def _rtn(self, order, status="3", traded=0) -> dict:
+        client_id, account_id, symbol, direction, offset, price, volume = order
+        return {"type": "rtn", "client_id": client_id, "account_id": account_id, "order_ref": f"{client_id % 10**12:012d}",
+                "order_sys_id": str(client_id % 10**8), "symbol": symbol, "direction": direction, "offset": offset,
+                "status": status, "vol_total": volume, "vol_traded": traded, "price": price,
+                "msg": "已报入交易所", "timestamp": _now_ms()}
+
+    def _trade(self, order) -> dict:
+        # 与协议一致只带 client_id / trade_id / price / volume / timestamp，其余字段由后端从报单补全
+        client_id, _, _, _, _, price, volume = order
+        self._next_trade += 1
+        return {"type": "trade", "client_id": client_id, "trade_id": str(self._next_trade),
+                "price": price, "volume": volume, "timestamp": _now_ms()}
+
+    def _new_order(self) -> tuple:
+        symbol = self._rng.choice(self.symbols)
+        return (self._client_id(), self._rng.choice(self.accounts), symbol, self._rng.choice("BS"),
+                self._rng.choice("OC"), self._prices[symbol], self._rng.randint(1, 5))
+
+    def make(self, msg_type: str) -> dict:
+        rng = self._rng
+        if msg_type == "rtn":
+            if self._recent and rng.random() < 0.3:
+                return self._rtn(rng.choice(self._recent), status=rng.choice("015"))
+            order = self._new_order()
+            self._recent.append(order)
+            return self._rtn(order)
+        if msg_type == "trade":
+            order = rng.choice(self._recent) if self._recent else self._new_order()
+            return self._trade(order)
+        if msg_type == "account":
+            account_id = rng.choice(self.accounts)
+            balance = self._balances[account_id] = self._balances[account_id] + rng.uniform(-500, 500)
+            return {"type": "account", "account_id": account_id, "balance": round(balance, 2),
+                    "available": round(balance * 0.9, 2), "margin": round(balance * 0.1, 2),
+                    "pnl": round(balance - 1_000_000.0, 2), "timestamp": _now_ms()}
+        if msg_type == "pos_snapshot":
+            # 全量快照，每次只有部分合约的浮盈变化
+            data = []
+            for account_id in self.accounts:
+                for symbol in self.symbols[:10]:
+                    pnl = round(self._prices[symbol] - 100.0, 1)
+                    data.append({"account_id": account_id, "symbol": symbol, "long_td": 1, "long_yd": 0,
+                                 "long_price": 100.0, "long_pnl": pnl, "short_td": 0, "short_yd": 0,
+                                 "short_price": 0.0, "short_pnl": 0.0, "pnl": pnl})
+            return {"type": "pos_snapshot", "data": data}
+        if msg_type == "status":
+            return {"type": "status", "account_id": rng.choice(self.accounts), "source": "CTP",
+                    "code": "0", "msg": "connected"}
+        if msg_type == "tick":
+            symbol = rng.choice(self.symbols)
+            price = self._price(symbol)
+            volume = self._volumes[symbol] = self._volumes[symbol] + rng.randint(1, 20)
+            return {"type": "tick", "symbol": symbol, "last_price": price, "volume": volume,
+                    "turnover": price * volume, "open_interest": 200000, "bid_price1": round(price - 0.2, 2),
+                    "bid_volume1": rng.randint(1, 50), "ask_price1": round(price + 0.2, 2),
+                    "ask_volume1": rng.randint(1, 50), "timestamp": _now_ms()}
+        raise ValueError(msg_type)
+
+    # ---- 连接处理 ----
+
+    async def _send(self, ws, message: dict):
+        await ws.send(json.dumps(message))
+        self.sent[message["type"]] += 1
+
+    async def _produce(self, ws):
+        # 按经过的时间累计配额，每 10ms 发送一轮，速率不受单轮发送耗时影响
+        loop = asyncio.get_running_loop()
+        budget = Counter()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(0.01)
+            now = loop.time()
+            elapsed, last = now - last, now
+            for msg_type, rate in self.rates.items():
+                budget[msg_type] += rate * elapsed
+                n = int(budget[msg_type])
+                budget[msg_type] -= n
+                for _ in range(n):
+                    await self._send(ws, self.make(msg_type))
+
+    async def _on_command(self, ws, raw):
+        cmd = json.loads(raw)
+        action = cmd.get("action")
+        self.received[action] += 1
+        if action == "order":
+            order = (self._client_id(), cmd.get("account_id") or self.accounts[0], cmd.get("symbol"),
+                     cmd.get("direction"), cmd.get("offset"), cmd.get("price"), cmd.get("volume"))
+            if self.ack_delay:
+                await asyncio.sleep(self.ack_delay)
+            await self._send(ws, self._rtn(order))
+            self._recent.append(order)
+            if self._rng.random() < self.fill_ratio:
+                await self._send(ws, self._trade(order))
+                await self._send(ws, self._rtn(order, status="0", traded=order[6]))
+        elif action == "cancel":
+            order = (cmd.get("client_id"), cmd.get("account_id"), cmd.get("symbol"), "B", "O", 0.0, 0)
+            await self._send(ws, self._rtn(order, status="5"))
+
+    async def handler(self, ws):
+        producer = asyncio.create_task(self._produce(ws))
+        try:
+            async for raw in ws:
+                await self._on_command(ws, raw)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            producer.cancel()
+
+    def serve(self, host: str = "0.0.0.0", port: int = 8888):
+        return websockets.serve(self.handler, host, port, max_size=None)
+
+
+async def main(args):
+    engine = FakeEngine(args.accounts, args.symbols, parse_rates(args.rate), args.fill_ratio,
+                        args.ack_delay_ms / 1000.0, args.seed)
+    async with engine.serve(args.host, args.port):
+        print(f"Fake engine listening on ws://{args.host}:{args.port}, rates={engine.rates}", flush=True)
+        while True:
+            await asyncio.sleep(5)
+            print(f"sent={dict(engine.sent)} received={dict(engine.received)}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--rate", action="append", metavar="TYPE=N", help="每秒推送条数，如 tick=2000，可重复")
+    parser.add_argument("--fill-ratio", type=float, default=1.0)
+    parser.add_argument("--ack-delay-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,219 @@
+"""
+端到端基准：启动模拟引擎（子进程）和后端（进程内 uvicorn），在持续推送下并发轮询各 /api 接口。
+输出：持续接收速率（条/秒）、引擎时间戳到落库完成的延迟、各接口 p50/p99 延迟，结果写成 JSON 便于对比。
+用法 (backend 目录下):
+    python -m bench.run [--duration 30] [--pollers 8] [--mongo mock|mongodb://...] [--rate tick=2000] [--out bench/results/x.json]
+--mongo mock 使用进程内的 mongomock-motor（需 pip install mongomock-motor），否则连接给定的 mongod。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from app.core.config import settings
+from app.core.metrics import ENGINE_MESSAGES, MONGO_WRITE_OPS
+from app.db import mongodb
+from app.services.documents import epoch_ms
+from app.services.write_pipeline import write_pipeline
+
+ACCOUNT = "247060"  # 模拟引擎的第一个账户
+
+
+def endpoints() -> list:
+    # 空结果计为失败，因此不轮询 /api/orders/latency：基准不经后端下单，该接口始终为空
+    start = (datetime.now() - timedelta(hours=1)).isoformat()
+    return [
+        f"/api/trades?limit=100&account_id={ACCOUNT}",
+        f"/api/orders?limit=100&account_id={ACCOUNT}",
+        f"/api/positions?account_id={ACCOUNT}",
+        f"/api/account?account_id={ACCOUNT}",
+        "/api/account/status",
+        f"/api/equity/history?account_id={ACCOUNT}&from={start}&points=300",
+        "/api/equity/latest",
+        "/api/market/quotes",
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"count": len(samples), "p50": round(pick(0.5), 3), "p99": round(pick(0.99), 3),
+            "max": round(samples[-1], 3), "mean": round(sum(samples) / len(samples), 3)}
+
+
+def _values(family) -> dict:
+    return {labels[0] if labels else "": child.value for labels, child in family.children.items()}
+
+
+class LagProbe:
+    """包装 write_pipeline._flush：批次确实写入后（MONGO_WRITE_OPS 增加），用文档里的引擎时间戳（毫秒）计算落库延迟。"""
+
+    def __init__(self):
+        self.samples: list[float] = []
+        self.recording = False
+
+    def install(self):
+        flush = write_pipeline._flush
+
+        async def timed_flush(name, batch):
+            written = MONGO_WRITE_OPS.labels(name)
+            before = written.value
+            handled = await flush(name, batch)
+            if not self.recording or written.value <= before:
+                # 未写入（退出时无数据库连接）或整批被丢弃，不计入延迟
+                return handled
+            now = time.time() * 1000
+            for op in batch:
+                doc = op.doc or {}
+                ts = doc.get("timestamp") or (doc.get("$set") or {}).get("timestamp")
+                if isinstance(ts, datetime) and name in ("trades", "orders"):
+                    # 成交 / 报单的 timestamp 为 UTC datetime；权益快照为本地时间的采样时刻，不计入
+                    ts = epoch_ms(ts)
+                if isinstance(ts, (int, float)) and ts > 0:
+                    self.samples.append(now - ts)
+            return handled
+
+        write_pipeline._flush = timed_flush
+
+
+async def poll(client: httpx.AsyncClient, paths: list, results: dict, errors: dict, stop: asyncio.Event, offset: int):
+    i = offset
+    while not stop.is_set():
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            # 接口出错时多返回 200 + 空结果（[] / null），同样计为失败
+            ok = response.status_code < 400 and response.content.strip() not in (b"", b"[]", b"{}", b"null")
+        except httpx.HTTPError:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        if ok:
+            results[path].append(elapsed)
+        else:
+            errors[path] += 1
+
+
+async def run(args) -> dict:
+    engine = None
+    if args.engine_url:
+        settings.ENGINE_WS_URL = args.engine_url
+    else:
+        port = _free_port()
+        cmd = [sys.executable, "-m", "bench.fake_engine", "--host", "127.0.0.1", "--port", str(port),
+               "--accounts", str(args.accounts), "--symbols", str(args.symbols)]
+        for rate in args.rate or ():
+            cmd += ["--rate", rate]
+        engine = subprocess.Popen(cmd, cwd=Path(__file__).resolve().parent.parent)
+        settings.ENGINE_WS_URL = f"ws://127.0.0.1:{port}"
+
+    if args.mongo == "mock":
+        from mongomock_motor import AsyncMongoMockClient
+        mongodb.AsyncIOMotorClient = AsyncMongoMockClient
+    else:
+        settings.MONGODB_URL = args.mongo
+    settings.DATABASE_NAME = args.database
+    # 日志、溢出、归档目录放在临时目录：不推进真实后端的日志检查点，基准中途退出也不会在下次启动时回放合成数据
+    workdir = tempfile.mkdtemp(prefix="hft_bench_")
+    settings.JOURNAL_DIR = str(Path(workdir) / "journal")
+    settings.WRITE_SPILL_DIR = str(Path(workdir) / "spill")
+    settings.ARCHIVE_DIR = str(Path(workdir) / "archive")
+
+    probe = LagProbe()
+    probe.install()
+
+    from app.main import app
+    api_port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=api_port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(args.warmup)
+
+        paths = endpoints()
+        results = {p: [] for p in paths}
+        errors = dict.fromkeys(paths, 0)
+        messages0, persisted0 = _values(ENGINE_MESSAGES), _values(MONGO_WRITE_OPS)
+        probe.recording = True
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", timeout=10) as client:
+            pollers = [asyncio.create_task(poll(client, paths, results, errors, stop, i)) for i in range(args.pollers)]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*pollers)
+        elapsed = time.perf_counter() - started
+        probe.recording = False
+        by_type = {k: v - messages0.get(k, 0) for k, v in _values(ENGINE_MESSAGES).items()}
+        by_collection = {k: v - persisted0.get(k, 0) for k, v in _values(MONGO_WRITE_OPS).items()}
+        messages, persisted = sum(by_type.values()), sum(by_collection.values())
+    finally:
+        server.should_exit = True
+        await serve_task
+        if engine:
+            engine.terminate()
+            engine.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "ingest": {
+            "messages": messages,
+            "messages_per_s": round(messages / elapsed, 1),
+            "persisted_ops": persisted,
+            "persisted_ops_per_s": round(persisted / elapsed, 1),
+            "by_type": {k: v for k, v in by_type.items() if v},
+            "persisted_by_collection": {k: v for k, v in by_collection.items() if v},
+        },
+        "lag_ms": _percentiles(probe.samples),
+        "endpoints": {p: {**_percentiles(results[p]), "errors": errors[p]} for p in paths},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--mongo", default=settings.MONGODB_URL, help="mongod 地址，或 mock 使用进程内 mongomock-motor")
+    parser.add_argument("--database", default="hft_db_bench")
+    parser.add_argument("--engine-url", help="使用已在运行的引擎（或模拟引擎），不再启动子进程")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--rate", action="append", metavar="TYPE=N", help="传给模拟引擎的推送速率，可重复")
+    parser.add_argument("--out", help="结果 JSON 路径，默认 bench/results/<时间>.json")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    out = Path(args.out or Path(__file__).parent / "results" / f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Saved to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
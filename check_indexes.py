@@ -0,0 +1,128 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from bson import ObjectId
+from app.api.equity import ROLLUP_FIELDS, SNAPSHOT_FIELDS, range_pipeline, range_query
+from app.api.paging import build_query, encode_cursor, export_pipeline, page_pipeline
+from app.db.mongodb import ensure_indexes
+from app.services.documents import epoch_ms
+from app.services.serializers import EQUITY_PROJECTION, ORDER_PROJECTION, TRADE_PROJECTION, recent_pipeline
+
+# 在独立的临时库上建索引、写入少量样本，然后对每个 API / 落库查询执行 explain()，
+# 只要有一个查询计划中出现 COLLSCAN（聚合管道还包括内存排序）就以非 0 退出。用法: python check_indexes.py [MONGODB_URL]
+MONGODB_URL = sys.argv[1] if len(sys.argv) > 1 else "mongodb://localhost:27017"
+DATABASE_NAME = "hft_db_index_check"
+# 样本时间：成交 / 报单为 UTC datetime，权益为本地时间 datetime，这里只用于查询计划，取同一个值即可
+BASE = datetime(2024, 2, 4, 2, 5, 45, 678000)
+BASE_MS = epoch_ms(BASE)
+# 第二页的游标：与 fetch_page 返回的 X-Next-Cursor 相同的编码
+CURSOR = encode_cursor({"t": BASE_MS + 10, "id": str(ObjectId())}, "t")
+
+# (说明, 集合, 过滤条件, 排序)
+QUERIES = [
+    ("rtn upsert", "orders", {"client_id": 202602041234010001}, None),
+    ("trade upsert", "trades", {"client_id": 202602041234010001, "trade_id": "999999"}, None),
+    ("trade upsert without trade_id", "trades", {"client_id": 202602041234010001, "timestamp": BASE, "volume": 1, "trade_id": {"$exists": False}}, None),
+    ("get_analytics", "trade_analytics", {"trading_day": "20240205"}, [("account_id", 1), ("symbol", 1)]),
+    ("get_analytics account_id", "trade_analytics", {"trading_day": "20240205", "account_id": "247060"}, [("account_id", 1), ("symbol", 1)]),
+    ("pos_snapshot replace", "positions", {"account_id": "247060", "symbol": "au2601"}, None),
+    ("pos_snapshot remove", "positions", {"account_id": "247060", "symbol": {"$in": ["au2601", "au2603"]}}, None),
+    ("account upsert", "account", {"account_id": "247060"}, None),
+    ("status upsert", "connection_status", {"account_id": "247060", "source": "CTP"}, None),
+]
+
+# (说明, 集合, 聚合管道)：读接口实际使用的管道（paging / recent_pipeline / 权益范围查询），除 COLLSCAN 外还要求排序走索引（无内存 SORT）
+def history_pipelines(name: str, projection: dict) -> list:
+    return [
+        (f"get_{name}", name, page_pipeline(build_query(), 100, projection)),
+        (f"get_{name} account_id", name, page_pipeline(build_query("247060"), 100, projection)),
+        (f"get_{name} range", name, page_pipeline(build_query("247060", BASE_MS, BASE_MS + 20), 100, projection)),
+        (f"get_{name} cursor", name, page_pipeline(build_query(None, cursor=CURSOR), 100, projection)),
+        (f"get_{name} account_id cursor", name, page_pipeline(build_query("247060", cursor=CURSOR), 100, projection)),
+        (f"export_{name}", name, export_pipeline(build_query("247060"), projection)),
+    ]
+
+def equity_range_pipelines() -> list:
+    end = BASE + timedelta(minutes=1)
+    return [
+        (f"get_equity_history {resolution}{' account_id' if account_id else ''}",
+         "equity_snapshots" if resolution == "raw" else "equity_rollups",
+         range_pipeline(range_query(account_id, BASE, end, resolution), SNAPSHOT_FIELDS if resolution == "raw" else ROLLUP_FIELDS, 50000))
+        for resolution in ("raw", "1m") for account_id in ("247060", None)
+    ]
+
+PIPELINES = [
+    *history_pipelines("trades", TRADE_PROJECTION),
+    *history_pipelines("orders", ORDER_PROJECTION),
+    ("dashboard trades", "trades", recent_pipeline("trades", {"account_id": "247060"}, 10, TRADE_PROJECTION)),
+    ("dashboard orders", "orders", recent_pipeline("orders", {"account_id": "247060"}, 10, ORDER_PROJECTION)),
+    ("get_equity_history", "equity_snapshots", recent_pipeline("equity_snapshots", {}, 500, EQUITY_PROJECTION)),
+    ("get_equity_history account_id", "equity_snapshots", recent_pipeline("equity_snapshots", {"account_id": "247060"}, 500, EQUITY_PROJECTION)),
+    *equity_range_pipelines(),
+    ("get_latest_equity", "equity_snapshots", recent_pipeline("equity_snapshots", {}, 1, EQUITY_PROJECTION)),
+]
+
+def find_stages(plan, stage):
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(find_stages(v, stage) for v in plan.values())
+    if isinstance(plan, list):
+        return any(find_stages(v, stage) for v in plan)
+    return False
+
+def unpushed_stage(plan, key):
+    # 未下推到查询层的聚合阶段（如内存中的 $sort）单独出现在 explain 的 stages 列表中
+    return any(key in stage for stage in plan.get("stages", []))
+
+async def seed(db):
+    for i in range(20):
+        account_id = "247060" if i % 2 else "247061"
+        await db.trades.insert_one({"account_id": account_id, "client_id": 202602041234010000 + i, "trade_id": str(i), "timestamp": BASE + timedelta(milliseconds=i)})
+        await db.orders.insert_one({"account_id": account_id, "client_id": 202602041234010000 + i, "timestamp": BASE + timedelta(milliseconds=i)})
+        await db.equity_snapshots.insert_one({"account_id": account_id, "timestamp": BASE + timedelta(milliseconds=i)})
+        await db.equity_rollups.insert_one({"account_id": account_id, "resolution": "1m", "timestamp": BASE + timedelta(milliseconds=i)})
+        await db.positions.insert_one({"account_id": account_id, "symbol": f"au26{i:02d}"})
+        await db.trade_analytics.insert_one({"account_id": account_id, "symbol": f"au26{i:02d}", "trading_day": f"202402{i:02d}"})
+    for account_id in ("247060", "247061"):
+        await db.account.insert_one({"account_id": account_id})
+        await db.connection_status.insert_one({"account_id": account_id, "source": "CTP"})
+
+async def check_indexes():
+    client = AsyncIOMotorClient(MONGODB_URL)
+    await client.drop_database(DATABASE_NAME)
+    db = client[DATABASE_NAME]
+    failures = 0
+    try:
+        await ensure_indexes(db)
+        await seed(db)
+        for name, collection, query, sort in QUERIES:
+            cursor = db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.limit(100).explain())["queryPlanner"]["winningPlan"]
+            if find_stages(plan, "COLLSCAN"):
+                failures += 1
+                print(f"FAIL {name}: COLLSCAN on {collection} {query}")
+            else:
+                print(f"ok   {name}")
+        for name, collection, pipeline in PIPELINES:
+            plan = await db.command("aggregate", collection, pipeline=pipeline, explain=True)
+            if find_stages(plan, "COLLSCAN") or find_stages(plan, "SORT") or unpushed_stage(plan, "$sort"):
+                failures += 1
+                print(f"FAIL {name}: COLLSCAN or in-memory sort on {collection} {pipeline[:2]}")
+            else:
+                print(f"ok   {name}")
+    finally:
+        await client.drop_database(DATABASE_NAME)
+
+    total = len(QUERIES) + len(PIPELINES)
+    print(f"\n{total - failures}/{total} queries use an index")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check_indexes()) else 0)
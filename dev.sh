@@ -3,6 +3,7 @@
 # 1. 精确杀死后台运行的特定命令
 echo "Killing existing services..."
 pkill -f "uvicorn app.main:app --host 0.0.0.0 --port 8866" || true
+pkill -f "python -m app.ingest" || true
 pkill -f "vite preview --host 0.0.0.0 --port 5173" || true
 sleep 1
 
@@ -10,7 +11,10 @@ sleep 1
 echo "Starting Backend..."
 cd backend
 source .venv/bin/activate
-nohup uvicorn app.main:app --host 0.0.0.0 --port 8866 > ../backend.log 2>&1 &
+# ingest 进程独占引擎连接与落库，API 以多 worker 只读副本方式服务（API_WORKERS 默认 4）
+nohup python -m app.ingest > ../ingest.log 2>&1 &
+sleep 2
+ROLE=api nohup uvicorn app.main:app --host 0.0.0.0 --port 8866 --workers ${API_WORKERS:-4} > ../backend.log 2>&1 &
 cd ..
 
 # 3. 构建并启动前端
@@ -1,12 +1,13 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { LayoutDashboard, History, FileText, Activity, Send, ChevronDown, Wifi, WifiOff } from 'lucide-react';
 import EquityChart from './EquityChart';
-import { fetchTrades, fetchOrders, fetchPositions, placeOrder, cancelOrder, fetchAccount, fetchAccountsList, fetchAccountStatus } from '../services/api';
+import { fetchDashboard, fetchOpenOrders, placeOrder, cancelOrder, fetchAccountsList, openStream } from '../services/api';
 
 const Dashboard: React.FC = () => {
   const [activeTab, setActiveTab] = useState('dashboard');
   const [trades, setTrades] = useState<any[]>([]);
   const [orders, setOrders] = useState<any[]>([]);
+  const [openOrders, setOpenOrders] = useState<any[]>([]);
   const [positions, setPositions] = useState<any[]>([]);
   const [account, setAccount] = useState<any>({ balance: 0, available: 0, margin: 0, pnl: 0 });
   const [orderForm, setOrderForm] = useState({ symbol: '', direction: 'B', offset: 'O', price: 0, volume: 1 });
@@ -15,6 +16,10 @@ const Dashboard: React.FC = () => {
   const [selectedAccount, setSelectedAccount] = useState<string>('');
   const [accountStatuses, setAccountStatuses] = useState<any[]>([]);
   const [notifications, setNotifications] = useState<{id: number, type: 'success' | 'error', message: string}[]>([]);
+  const [streamConnected, setStreamConnected] = useState(false);
+  const limitRef = useRef(10);
+  // 上次仪表盘快照的版本令牌及其对应的 账户/条数，变化后需要完整快照
+  const dashboardVersion = useRef<{ key: string, version: string | null }>({ key: '', version: null });
 
   const addNotification = (message: string, type: 'success' | 'error' = 'success') => {
     const id = Date.now();
@@ -24,17 +29,27 @@ const Dashboard: React.FC = () => {
     }, 3000);
   };
 
+  // 仪表盘只显示最近10笔，历史标签页显示最近100笔
+  const limit = (activeTab === 'trades' || activeTab === 'orders') ? 100 : 10;
+  limitRef.current = limit;
+
   const refreshData = async () => {
     if (!selectedAccount) return;
-    
-    // 仪表盘只显示最近10笔，历史标签页显示最近100笔
-    const limit = (activeTab === 'trades' || activeTab === 'orders') ? 100 : 10;
-    
-    fetchTrades(limit, selectedAccount).then(data => setTrades(Array.isArray(data) ? data : [])).catch(e => console.error('Trades error', e));
-    fetchOrders(limit, selectedAccount).then(data => setOrders(Array.isArray(data) ? data : [])).catch(e => console.error('Orders error', e));
-    fetchPositions(selectedAccount).then(data => setPositions(Array.isArray(data) ? data : [])).catch(e => console.error('Positions error', e));
-    fetchAccount(selectedAccount).then(setAccount).catch(e => console.error('Account error', e));
-    fetchAccountStatus(selectedAccount).then(setAccountStatuses).catch(e => console.error('Status error', e));
+    // 一次请求取回全部分区，未变化的分区服务端不返回
+    const key = `${selectedAccount}:${limit}`;
+    const since = dashboardVersion.current.key === key ? dashboardVersion.current.version : null;
+    try {
+      const data = await fetchDashboard(selectedAccount, limit, since);
+      if ('trades' in data) setTrades(Array.isArray(data.trades) ? data.trades : []);
+      if ('orders' in data) setOrders(Array.isArray(data.orders) ? data.orders : []);
+      if ('open_orders' in data) setOpenOrders(Array.isArray(data.open_orders) ? data.open_orders : []);
+      if ('positions' in data) setPositions(Array.isArray(data.positions) ? data.positions : []);
+      if (data.account) setAccount(data.account);
+      if ('status' in data) setAccountStatuses(Array.isArray(data.status) ? data.status : []);
+      dashboardVersion.current = { key, version: data.version ?? null };
+    } catch (e) {
+      console.error('Dashboard error', e);
+    }
   };
 
   useEffect(() => {
@@ -47,20 +62,84 @@ const Dashboard: React.FC = () => {
     }).catch(e => console.error('Accounts list error', e));
   }, []);
 
+  const applyStreamItem = (channel: string, data: any) => {
+    const max = limitRef.current;
+    if (channel === 'orders') {
+      setOrders(prev => [data, ...prev.filter(o => o.client_id !== data.client_id)].slice(0, max));
+      // 终态（全部成交 / 不在队列中 / 已撤单，与后端 order_book.TERMINAL 一致）的报单移出挂单列表
+      setOpenOrders(prev => {
+        const rest = prev.filter(o => o.client_id !== data.client_id);
+        return ['0', '2', '4', '5'].includes(data.status) ? rest : [data, ...rest];
+      });
+    } else if (channel === 'trades') {
+      setTrades(prev => prev.some(t => t.client_id === data.client_id && t.trade_id === data.trade_id)
+        ? prev : [data, ...prev].slice(0, max));
+    } else if (channel === 'positions') {
+      setPositions(Array.isArray(data) ? data : []);
+    } else if (channel === 'account') {
+      if (data) setAccount(data);
+    } else if (channel === 'status') {
+      setAccountStatuses(prev => [...prev.filter(s => s.source !== data.source), data]);
+    }
+  };
+
+  const handleStreamMessage = (msg: any) => {
+    if (msg.type === 'snapshot') {
+      const data = msg.data;
+      if (msg.channel === 'orders') setOrders(Array.isArray(data) ? data : []);
+      else if (msg.channel === 'trades') setTrades(Array.isArray(data) ? data : []);
+      else if (msg.channel === 'status') setAccountStatuses(Array.isArray(data) ? data : []);
+      else applyStreamItem(msg.channel, data);
+    } else if (msg.type === 'delta') {
+      msg.items.forEach((item: any) => applyStreamItem(item.channel, item.data));
+    }
+  };
+
+  useEffect(() => {
+    if (!selectedAccount) return;
+    // 实时推送：断线后 3 秒重连，重连后服务端会重新下发快照
+    let ws: WebSocket | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+    const connect = () => {
+      ws = openStream(selectedAccount, ['orders', 'trades', 'positions', 'account', 'status'], limit,
+        handleStreamMessage,
+        connected => {
+          setStreamConnected(connected);
+          if (!connected && !closed) retry = setTimeout(connect, 3000);
+        });
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      ws?.close();
+      setStreamConnected(false);
+    };
+  }, [selectedAccount, activeTab]);
+
   useEffect(() => {
-    if (selectedAccount) {
+    // 推送连接后先取一次挂单，之后由 orders 频道的增量维护
+    if (selectedAccount && streamConnected) {
+      fetchOpenOrders(selectedAccount).then(data => setOpenOrders(Array.isArray(data) ? data : [])).catch(e => console.error('Open orders error', e));
+    }
+  }, [selectedAccount, streamConnected]);
+
+  useEffect(() => {
+    // 推送断开时退回轮询
+    if (selectedAccount && !streamConnected) {
       refreshData();
       const timer = setInterval(refreshData, 3000);
       return () => clearInterval(timer);
     }
-  }, [selectedAccount, activeTab]);
+  }, [selectedAccount, activeTab, streamConnected]);
 
   const handlePlaceOrder = async (e: React.FormEvent) => {
     e.preventDefault();
     try {
       await placeOrder({ ...orderForm, account_id: selectedAccount });
       addNotification('报单已发送', 'success');
-      refreshData();
+      if (!streamConnected) refreshData();
     } catch (err) {
       addNotification('下单失败', 'error');
     }
@@ -70,7 +149,7 @@ const Dashboard: React.FC = () => {
     try {
       await cancelOrder({ symbol, client_id: clientId, account_id });
       addNotification('撤单请求已发送', 'success');
-      refreshData();
+      if (!streamConnected) refreshData();
     } catch (err) {
       addNotification('撤单失败', 'error');
     }
@@ -424,6 +503,47 @@ const Dashboard: React.FC = () => {
 
         {activeTab === 'orders' && (
           <div>
+            <header className="mb-8 text-2xl font-semibold">挂单</header>
+            <div className="bg-zinc-900 rounded-xl border border-zinc-800 overflow-hidden mb-8">
+               <table className="w-full text-sm">
+                  <thead className="bg-zinc-800 text-zinc-400">
+                    <tr>
+                      <th className="p-4 text-left">委托时间</th>
+                      <th className="p-4 text-left">Client ID</th>
+                      <th className="p-4 text-left">合约</th>
+                      <th className="p-4 text-center">操作</th>
+                      <th className="p-4 text-right">委托价格</th>
+                      <th className="p-4 text-right">数量</th>
+                      <th className="p-4 text-center">撤单</th>
+                    </tr>
+                  </thead>
+                  <tbody className="divide-y divide-zinc-800">
+                    {openOrders.length === 0 && (
+                      <tr><td colSpan={7} className="p-4 text-center text-zinc-600 text-xs">无挂单</td></tr>
+                    )}
+                    {openOrders.map(o => (
+                      <tr key={o.client_id} className="hover:bg-zinc-800/50">
+                        <td className="p-4 text-zinc-500 font-mono text-xs">{formatDateTime(o.insert_time)}</td>
+                        <td className="p-4 text-xs font-mono">{o.client_id}</td>
+                        <td className="p-4 font-bold">{o.symbol}</td>
+                        <td className={`p-4 text-center font-bold ${o.direction === 'B' ? 'text-red-500' : 'text-green-500'}`}>
+                          {o.direction === 'B' ? '买' : '卖'}{o.offset === 'O' ? '开' : o.offset === 'T' ? '平今' : '平'}
+                        </td>
+                        <td className="p-4 text-right font-mono">{o.limit_price !== undefined ? parseFloat(Number(o.limit_price).toFixed(3)) : '-'}</td>
+                        <td className="p-4 text-right font-mono text-zinc-400">{o.volume_traded}/{o.volume_total}</td>
+                        <td className="p-4 text-center">
+                          <button 
+                            onClick={() => handleCancelOrder(o.symbol, o.client_id, o.account_id)}
+                            className="text-red-500 hover:text-red-400 text-xs underline"
+                          >
+                            撤单
+                          </button>
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+               </table>
+            </div>
             <header className="mb-8 text-2xl font-semibold">报单审计</header>
             <div className="bg-zinc-900 rounded-xl border border-zinc-800 overflow-hidden">
                <table className="w-full text-sm">
@@ -437,7 +557,6 @@ const Dashboard: React.FC = () => {
                       <th className="p-4 text-right">数量</th>
                       <th className="p-4 text-right">状态</th>
                       <th className="p-4 text-left">备注</th>
-                      <th className="p-4 text-center">操作</th>
                     </tr>
                   </thead>
                   <tbody className="divide-y divide-zinc-800">
@@ -455,18 +574,6 @@ const Dashboard: React.FC = () => {
                           {o.status === '0' ? 'Done' : o.status === '3' ? 'Sent' : o.status === '5' ? 'Canceled' : 'Pending'}
                         </td>
                         <td className="p-4 text-zinc-500 text-xs italic">{o.msg}</td>
-                        <td className="p-4 text-center">
-                          {['0', '5'].includes(o.status) ? (
-                            <span className="text-zinc-600 text-xs">-</span>
-                          ) : (
-                            <button 
-                              onClick={() => handleCancelOrder(o.symbol, o.client_id, o.account_id)}
-                              className="text-red-500 hover:text-red-400 text-xs underline"
-                            >
-                              撤单
-                            </button>
-                          )}
-                        </td>
                       </tr>
                     ))}
                   </tbody>
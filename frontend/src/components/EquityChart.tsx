@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { ResponsiveContainer, AreaChart, Area, XAxis, YAxis, Tooltip, CartesianGrid } from 'recharts';
-import { fetchEquityHistory } from '../services/api';
+import { fetchEquityCurve } from '../services/api';
 
 interface EquityChartProps {
   accountId?: string;
@@ -12,7 +12,9 @@ const EquityChart: React.FC<EquityChartProps> = ({ accountId }) => {
   useEffect(() => {
     const loadHistory = async () => {
       try {
-        const data = await fetchEquityHistory(100, accountId);
+        // 最近 24 小时，服务端降采样到 300 个点
+        const now = Date.now();
+        const data = await fetchEquityCurve(accountId, now - 24 * 3600 * 1000, now, 300);
         if (Array.isArray(data)) {
           // 转换数据格式供图表使用
           const formatted = data.map(d => ({
@@ -51,6 +51,15 @@ export const cancelOrder = async (cancelData: { symbol: string, client_id: strin
   return response.json();
 };
 
+// 未终结（可撤）的报单，服务端直接读内存中的报单索引
+export const fetchOpenOrders = async (accountId?: string) => {
+  let url = `${API_BASE_URL}/orders/open`;
+  if (accountId) url += `?account_id=${accountId}`;
+  const response = await fetch(url);
+  if (!response.ok) throw new Error('Failed to fetch open orders');
+  return response.json();
+};
+
 export const fetchPositions = async (accountId?: string) => {
   let url = `${API_BASE_URL}/positions/`;
   if (accountId) url += `?account_id=${accountId}`;
@@ -67,6 +76,15 @@ export const fetchAccount = async (accountId?: string) => {
   return response.json();
 };
 
+// 仪表盘聚合快照：带上次响应的 version 作为 since 时，只返回有变化的分区
+export const fetchDashboard = async (accountId: string, limit: number, since?: string | null) => {
+  let url = `${API_BASE_URL}/dashboard?account_id=${accountId}&limit=${limit}`;
+  if (since) url += `&since=${encodeURIComponent(since)}`;
+  const response = await fetch(url);
+  if (!response.ok) throw new Error('Failed to fetch dashboard');
+  return response.json();
+};
+
 export const fetchEquityHistory = async (limit = 500, accountId?: string) => {
   let url = `${API_BASE_URL}/equity/history?limit=${limit}`;
   if (accountId) url += `&account_id=${accountId}`;
@@ -74,3 +92,34 @@ export const fetchEquityHistory = async (limit = 500, accountId?: string) => {
   if (!response.ok) throw new Error('Failed to fetch equity history');
   return response.json();
 };
+
+// 按时间范围取权益曲线，服务端从 1s/1m/1h 聚合中选分辨率并降采样到 points 个点
+export const fetchEquityCurve = async (accountId: string | undefined, from: number, to: number, points = 300) => {
+  let url = `${API_BASE_URL}/equity/history?from=${from}&to=${to}&points=${points}`;
+  if (accountId) url += `&account_id=${accountId}`;
+  const response = await fetch(url);
+  if (!response.ok) throw new Error('Failed to fetch equity history');
+  return response.json();
+};
+
+const STREAM_URL = `${API_BASE_URL.replace(/^http/, 'ws').replace(/\/api\/?$/, '')}/ws/stream`;
+
+export type StreamChannel = 'orders' | 'trades' | 'positions' | 'account' | 'status';
+
+// 订阅后端实时推送：先收到各频道快照 (type: snapshot)，之后是合并后的增量 (type: delta)
+export const openStream = (
+  accountId: string,
+  channels: StreamChannel[],
+  limit: number,
+  onMessage: (msg: any) => void,
+  onStateChange?: (connected: boolean) => void,
+) => {
+  const ws = new WebSocket(STREAM_URL);
+  ws.onopen = () => {
+    ws.send(JSON.stringify({ action: 'subscribe', account_id: accountId, channels, limit }));
+    onStateChange?.(true);
+  };
+  ws.onmessage = (event) => onMessage(JSON.parse(event.data));
+  ws.onclose = () => onStateChange?.(false);
+  return ws;
+};